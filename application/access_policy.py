@@ -0,0 +1,162 @@
+import inspect
+import re
+
+from rest_access_policy import AccessPolicy, AccessPolicyException
+from rest_framework.permissions import SAFE_METHODS
+
+_TOKENS = re.compile(r'\(|\)|[\w:.*]+')
+
+
+class CompiledAccessPolicy(AccessPolicy):
+    """
+    AccessPolicy whose statements are compiled once per class into a table keyed by action
+
+    Conditions are bound to their methods and their expressions are parsed in advance. A request checks only the
+    statements of its action, denying statements first, and stops at the first statement which decides it, so
+    conditions must not have side effects. Policies with dynamic get_policy_statements are evaluated by AccessPolicy.
+    """
+
+    _table = {}
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls._table = cls._compile(cls.statements)
+
+    @classmethod
+    def _compile(cls, statements):
+        table = {}
+        for statement in statements:
+            actions = statement['action']
+            principals = statement['principal']
+            conditions = statement.get('condition', [])
+            compiled = (
+                statement['effect'] == 'allow',
+                cls._compile_principals([principals] if isinstance(principals, str) else principals),
+                tuple(cls._compile_condition(condition)
+                      for condition in ([conditions] if isinstance(conditions, str) else conditions)),
+            )
+            for action in [actions] if isinstance(actions, str) else actions:
+                table.setdefault(action, []).append(compiled)
+
+        # denying statements decide first
+        return {action: tuple(sorted(compiled, key=lambda c: c[0])) for action, compiled in table.items()}
+
+    @classmethod
+    def _compile_principals(cls, principals):
+        """the principal matching of AccessPolicy, which is decided by the first special principal it finds"""
+        for special, match in (('*', lambda policy, user: True),
+                               ('admin', lambda policy, user: user.is_superuser),
+                               ('staff', lambda policy, user: user.is_staff),
+                               ('authenticated', lambda policy, user: not user.is_anonymous),
+                               ('anonymous', lambda policy, user: user.is_anonymous)):
+            if special in principals:
+                return match
+
+        ids = {principal for principal in principals if principal.startswith(cls.id_prefix)}
+        groups = {principal[len(cls.group_prefix):] for principal in principals
+                  if principal.startswith(cls.group_prefix)}
+
+        def match(policy, user):
+            return (policy.id_prefix + str(user.pk) in ids
+                    or any(group in groups for group in policy.get_user_group_values(user)))
+
+        return match
+
+    @classmethod
+    def _compile_condition(cls, condition):
+        tokens = _TOKENS.findall(condition)
+        position = 0
+
+        def peek():
+            return tokens[position] if position < len(tokens) else None
+
+        def take():
+            nonlocal position
+            position += 1
+            return tokens[position - 1]
+
+        def parse_or():
+            operands = [parse_and()]
+            while peek() == 'or':
+                take()
+                operands.append(parse_and())
+            return operands[0] if len(operands) == 1 else (
+                lambda *args: any(operand(*args) for operand in operands))
+
+        def parse_and():
+            operands = [parse_not()]
+            while peek() == 'and':
+                take()
+                operands.append(parse_not())
+            return operands[0] if len(operands) == 1 else (
+                lambda *args: all(operand(*args) for operand in operands))
+
+        def parse_not():
+            if peek() == 'not':
+                take()
+                operand = parse_not()
+                return lambda *args: not operand(*args)
+            if peek() == '(':
+                take()
+                operand = parse_or()
+                if take() != ')':
+                    raise AccessPolicyException(f'Unbalanced parentheses in condition {condition!r}')
+                return operand
+            if peek() is None:
+                raise AccessPolicyException(f'Incomplete condition {condition!r}')
+            return cls._bind_condition(take())
+
+        expression = parse_or()
+        if peek() is not None:
+            raise AccessPolicyException(f'Unexpected {peek()!r} in condition {condition!r}')
+        return expression
+
+    @classmethod
+    def _bind_condition(cls, operand):
+        method_name, _, arg = operand.partition(':')
+        args = (arg, ) if arg else ()
+
+        try:
+            method = cls._get_condition_method(cls, method_name)
+        except AccessPolicyException as e:
+            # raised when the condition is evaluated, as AccessPolicy does
+            error, with_policy = e, False
+
+            def method(*args):
+                raise error
+        else:
+            # instance methods are called on the policy, static and class methods and reusable conditions without it
+            with_policy = inspect.isfunction(inspect.getattr_static(cls, method_name, None))
+
+        def check(policy, request, view, action):
+            if with_policy:
+                result = method(policy, request, view, action, *args)
+            else:
+                result = method(request, view, action, *args)
+            if type(result) is not bool:
+                raise AccessPolicyException(f"condition '{operand}' must return true/false, not {type(result)}")
+            return result
+
+        return check
+
+    def has_permission(self, request, view) -> bool:
+        if type(self).get_policy_statements is not AccessPolicy.get_policy_statements:
+            return super().has_permission(request, view)
+
+        action = self._get_invoked_action(view)
+        statements = [*self._table.get(action, ()), *self._table.get('*', ()),
+                      *self._table.get(f'<method:{request.method.lower()}>', ())]
+        if request.method in SAFE_METHODS:
+            statements.extend(self._table.get('<safe_methods>', ()))
+
+        allowed = False
+        for allow, principal, conditions in statements:
+            if allowed and allow:
+                continue
+            if (principal(self, request.user)
+                    and all(condition(self, request, view, action) for condition in conditions)):
+                if not allow:
+                    return False
+                allowed = True
+
+        return allowed
@@ -4,22 +4,91 @@ from https://djangosnippets.org/snippets/2594/
 
 from django.conf import settings
 from django.contrib.auth.backends import ModelBackend
-from django.contrib.auth.models import User
-from django.db.models.signals import pre_save
-from django.dispatch.dispatcher import receiver
+from django.core.cache import caches
+from django.db import transaction
 from django.contrib.auth import get_user_model
 
+from application.checks import is_per_process_cache
+from application.versions import bump_table_versions, get_table_versions
+
+# versions the cached permission sets are keyed on: one per user and one for all groups and permissions
+GROUP_PERMISSIONS_VERSION = 'auth-permissions:groups'
+
+# permissions of the anonymous user shared by all requests of the process, see clear_anonymous_permissions
+_anonymous_permissions = {'generation': 0, 'permissions': None}
+
+
+def clear_anonymous_permissions():
+    """
+    drops the cached permissions of the anonymous user, now and once the transaction commits
+
+    A generation counter keeps permissions loaded before the change from being cached after it.
+    """
+    def clear():
+        _anonymous_permissions['generation'] += 1
+        _anonymous_permissions['permissions'] = None
+
+    clear()
+    transaction.on_commit(clear)
+
+
+def _user_permissions_version(user_id):
+    return f'auth-permissions:user:{user_id}'
+
+
+def bump_permission_versions(user_ids=(), groups=False):
+    """bump now and again on commit, so that a reader of the uncommitted state does not cache it for long"""
+    versions = [_user_permissions_version(user_id) for user_id in user_ids]
+    if groups:
+        versions.append(GROUP_PERMISSIONS_VERSION)
+    if versions:
+        bump_table_versions(*versions)
+        transaction.on_commit(lambda: bump_table_versions(*versions))
+
 
 class AnonymousUserBackend(ModelBackend):
+    """
+    permissions of the anonymous user are the ones of the user named settings.ANONYMOUS_USER_NAME
+
+    Permission sets of users are loaded once per request and cached across requests until the version of the user
+    or of the groups changes, if settings.PERMISSIONS_CACHE and settings.VERSIONS_CACHE are shared by all processes.
+    """
+
+    def _get_anonymous_permissions(self):
+        permissions = _anonymous_permissions['permissions']
+        if permissions is None:
+            generation = _anonymous_permissions['generation']
+            anon_user = get_user_model().objects.get(username=settings.ANONYMOUS_USER_NAME)
+            permissions = frozenset(self.get_all_permissions(anon_user))
+            if _anonymous_permissions['generation'] == generation:
+                _anonymous_permissions['permissions'] = permissions
+        return permissions
+
+    def _get_cached_permissions(self, user_obj):
+        if is_per_process_cache(settings.PERMISSIONS_CACHE) or is_per_process_cache(settings.VERSIONS_CACHE):
+            # other processes would not see the bumped versions
+            return frozenset(super(AnonymousUserBackend, self).get_all_permissions(user_obj))
+
+        versions = get_table_versions([_user_permissions_version(user_obj.pk), GROUP_PERMISSIONS_VERSION])
+        key = f'auth-permissions:{user_obj.pk}:{":".join(versions)}'
+
+        cache = caches[settings.PERMISSIONS_CACHE]
+        permissions = cache.get(key)
+        if permissions is None:
+            permissions = frozenset(super(AnonymousUserBackend, self).get_all_permissions(user_obj))
+            cache.set(key, permissions, timeout=settings.PERMISSIONS_CACHE_TIMEOUT)
+        return permissions
 
     def get_all_permissions(self, user_obj, obj=None):
         if user_obj.is_anonymous:
-            if not hasattr(user_obj, '_perm_cache'):
-                anon_user_name = settings.ANONYMOUS_USER_NAME
-                anon_user = get_user_model().objects.get(username=anon_user_name)
-                user_obj._perm_cache = self.get_all_permissions(anon_user, obj=obj)
-            return user_obj._perm_cache
-        return super(AnonymousUserBackend, self).get_all_permissions(user_obj, obj=obj)
+            if obj is not None:
+                return set()
+            return self._get_anonymous_permissions()
+        if not user_obj.is_active or obj is not None:
+            return set()
+        if not hasattr(user_obj, '_perm_cache'):
+            user_obj._perm_cache = self._get_cached_permissions(user_obj)
+        return user_obj._perm_cache
 
     def authenticate(self, request, username=None, password=None, **kwargs):
         if username == settings.ANONYMOUS_USER_NAME:
@@ -32,8 +101,30 @@ class AnonymousUserBackend(ModelBackend):
         return perm in self.get_all_permissions(user_obj, obj=obj)
 
 
-@receiver(pre_save, sender=User)
 def disable_anon_user_password_save(sender, **kwargs):
     instance = kwargs['instance']
     if instance.username == settings.ANONYMOUS_USER_NAME and instance.password != settings.UNUSABLE_PASSWORD:
         raise ValueError("Can't set anonymous user password to something other than unusable password")
+
+
+def clear_permissions_on_group_change(sender, **kwargs):
+    clear_anonymous_permissions()
+    bump_permission_versions(groups=True)
+
+
+def clear_permissions_on_user_grants_change(sender, instance, reverse, pk_set, **kwargs):
+    clear_anonymous_permissions()
+    if not reverse:
+        bump_permission_versions(user_ids=[instance.pk])
+    elif pk_set is not None:
+        bump_permission_versions(user_ids=pk_set)
+    else:
+        # users cleared from a group or a permission are not known any more
+        bump_permission_versions(groups=True)
+
+
+def clear_permissions_on_user_change(sender, instance, **kwargs):
+    # e.g. is_superuser decides as well
+    if instance.username == settings.ANONYMOUS_USER_NAME:
+        clear_anonymous_permissions()
+    bump_permission_versions(user_ids=[instance.pk])
@@ -0,0 +1,23 @@
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.checks import Error
+
+# settings naming the caches which every process must share, e.g. to see a revocation made by another one
+SHARED_CACHE_SETTINGS = ('OAUTH2_TOKEN_CACHE', 'PERMISSIONS_CACHE', 'VERSIONS_CACHE', 'RESPONSE_CACHE',
+                         'PAGINATION_COUNT_CACHE', 'SESSION_CACHE_ALIAS', 'IDEMPOTENCY_CACHE')
+
+
+def is_per_process_cache(alias):
+    return isinstance(caches[alias], LocMemCache)
+
+
+def check_shared_caches(app_configs, **kwargs):
+    """deployment check, the default in-process caches are only correct with a single process"""
+    return [
+        Error(f'{name} must be a cache shared by all processes, {settings.CACHES[getattr(settings, name)]["BACKEND"]} '
+              f'is kept by each process.',
+              hint=f'Point the {getattr(settings, name)!r} cache to a shared backend, e.g. Redis or Memcached.',
+              id='application.E001')
+        for name in SHARED_CACHE_SETTINGS if is_per_process_cache(getattr(settings, name))
+    ]
@@ -0,0 +1,62 @@
+import hashlib
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.utils import timezone
+from oauth2_provider.models import get_access_token_model
+from oauth2_provider.oauth2_validators import OAuth2Validator
+
+from application.checks import is_per_process_cache
+
+
+def _access_token_key(token):
+    return f'oauth2-access-token:{hashlib.sha256(token.encode()).hexdigest()}'
+
+
+def forget_access_tokens(tokens):
+    """drops validated access tokens from the cache, now and again on commit"""
+    keys = [_access_token_key(token) for token in tokens]
+    if keys:
+        caches[settings.OAUTH2_TOKEN_CACHE].delete_many(keys)
+        transaction.on_commit(lambda: caches[settings.OAUTH2_TOKEN_CACHE].delete_many(keys))
+
+
+class CachedOAuth2Validator(OAuth2Validator):
+    """
+    validator caching access tokens with their application and user, so that a bearer request needs no query
+
+    An entry lives until the token expires, settings.OAUTH2_TOKEN_CACHE_TIMEOUT at most, and is dropped when the token,
+    its application or its user is saved or deleted, e.g. revoked. Nothing is cached in a per-process cache, other
+    processes would not see the revocation.
+    """
+
+    def _load_access_token(self, token):
+        if is_per_process_cache(settings.OAUTH2_TOKEN_CACHE):
+            return super()._load_access_token(token)
+
+        cache = caches[settings.OAUTH2_TOKEN_CACHE]
+        key = _access_token_key(token)
+
+        access_token = cache.get(key)
+        if access_token is None:
+            access_token = super()._load_access_token(token)
+            if access_token is not None and access_token.expires is not None:
+                timeout = min(settings.OAUTH2_TOKEN_CACHE_TIMEOUT,
+                              int((access_token.expires - timezone.now()).total_seconds()))
+                if timeout > 0:
+                    cache.set(key, access_token, timeout=timeout)
+        return access_token
+
+
+def forget_access_token_receiver(sender, instance, **kwargs):
+    forget_access_tokens([instance.token])
+
+
+def forget_application_tokens_receiver(sender, instance, **kwargs):
+    forget_access_tokens(get_access_token_model().objects.filter(application=instance)
+                         .values_list('token', flat=True))
+
+
+def forget_user_tokens_receiver(sender, instance, **kwargs):
+    forget_access_tokens(get_access_token_model().objects.filter(user=instance).values_list('token', flat=True))
@@ -1,5 +1,285 @@
-from rest_framework.pagination import PageNumberPagination
+import hashlib
+from collections import OrderedDict
+from functools import partial, reduce
+from operator import and_, or_
+
+from django.conf import settings
+from django.core import signing
+from django.core.cache import caches
+from django.core.exceptions import EmptyResultSet, FieldDoesNotExist, ValidationError
+from django.core.paginator import Paginator as DjangoPaginator
+from django.db.models import Q
+from django.utils.functional import cached_property
+from django.utils.translation import gettext_lazy as _
+from rest_framework import exceptions
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination, _positive_int
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+from .versions import get_table_versions
+
+COUNT_EXACT = 'exact'
+COUNT_CACHED = 'cached'
+COUNT_ESTIMATE = 'estimate'
+
+
+class CountingPaginator(DjangoPaginator):
+    """
+    paginator which counts exactly, caches exact counts or bounds them
+
+    Cached counts are keyed on the SQL and the versions of the tables it reads, so any write to them expires
+    the count. Tables read only in subqueries are not tracked, their changes are seen after the cache timeout.
+    Estimated counts scan at most `count_limit` rows past the requested page, `count_exact` tells when they are bound.
+    """
+
+    def __init__(self, *args, count_mode=COUNT_EXACT, count_limit=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.count_mode = count_mode
+        self.count_limit = settings.PAGINATION_COUNT_LIMIT if count_limit is None else count_limit
+        self.count_exact = True
+        self.requested_number = 1
+
+    def page(self, number):
+        self.requested_number = number
+        return super().page(number)
+
+    @cached_property
+    def count(self):
+        if not hasattr(self.object_list, 'query') or self.count_mode == COUNT_EXACT:
+            return super().count
+        if self.count_mode == COUNT_ESTIMATE:
+            return self._estimate_count()
+        return self._cached_count()
+
+    def _estimate_count(self):
+        try:
+            number = max(int(self.requested_number), 1)
+        except (TypeError, ValueError):
+            number = 1
+
+        bound = (number - 1) * self.per_page + max(self.count_limit, self.per_page + 1)
+        count = self.object_list.order_by()[:bound + 1].count()
+        self.count_exact = count <= bound
+        return min(count, bound)
+
+    def _cached_count(self):
+        query = self.object_list.order_by().query
+        try:
+            sql, params = query.sql_with_params()
+        except EmptyResultSet:
+            return 0
+        tables = sorted({alias.table_name for alias in query.alias_map.values()})
+        signature = repr((sql, params, get_table_versions(tables)))
+        key = 'pagination-count:' + hashlib.sha256(signature.encode()).hexdigest()
+
+        cache = caches[settings.PAGINATION_COUNT_CACHE]
+        count = cache.get(key)
+        if count is None:
+            count = super().count
+            cache.set(key, count, timeout=settings.PAGINATION_COUNT_CACHE_TIMEOUT)
+        return count
 
 
 class PageSizeNumberPagination(PageNumberPagination):
+    """
+    page number pagination, views choose how the total is counted with `pagination_count`
+
+    The count is `exact`, `cached` until the counted tables change or an `estimate` bounded by PAGINATION_COUNT_LIMIT.
+    """
+
     page_size_query_param = 'page_size'
+    count_mode = settings.PAGINATION_COUNT
+
+    def paginate_queryset(self, queryset, request, view=None):
+        count_mode = getattr(view, 'pagination_count', self.count_mode)
+        self.django_paginator_class = partial(CountingPaginator, count_mode=count_mode)
+        return super().paginate_queryset(queryset, request, view=view)
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('count', self.page.paginator.count),
+            ('count_exact', self.page.paginator.count_exact),
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data)
+        ]))
+
+    def get_paginated_response_schema(self, schema):
+        response_schema = super().get_paginated_response_schema(schema)
+        response_schema['properties']['count_exact'] = {'type': 'boolean', 'example': True}
+        return response_schema
+
+
+class KeysetPagination(BasePagination):
+    """
+    cursor pagination keyed on the queryset ordering, `id` breaks ties
+
+    Pages are selected with a WHERE on the ordering values of the last (or first) row, so deep pages cost
+    as much as the first one, and no COUNT is made. Cursors are signed and bound to the ordering.
+    Only non-null columns of the model itself can be ordered by, other orderings are rejected with 400.
+    """
+
+    cursor_query_param = 'cursor'
+    page_size = settings.REST_FRAMEWORK['PAGE_SIZE']
+    page_size_query_param = 'page_size'
+    max_page_size = settings.MAX_PAGE_SIZE
+    tie_breaker = 'id'
+    signing_salt = 'application.pagination.KeysetPagination'
+    invalid_cursor_message = _('Invalid cursor')
+    invalid_ordering_message = _('Cursor pagination can not order by {field}.')
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.ordering = self.get_ordering(queryset)
+        self.fields = [self.get_ordering_field(queryset.model, name.lstrip('-')) for name in self.ordering]
+
+        cursor = self.decode_cursor(request)
+        self.reverse = cursor is not None and cursor['reverse']
+
+        if self.reverse:
+            queryset = queryset.order_by(*[self._invert(name) for name in self.ordering])
+        else:
+            queryset = queryset.order_by(*self.ordering)
+
+        if cursor is not None:
+            queryset = queryset.filter(self._after(cursor['position']))
+
+        results = list(queryset[:self.page_size + 1])
+        self.has_more = len(results) > self.page_size
+        results = results[:self.page_size]
+        if self.reverse:
+            results.reverse()
+
+        self.has_next = self.has_more if not self.reverse else True
+        self.has_previous = self.has_more if self.reverse else cursor is not None
+        self.first, self.last = (results[0], results[-1]) if results else (None, None)
+        return results
+
+    def get_page_size(self, request):
+        try:
+            return _positive_int(request.query_params[self.page_size_query_param], strict=True,
+                                 cutoff=self.max_page_size)
+        except (KeyError, ValueError):
+            return self.page_size
+
+    def get_ordering(self, queryset):
+        ordering = [name for name in queryset.query.order_by if isinstance(name, str)]
+        if len(ordering) != len(queryset.query.order_by):
+            raise ValueError('Keyset pagination supports ordering by model fields only.')
+
+        if not any(name.lstrip('-') in (self.tie_breaker, 'pk') for name in ordering):
+            ordering.append(self.tie_breaker)
+        return [self.tie_breaker if name == 'pk' else '-' + self.tie_breaker if name == '-pk' else name
+                for name in ordering]
+
+    def get_ordering_field(self, model, name):
+        """the field of an ordering, which must be a non-null column of the model so that its values compare"""
+        try:
+            field = model._meta.get_field(name)
+        except FieldDoesNotExist:
+            field = None
+        if field is None or not field.concrete or field.null or field.is_relation and not field.many_to_one:
+            raise exceptions.ValidationError({'ordering': [self.invalid_ordering_message.format(field=name)]})
+        return field
+
+    @staticmethod
+    def _invert(name):
+        return name[1:] if name.startswith('-') else '-' + name
+
+    def _after(self, position):
+        """rows following position in the current direction: (a > x) OR (a = x AND b > y) OR ..."""
+        conditions = []
+        for idx, (name, field) in enumerate(zip(self.ordering, self.fields)):
+            descending = name.startswith('-') != self.reverse
+            lookup = 'lt' if descending else 'gt'
+            equal = [Q(**{f.attname: v}) for f, v in zip(self.fields[:idx], position[:idx])]
+            conditions.append(reduce(and_, equal + [Q(**{f'{field.attname}__{lookup}': position[idx]})]))
+        return reduce(or_, conditions)
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return None
+
+        try:
+            payload = signing.loads(encoded, salt=self.signing_salt)
+            if payload['o'] != self.ordering:
+                raise ValueError('Cursor belongs to another ordering.')
+            position = [field.to_python(value) for field, value in zip(self.fields, payload['p'])]
+            return {'position': position, 'reverse': bool(payload['r'])}
+        except (signing.BadSignature, KeyError, TypeError, ValueError, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def encode_cursor(self, instance, reverse):
+        position = [field.value_to_string(instance) for field in self.fields]
+        payload = {'o': self.ordering, 'p': position, 'r': reverse}
+        encoded = signing.dumps(payload, salt=self.signing_salt, compress=True)
+        return replace_query_param(self.request.build_absolute_uri(), self.cursor_query_param, encoded)
+
+    def get_next_link(self):
+        if not self.has_next or self.last is None:
+            return None
+        return self.encode_cursor(self.last, reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if self.first is None:
+            return remove_query_param(self.request.build_absolute_uri(), self.cursor_query_param)
+        return self.encode_cursor(self.first, reverse=True)
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data),
+        ]))
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'properties': {
+                'next': {'type': 'string', 'nullable': True},
+                'previous': {'type': 'string', 'nullable': True},
+                'results': schema,
+            },
+        }
+
+
+class SelectablePagination(BasePagination):
+    """
+    page number pagination unless keyset pagination is selected
+
+    A view selects it with `pagination_mode = 'cursor'`, a request with `?pagination=cursor` or by passing a cursor.
+    """
+
+    mode_query_param = 'pagination'
+    page_number_class = PageSizeNumberPagination
+    keyset_class = KeysetPagination
+
+    def __init__(self):
+        self.paginator = None
+
+    def get_paginator(self, request, view):
+        mode = request.query_params.get(self.mode_query_param) or getattr(view, 'pagination_mode', 'page')
+        if self.keyset_class.cursor_query_param in request.query_params:
+            mode = 'cursor'
+        return self.keyset_class() if mode == 'cursor' else self.page_number_class()
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.paginator = self.get_paginator(request, view)
+        return self.paginator.paginate_queryset(queryset, request, view=view)
+
+    def get_paginated_response(self, data):
+        return self.paginator.get_paginated_response(data)
+
+    def get_paginated_response_schema(self, schema):
+        return self.page_number_class().get_paginated_response_schema(schema)
+
+    def get_schema_fields(self, view):
+        return self.page_number_class().get_schema_fields(view)
+
+    def get_schema_operation_parameters(self, view):
+        return self.page_number_class().get_schema_operation_parameters(view)
@@ -0,0 +1,55 @@
+"""
+session engine of the store: the database write-through cached in settings.SESSION_CACHE_ALIAS
+
+Requests with a session cookie read the session from the cache, the database is read only when the cache misses.
+A session marked as modified is written only when its data changed, so requests which set a value to what it was
+do not update the row. The cache must be shared by all processes, a logout or a flush in one process would not
+reach the cache of another one, so sessions are not cached in a per-process cache, see application.checks.
+"""
+from django.conf import settings
+from django.contrib.sessions.backends.cached_db import SessionStore as CachedDBStore
+from django.core.cache.backends.dummy import DummyCache
+from django.utils import timezone
+
+from application.checks import is_per_process_cache
+
+KEY_PREFIX = 'application.sessions'
+
+
+class SessionStore(CachedDBStore):
+    cache_key_prefix = KEY_PREFIX
+
+    def __init__(self, session_key=None):
+        super().__init__(session_key)
+        if is_per_process_cache(settings.SESSION_CACHE_ALIAS):
+            # every read and write goes to the database, as with the db engine
+            self._cache = DummyCache(settings.SESSION_CACHE_ALIAS, {})
+        self._stored = None
+
+    def _dumps(self, data):
+        return self.serializer().dumps(data)
+
+    def load(self):
+        data = super().load()
+        self._stored = self._dumps(data) if data else None
+        return data
+
+    def save(self, must_create=False):
+        if (not must_create and self.session_key is not None and self._stored is not None
+                and not settings.SESSION_SAVE_EVERY_REQUEST
+                and self._dumps(self._get_session(no_load=True)) == self._stored):
+            return
+        super().save(must_create)
+        self._stored = self._dumps(self._get_session(no_load=True))
+
+    @classmethod
+    def clear_expired(cls):
+        """deletes expired sessions in batches of settings.SESSION_CLEANUP_BATCH_SIZE, not in one long transaction"""
+        model = cls.get_model_class()
+        now = timezone.now()
+        while True:
+            keys = list(model.objects.filter(expire_date__lt=now)
+                        .values_list('session_key', flat=True)[:settings.SESSION_CLEANUP_BATCH_SIZE])
+            if not keys:
+                return
+            model.objects.filter(session_key__in=keys).delete()
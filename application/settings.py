@@ -106,6 +106,37 @@ DATABASES = {
 }
 
 
+# Cache
+# https://docs.djangoproject.com/en/3.2/topics/cache/
+
+CACHES = {
+    'default': {
+        'BACKEND': config('CACHE_BACKEND', default='django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': config('CACHE_LOCATION', default=''),
+    },
+    'idempotency': {
+        'BACKEND': config('IDEMPOTENCY_CACHE_BACKEND', default='django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': config('IDEMPOTENCY_CACHE_LOCATION', default='idempotency'),
+        'TIMEOUT': config('IDEMPOTENCY_KEY_TIMEOUT', default=24 * 60 * 60, cast=int),
+        'OPTIONS': {'MAX_ENTRIES': config('IDEMPOTENCY_KEY_MAX_ENTRIES', default=10_000, cast=int)},
+    },
+    'sessions': {
+        'BACKEND': config('SESSION_CACHE_BACKEND', default='django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': config('SESSION_CACHE_LOCATION', default='sessions'),
+        'OPTIONS': {'MAX_ENTRIES': config('SESSION_CACHE_MAX_ENTRIES', default=10_000, cast=int)},
+    },
+}
+
+
+# Sessions
+# https://docs.djangoproject.com/en/3.2/topics/http/sessions/
+
+# must be shared by all processes, sessions are not cached in a per-process cache
+SESSION_ENGINE = 'application.sessions'
+SESSION_CACHE_ALIAS = 'sessions'
+SESSION_CLEANUP_BATCH_SIZE = config('SESSION_CLEANUP_BATCH_SIZE', default=1000, cast=int)
+
+
 # Password validation
 # https://docs.djangoproject.com/en/3.2/ref/settings/#auth-password-validators
 
@@ -151,16 +182,20 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 OAUTH2_PROVIDER = {
     # this is the list of available scopes
-    'SCOPES': {'read': 'Read scope', 'write': 'Write scope', 'groups': 'Access to your groups'}
+    'SCOPES': {'read': 'Read scope', 'write': 'Write scope', 'groups': 'Access to your groups'},
+    'OAUTH2_VALIDATOR_CLASS': 'application.oauth2.CachedOAuth2Validator',
 }
+# must be shared by all processes, access tokens are not cached in a per-process cache
+OAUTH2_TOKEN_CACHE = 'default'
+OAUTH2_TOKEN_CACHE_TIMEOUT = config('OAUTH2_TOKEN_CACHE_TIMEOUT', default=300, cast=int)
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
         'oauth2_provider.contrib.rest_framework.OAuth2Authentication',
         'rest_framework.authentication.SessionAuthentication',
     ),
-    'DEFAULT_PAGINATION_CLASS': 'application.pagination.PageSizeNumberPagination',
-    'DEFAULT_FILTER_BACKENDS': ['django_filters.rest_framework.DjangoFilterBackend',
+    'DEFAULT_PAGINATION_CLASS': 'application.pagination.SelectablePagination',
+    'DEFAULT_FILTER_BACKENDS': ['store.filters.FilterBackend',
                                 'rest_framework.filters.OrderingFilter'],
     'PAGE_SIZE': config('PAGE_SIZE', default=30, cast=int),
     'DEFAULT_THROTTLE_CLASSES': [
@@ -172,16 +207,44 @@ REST_FRAMEWORK = {
         'user': '1000/day',
     },
 }
+MAX_PAGE_SIZE = config('MAX_PAGE_SIZE', default=100, cast=int)
+# exact, cached (exact counts cached until the counted tables change) or estimate (counts bounded by the limit)
+PAGINATION_COUNT = config('PAGINATION_COUNT', default='exact')
+PAGINATION_COUNT_LIMIT = config('PAGINATION_COUNT_LIMIT', default=1000, cast=int)
+# the caches keyed on table versions must be shared by all processes, otherwise a process serves its cached counts
+# and responses until they time out after another one changed the tables, see application.checks
+PAGINATION_COUNT_CACHE = 'default'
+PAGINATION_COUNT_CACHE_TIMEOUT = config('PAGINATION_COUNT_CACHE_TIMEOUT', default=300, cast=int)
+VERSIONS_CACHE = 'default'
+RESPONSE_CACHE = 'default'
+RESPONSE_CACHE_TIMEOUT = config('RESPONSE_CACHE_TIMEOUT', default=300, cast=int)
+# must be shared by all processes with VERSIONS_CACHE, permissions are not cached in a per-process cache
+PERMISSIONS_CACHE = 'default'
+PERMISSIONS_CACHE_TIMEOUT = config('PERMISSIONS_CACHE_TIMEOUT', default=300, cast=int)
 
 AUTHENTICATION_BACKENDS = ['application.authentication.AnonymousUserBackend']
 ANONYMOUS_USER_NAME = config('ANONYMOUS_USER_NAME', default='AnonymousUser')
 UNUSABLE_PASSWORD = config('UNUSABLE_PASSWORD', default='')
 
-ANONYMOUS_ORDER_ID_GENERATION_ITERATIONS = config('ANONYMOUS_ORDER_ID_GENERATION_ITERATIONS', default=20, cast=int)
-ANONYMOUS_ORDER_ID_GENERATION_RANGE = config('ANONYMOUS_ORDER_ID_GENERATION_RANGE', default='1000_000, 9000_000', cast=Csv(int))
+ORDER_ID_ALLOCATOR = config('ORDER_ID_ALLOCATOR', default='store.order_ids.PermutationOrderIdAllocator')
+ORDER_ID_GENERATION_RANGE = config('ORDER_ID_GENERATION_RANGE', default='1000_000, 9000_000', cast=Csv(int))
+ORDER_BULK_MAX_SIZE = config('ORDER_BULK_MAX_SIZE', default=100, cast=int)
+ORDER_TRANSITION_MAX_SIZE = config('ORDER_TRANSITION_MAX_SIZE', default=1000, cast=int)
+
+# anonymous buyers access their orders with signed tokens, see store.order_access
+ORDER_ACCESS_MAX_ORDERS = config('ORDER_ACCESS_MAX_ORDERS', default=100, cast=int)
+ORDER_ACCESS_TOKEN_MAX_AGE = config('ORDER_ACCESS_TOKEN_MAX_AGE', default=30 * 24 * 60 * 60, cast=int)
+
+# must be shared by all processes, a retried request may reach another process
+IDEMPOTENCY_CACHE = 'idempotency'
 
 EMAIL_HOST = config('EMAIL_HOST')
 EMAIL_PORT = config('EMAIL_PORT', cast=int)
 EMAIL_HOST_USER = config('EMAIL_HOST_USER')
 EMAIL_HOST_PASSWORD = config('EMAIL_HOST_PASSWORD')
 EMAIL_USE_TLS = config('EMAIL_USE_TLS', default=True, cast=bool)
+
+EMAIL_OUTBOX_MAX_ATTEMPTS = config('EMAIL_OUTBOX_MAX_ATTEMPTS', default=5, cast=int)
+EMAIL_OUTBOX_RETRY_DELAY = config('EMAIL_OUTBOX_RETRY_DELAY', default=60, cast=int)
+EMAIL_OUTBOX_LEASE = config('EMAIL_OUTBOX_LEASE', default=5 * 60, cast=int)
+EMAIL_TEMPLATES_TTL = config('EMAIL_TEMPLATES_TTL', default=60, cast=int)
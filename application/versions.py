@@ -0,0 +1,100 @@
+import uuid
+
+from django.apps import apps
+from django.conf import settings
+from django.core.cache import caches
+from django.db import models, transaction
+
+
+def _version_key(table):
+    return f'table-version:{table}'
+
+
+def get_table_versions(tables):
+    """
+    current versions of the tables, cached data derived from the tables is keyed on them
+
+    A version is a random token, so that a missing (never bumped or evicted) version never repeats an old one
+    and a bump is a single atomic set with any cache backend.
+    """
+    cache = caches[settings.VERSIONS_CACHE]
+    keys = {table: _version_key(table) for table in tables}
+    versions = cache.get_many(keys.values())
+
+    for table, key in keys.items():
+        if key not in versions:
+            cache.add(key, uuid.uuid4().hex, timeout=None)
+            versions[key] = cache.get(key)
+
+    return tuple(versions[keys[table]] for table in tables)
+
+
+def bump_table_versions(*tables):
+    cache = caches[settings.VERSIONS_CACHE]
+    cache.set_many({_version_key(table): uuid.uuid4().hex for table in tables}, timeout=None)
+
+
+def bump_model_version(model):
+    """bump now and again on commit, so that a reader of the uncommitted state does not cache it for long"""
+    table = model._meta.db_table
+    bump_table_versions(table)
+    transaction.on_commit(lambda: bump_table_versions(table))
+
+
+def bump_model_version_receiver(sender, **kwargs):
+    bump_model_version(sender)
+
+
+def bump_deleted_versions(model, deleted):
+    """bump the table of the model and the ones a delete cascaded to, `deleted` is the count per label it returns"""
+    tables = {model._meta.db_table}
+    tables.update(apps.get_model(label)._meta.db_table for label, count in deleted.items() if count)
+    bump_table_versions(*tables)
+    transaction.on_commit(lambda: bump_table_versions(*tables))
+
+
+class VersionedModel(models.Model):
+    """
+    bumps the table versions on deletes, cascades included
+
+    Deletes need no post_delete receiver to bump versions, so that the rows of models without one are fast deleted.
+    """
+
+    class Meta:
+        abstract = True
+
+    def delete(self, *args, **kwargs):
+        result = super().delete(*args, **kwargs)
+        bump_deleted_versions(type(self), result[1])
+        return result
+
+
+class VersionedQuerySet(models.QuerySet):
+    """bumps the table version on bulk writes, which do not send model signals, and on deletes with cascades"""
+
+    def update(self, **kwargs):
+        rows = super().update(**kwargs)
+        bump_model_version(self.model)
+        return rows
+
+    update.alters_data = True
+
+    def delete(self):
+        result = super().delete()
+        bump_deleted_versions(self.model, result[1])
+        return result
+
+    delete.alters_data = True
+    delete.queryset_only = True
+
+    def bulk_create(self, objs, *args, **kwargs):
+        objs = super().bulk_create(objs, *args, **kwargs)
+        bump_model_version(self.model)
+        return objs
+
+    def bulk_update(self, objs, fields, *args, **kwargs):
+        rows = super().bulk_update(objs, fields, *args, **kwargs)
+        bump_model_version(self.model)
+        return rows
+
+    bulk_update.alters_data = True
@@ -1,5 +1,6 @@
 from django.apps import AppConfig
-from django.db.models.signals import post_migrate
+from django.core import checks
+from django.db.models.signals import m2m_changed, post_migrate, post_save, post_delete, pre_save
 from django_registration import signals
 
 
@@ -9,5 +10,41 @@ class StoreConfig(AppConfig):
 
     def ready(self):
         from .initialization import populate_models, handle_new_buyer
+        from application.authentication import (clear_permissions_on_group_change,
+                                                clear_permissions_on_user_change,
+                                                clear_permissions_on_user_grants_change,
+                                                disable_anon_user_password_save)
+        from application.checks import check_shared_caches
+        from application.oauth2 import (forget_access_token_receiver, forget_application_tokens_receiver,
+                                        forget_user_tokens_receiver)
+        from application.versions import bump_model_version_receiver
+        from django.contrib.auth import get_user_model
+        from django.contrib.auth.models import Group, Permission
+        from oauth2_provider.models import get_access_token_model, get_application_model
+        from .models import CatalogChange, Good, Offer, Order, Purchase, Settings
+        from .utils import reset_email_templates
+        checks.register(check_shared_caches, checks.Tags.caches, deploy=True)
         post_migrate.connect(populate_models, sender=self)
+        user_model = get_user_model()
+        pre_save.connect(disable_anon_user_password_save, sender=user_model)
+        m2m_changed.connect(clear_permissions_on_group_change, sender=Group.permissions.through)
+        post_delete.connect(clear_permissions_on_group_change, sender=Group)
+        post_save.connect(clear_permissions_on_group_change, sender=Permission)
+        post_delete.connect(clear_permissions_on_group_change, sender=Permission)
+        m2m_changed.connect(clear_permissions_on_user_grants_change, sender=user_model.groups.through)
+        m2m_changed.connect(clear_permissions_on_user_grants_change, sender=user_model.user_permissions.through)
+        post_save.connect(clear_permissions_on_user_change, sender=user_model)
+        post_delete.connect(clear_permissions_on_user_change, sender=user_model)
         signals.user_registered.connect(handle_new_buyer)
+        post_save.connect(reset_email_templates, sender=Settings)
+        post_delete.connect(reset_email_templates, sender=Settings)
+        # deletes bump versions themselves, see application.versions.VersionedModel
+        for model in (Good, Offer, Order, Purchase):
+            post_save.connect(bump_model_version_receiver, sender=model)
+        for model in (Good, Offer):
+            post_save.connect(CatalogChange.log_save, sender=model)
+            post_delete.connect(CatalogChange.log_delete, sender=model)
+        post_save.connect(forget_access_token_receiver, sender=get_access_token_model())
+        post_delete.connect(forget_access_token_receiver, sender=get_access_token_model())
+        post_save.connect(forget_application_tokens_receiver, sender=get_application_model())
+        post_save.connect(forget_user_tokens_receiver, sender=user_model)
@@ -1 +1,3 @@
 ORDER_IDS_SESSION_PARAM_NAME = 'order_ids'
+ORDER_ACCESS_COOKIE_NAME = 'order_access'
+ORDER_ACCESS_HEADER = 'X-Order-Access'
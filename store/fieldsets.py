@@ -0,0 +1,162 @@
+"""
+sparse fieldsets: `?fields=id,price,good.name` selects the rendered fields, `?expand=good` renders a nested object
+
+Without either parameter everything is rendered. With one of them, plain fields are limited to the ones in `fields`
+(all of them when it is missing) and nested objects are rendered only when they are expanded or named in `fields`,
+at every level: `?expand=purchases.good`.
+
+A selection is a tuple of (name, None) pairs for plain fields and (name, selection) pairs for nested objects, in
+the order of the serializer fields, so it can key caches.
+"""
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Prefetch
+from django.utils.translation import gettext_lazy as _
+from rest_framework import serializers
+from rest_framework.exceptions import ValidationError
+
+
+def _node():
+    return {'fields': None, 'expand': {}}
+
+
+def _paths(value):
+    return [path.strip() for path in (value or '').split(',') if path.strip()]
+
+
+def _nested(field):
+    field = field.child if isinstance(field, serializers.ListSerializer) else field
+    return field if isinstance(field, serializers.BaseSerializer) else None
+
+
+def parse_selection(serializer, fields=None, expand=None):
+    """the selection of the `fields` and `expand` parameter values, None renders everything"""
+    if fields is None and expand is None:
+        return None
+
+    root = _node()
+    if fields is not None:
+        root['fields'] = set()
+    for path in _paths(fields):
+        node = root
+        *relations, name = path.split('.')
+        for relation in relations:
+            if node['fields'] is None:
+                node['fields'] = set()
+            node = node['expand'].setdefault(relation, _node())
+        if node['fields'] is None:
+            node['fields'] = set()
+        node['fields'].add(name)
+
+    for path in _paths(expand):
+        node = root
+        for relation in path.split('.'):
+            node = node['expand'].setdefault(relation, _node())
+
+    return _resolve(serializer, root, '')
+
+
+def _resolve(serializer, node, prefix):
+    names = [name for name, field in serializer.fields.items() if not field.write_only]
+
+    unknown = (node['fields'] or set()) | set(node['expand'])
+    unknown.difference_update(names)
+    if unknown:
+        raise ValidationError({'fields': [_('Unknown field: {path}.').format(path=f'{prefix}{name}')
+                                          for name in sorted(unknown)]})
+
+    selection = []
+    for name in names:
+        nested = _nested(serializer.fields[name])
+        if nested is not None:
+            if name in node['expand'] or name in (node['fields'] or ()):
+                selection.append((name, _resolve(nested, node['expand'].get(name, _node()), f'{prefix}{name}.')))
+        elif name in node['expand']:
+            raise ValidationError({'expand': [_('Not a nested object: {path}.').format(path=f'{prefix}{name}')]})
+        elif node['fields'] is None or name in node['fields']:
+            selection.append((name, None))
+
+    return tuple(selection)
+
+
+def selects(selection, path):
+    """whether the nested objects a dotted attribute path goes through are selected"""
+    *relations, name = path.split('.')
+    for relation in relations:
+        selection = dict(selection).get(relation)
+        if selection is None:
+            return False
+    return True
+
+
+def prune(serializer, selection):
+    """drops the fields the selection does not have from the serializer and its nested serializers"""
+    selected = dict(selection)
+    for name in list(serializer.fields):
+        if name not in selected:
+            del serializer.fields[name]
+
+    for name, nested_selection in selection:
+        if nested_selection is not None:
+            prune(_nested(serializer.fields[name]), nested_selection)
+
+
+def narrow(queryset, serializer, selection, columns=True):
+    """
+    drops the eager loading of the nested objects which were not selected and, with `columns`, defers the columns
+    no selected field reads
+
+    `serializer` is the pruned serializer of the queryset.
+    """
+    sources = {serializer.fields[name].source for name, nested_selection in selection
+               if nested_selection is not None}
+
+    select_related = [lookup for lookup in getattr(serializer, 'select_related', ())
+                      if lookup.split('__')[0] in sources]
+    if getattr(serializer, 'select_related', ()):
+        queryset = queryset.select_related(None)
+        if select_related:
+            queryset = queryset.select_related(*select_related)
+
+    prefetch_related = [lookup for lookup in getattr(serializer, 'prefetch_related', ())
+                        if (lookup.prefetch_through if isinstance(lookup, Prefetch) else lookup).split('__')[0]
+                        in sources]
+    if getattr(serializer, 'prefetch_related', ()):
+        queryset = queryset.prefetch_related(None)
+        if prefetch_related:
+            queryset = queryset.prefetch_related(*prefetch_related)
+
+    if columns:
+        only = _columns(queryset.model, serializer, selection, '', set(select_related))
+        if only is not None:
+            queryset = queryset.only(*only)
+
+    return queryset
+
+
+def _columns(model, serializer, selection, prefix, select_related):
+    """the only() lookups of the selection, None when a field is not a column, e.g. a method field"""
+    columns = []
+    for name, nested_selection in selection:
+        source = serializer.fields[name].source
+        if source == '*' or '.' in source:
+            return None
+
+        try:
+            model_field = model._meta.get_field(source)
+        except FieldDoesNotExist:
+            return None
+
+        if nested_selection is not None and (model_field.many_to_many or model_field.one_to_many):
+            continue  # prefetched
+        if not model_field.concrete:
+            return None
+        columns.append(prefix + source)
+
+        if nested_selection is not None and f'{prefix}{source}' in select_related:
+            nested = _columns(model_field.related_model, _nested(serializer.fields[name]), nested_selection,
+                              f'{prefix}{source}__', select_related)
+            if nested is None:
+                return None
+            columns.extend(nested)
+
+    return columns
@@ -0,0 +1,42 @@
+from functools import lru_cache
+
+from django_filters import FilterSet, IsoDateTimeFilter
+from django_filters.rest_framework import DjangoFilterBackend
+
+from store.models import TimestampedModel
+
+
+class TimestampedFilterSet(FilterSet):
+    """
+    created_after and updated_after filters for polling clients
+
+    Bounds are inclusive, so a client polling with the last timestamp it saw may get that row again but never misses
+    a row written in the same instant.
+    """
+
+    created_after = IsoDateTimeFilter(field_name='created_at', lookup_expr='gte')
+    updated_after = IsoDateTimeFilter(field_name='updated_at', lookup_expr='gte')
+
+
+class FilterBackend(DjangoFilterBackend):
+    """adds the TimestampedFilterSet filters to the filterset_fields of views over timestamped models"""
+
+    def get_filterset_class(self, view, queryset=None):
+        if (queryset is None or not issubclass(queryset.model, TimestampedModel)
+                or getattr(view, 'filterset_class', None) is not None):
+            return super().get_filterset_class(view, queryset=queryset)
+
+        return timestamped_filterset_class(type(view), queryset.model)
+
+
+@lru_cache(maxsize=None)
+def timestamped_filterset_class(view_class, model_class):
+    """the filterset of a view over a timestamped model, built once per view class and model"""
+    filterset_fields = getattr(view_class, 'filterset_fields', None) or []
+
+    class AutoFilterSet(TimestampedFilterSet):
+        class Meta:
+            model = model_class
+            fields = filterset_fields
+
+    return AutoFilterSet
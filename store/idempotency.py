@@ -0,0 +1,120 @@
+import hashlib
+import json
+import logging
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.translation import gettext_lazy as _
+from rest_framework import status
+from rest_framework.response import Response
+from rest_framework.utils.encoders import JSONEncoder
+
+from application.checks import is_per_process_cache
+
+log = logging.getLogger(__name__)
+
+IDEMPOTENCY_KEY_HEADER = 'HTTP_IDEMPOTENCY_KEY'
+IDEMPOTENCY_KEY_MAX_LENGTH = 255
+
+# whether the process warned that its idempotency cache is not shared
+_warned_per_process = False
+
+
+class IdempotencyMixin:
+    """
+    replays the stored response of create, update and partial_update when the Idempotency-Key header repeats
+
+    Only successful responses are stored, failed requests may be retried with the same key.
+    Keys must be kept in a cache shared by all processes, see application.checks.
+    A key is bound to the user, the method, the path and the body. The key of an anonymous user is bound to their
+    address, user agent and session cookie instead of their session, so that it costs no session query or write.
+    """
+
+    idempotency_in_progress_timeout = 60
+
+    @property
+    def idempotency_cache(self):
+        global _warned_per_process
+        if not _warned_per_process and is_per_process_cache(settings.IDEMPOTENCY_CACHE):
+            _warned_per_process = True
+            log.warning('%r is a per-process cache, a request retried in another process is not replayed.',
+                        settings.IDEMPOTENCY_CACHE)
+        return caches[settings.IDEMPOTENCY_CACHE]
+
+    def create(self, request, *args, **kwargs):
+        return self._idempotent(super().create, request, *args, **kwargs)
+
+    def update(self, request, *args, **kwargs):
+        # partial_update is routed through update as well
+        return self._idempotent(super().update, request, *args, **kwargs)
+
+    def _idempotency_cache_key(self, request, key):
+        if request.user.is_anonymous:
+            client = [request.META.get('REMOTE_ADDR', ''), request.META.get('HTTP_USER_AGENT', ''),
+                      request.COOKIES.get(settings.SESSION_COOKIE_NAME, '')]
+            owner = 'client:' + '\n'.join(client)
+        else:
+            owner = f'user:{request.user.pk}'
+
+        scope = '\n'.join([owner, request.method, request.path, key])
+        return 'idempotency:' + hashlib.sha256(scope.encode()).hexdigest()
+
+    def _idempotent(self, handler, request, *args, **kwargs):
+        key = request.META.get(IDEMPOTENCY_KEY_HEADER)
+        if not key:
+            return handler(request, *args, **kwargs)
+
+        if len(key) > IDEMPOTENCY_KEY_MAX_LENGTH:
+            error = {'detail': _('Idempotency-Key is too long.')}
+            return Response(error, status=status.HTTP_400_BAD_REQUEST)
+
+        cache = self.idempotency_cache
+        cache_key = self._idempotency_cache_key(request, key)
+        fingerprint = hashlib.sha256(json.dumps(request.data, cls=JSONEncoder, sort_keys=True).encode()).digest()
+
+        # (fingerprint, None, None) marks a request in progress
+        in_progress = (fingerprint, None, None)
+        for _ in range(2):
+            if cache.add(cache_key, in_progress, timeout=self.idempotency_in_progress_timeout):
+                break
+            # the key may be released between add and get, then it is taken again
+            stored = cache.get(cache_key)
+            if stored is not None:
+                return self._replay(fingerprint, *stored)
+        else:
+            # another request keeps taking and releasing the key
+            return self._replay(fingerprint, *in_progress)
+
+        try:
+            response = handler(request, *args, **kwargs)
+        except Exception:
+            cache.delete(cache_key)
+            raise
+
+        if status.is_success(response.status_code):
+            cache.set(cache_key, (fingerprint, response.status_code, response.data, self.get_idempotency_state()))
+        else:
+            cache.delete(cache_key)
+
+        return response
+
+    def get_idempotency_state(self):
+        """state of the view stored with a response, given back to `set_idempotency_state` when it is replayed"""
+        return None
+
+    def set_idempotency_state(self, state):
+        pass
+
+    def _replay(self, fingerprint, stored_fingerprint, status_code, data, state=None):
+        if stored_fingerprint != fingerprint:
+            error = {'detail': _('Idempotency-Key was already used with another request.')}
+            return Response(error, status=status.HTTP_422_UNPROCESSABLE_ENTITY)
+
+        if status_code is None:
+            error = {'detail': _('A request with this Idempotency-Key is in progress.')}
+            return Response(error, status=status.HTTP_409_CONFLICT)
+
+        self.set_idempotency_state(state)
+        response = Response(data, status=status_code)
+        response['Idempotent-Replayed'] = 'true'
+        return response
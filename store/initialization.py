@@ -4,6 +4,8 @@ from django.contrib.auth.models import Group
 from django.contrib.auth.models import Permission
 from django.contrib.contenttypes.models import ContentType
 
+from application.authentication import clear_anonymous_permissions
+
 from store.models import Good, Offer, Purchase, Order, Settings
 
 
@@ -88,6 +90,7 @@ def _fill_settings():
 def delete_models(*args, **kwargs):
     _delete_users()
     _delete_groups()
+    clear_anonymous_permissions()
 
 
 def populate_models(*args, **kwargs):
@@ -95,6 +98,7 @@ def populate_models(*args, **kwargs):
     users = _create_users(groups=groups)
     _fill_perms(groups=groups)
     _fill_settings()
+    clear_anonymous_permissions()
 
 
 def handle_new_buyer(sender, user, request, **kwargs):
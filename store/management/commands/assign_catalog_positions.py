@@ -0,0 +1,29 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from store.models import CatalogChange
+
+
+class Command(BaseCommand):
+    help = 'Assign feed positions to committed catalog changes left without one, e.g. when a process exited ' \
+           'right after its commit'
+
+    OPTIONS = (
+        (('--interval', ), {'type': float, 'default': None,
+                            'help': 'Assign again every INTERVAL seconds instead of exiting.'}),
+    )
+
+    def add_arguments(self, parser):
+        for (args, kwargs) in self.OPTIONS:
+            parser.add_argument(*args, **kwargs)
+
+    def handle(self, *args, **options):
+        while True:
+            assigned = CatalogChange.assign_positions()
+            if assigned:
+                self.stdout.write(f'Assigned positions to {assigned} changes.')
+
+            if options['interval'] is None:
+                break
+            time.sleep(options['interval'])
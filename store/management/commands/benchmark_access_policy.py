@@ -0,0 +1,77 @@
+import time
+from statistics import mean, median
+from types import SimpleNamespace
+
+from django.contrib.auth.models import Permission
+from django.core.management.base import BaseCommand, CommandError
+from rest_access_policy import AccessPolicy
+
+from store.views.catalog_change import CatalogChangesAccessPolicy
+from store.views.good import GoodsAccessPolicy
+from store.views.my_order import MyOrderAccessPolicy
+from store.views.offer import OffersAccessPolicy
+from store.views.order import OrderAccessPolicy
+from store.views.purchase import PurchaseAccessPolicy
+from store.views.settings import SettingsAccessPolicy
+
+POLICIES = (CatalogChangesAccessPolicy, GoodsAccessPolicy, MyOrderAccessPolicy, OffersAccessPolicy,
+            OrderAccessPolicy, PurchaseAccessPolicy, SettingsAccessPolicy)
+
+
+class _User(SimpleNamespace):
+    """a user whose permissions are already loaded, so only the policy evaluation is measured"""
+
+    def has_perm(self, perm):
+        return perm in self.perms
+
+
+def _requests(policy_class, users):
+    actions = sorted({action for statement in policy_class.statements for action in statement['action']
+                      if not action.startswith('<')})
+    return [(SimpleNamespace(user=user, method=method), SimpleNamespace(action=action, action_map={}))
+            for user in users for action in actions for method in ('GET', 'POST')]
+
+
+def _measure(has_permission, policy, requests, count):
+    timings = []
+    for _ in range(count):
+        started = time.perf_counter()
+        for request, view in requests:
+            has_permission(policy, request, view)
+        timings.append((time.perf_counter() - started) / len(requests))
+    return timings
+
+
+class Command(BaseCommand):
+    help = 'Measure the per-request overhead of the store access policies evaluated by AccessPolicy and compiled.'
+
+    OPTIONS = (
+        (('--requests', ), {'type': int, 'default': 200, 'help': 'Measured runs over all the requests.'}),
+    )
+
+    def add_arguments(self, parser):
+        for (args, kwargs) in self.OPTIONS:
+            parser.add_argument(*args, **kwargs)
+
+    def _report(self, name, timings):
+        self.stdout.write(f'  {name:<12} mean={mean(timings) * 1000:.4f}ms median={median(timings) * 1000:.4f}ms '
+                          f'max={max(timings) * 1000:.4f}ms')
+
+    def handle(self, *args, **options):
+        perms = {f'store.{permission.codename}'
+                 for permission in Permission.objects.filter(content_type__app_label='store')}
+        users = [_User(is_anonymous=True, is_superuser=False, is_staff=False, pk=None, perms=set()),
+                 _User(is_anonymous=False, is_superuser=False, is_staff=False, pk=1,
+                       perms={perm for perm in perms if perm.startswith('store.view_')}),
+                 _User(is_anonymous=False, is_superuser=True, is_staff=True, pk=2, perms=perms)]
+
+        for policy_class in POLICIES:
+            policy = policy_class()
+            requests = _requests(policy_class, users)
+            for request, view in requests:
+                if AccessPolicy.has_permission(policy, request, view) != policy.has_permission(request, view):
+                    raise CommandError(f'{policy_class.__name__} decides {view.action} differently when compiled.')
+
+            self.stdout.write(f'{policy_class.__name__} per request')
+            self._report('AccessPolicy', _measure(AccessPolicy.has_permission, policy, requests, options['requests']))
+            self._report('compiled', _measure(policy_class.has_permission, policy, requests, options['requests']))
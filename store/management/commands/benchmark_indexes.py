@@ -0,0 +1,133 @@
+import random
+import time
+from statistics import mean, median
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection, models, transaction
+from django.db.models import Q
+
+from store.models import Good, Offer, Order, Purchase
+
+
+class _Rollback(Exception):
+    pass
+
+
+# indexes which are dropped to measure the queries without them, with the foreign key indexes they replaced
+INDEXES = (
+    (Offer, 'store_offer_price_idx', None),
+    (Order, 'store_order_user_idx', 'user'),
+    (Order, 'store_order_user_status_idx', None),
+    (Order, 'store_order_active_idx', None),
+    (Purchase, 'store_purchase_order_idx', 'order'),
+)
+
+
+def _queries(user, anonymous_ids, order_ids, good, page_size):
+    """the queries of the store endpoints by the access pattern they serve"""
+    return (
+        ('orders of a user', Order.objects.filter(user=user).order_by('id')[:page_size]),
+        ('orders of a user by status', Order.objects.filter(user=user, status=Order.Status.PROCESSING)
+            .order_by('id')[:page_size]),
+        ('active orders', Order.objects.filter(status=Order.Status.DRAFT).order_by('id')[:page_size]),
+        ('my orders', Order.objects.filter(Q(user=user) | Q(id__in=anonymous_ids, user=None))
+            .order_by('id')[:page_size]),
+        ('anonymous orders', Order.objects.filter(user=None, id__in=anonymous_ids).order_by('id')[:page_size]),
+        ('purchases of a user', Purchase.objects.filter(order__user=user).order_by('id')[:page_size]),
+        ('purchases of orders', Purchase.objects.filter(order_id__in=order_ids).order_by('id')),
+        ('offers by price', Offer.objects.order_by('price')[:page_size]),
+        ('offers of a good', Offer.objects.filter(good=good).order_by('price')),
+    )
+
+
+def _measure(queryset, count):
+    timings = []
+    for _ in range(count):
+        started = time.perf_counter()
+        list(queryset.all())
+        timings.append(time.perf_counter() - started)
+    return timings
+
+
+class Command(BaseCommand):
+    help = 'Record EXPLAIN plans and latency of the store endpoint queries with the access pattern indexes and ' \
+           'with the former ones. All changes are rolled back.'
+
+    OPTIONS = (
+        (('--users', ), {'type': int, 'default': 100, 'help': 'Number of users.'}),
+        (('--orders', ), {'type': int, 'default': 50_000, 'help': 'Number of orders to create.'}),
+        (('--purchases', ), {'type': int, 'default': 2, 'help': 'Purchases per order.'}),
+        (('--offers', ), {'type': int, 'default': 10_000, 'help': 'Number of offers to create.'}),
+        (('--page-size', ), {'type': int, 'default': 30, 'help': 'Page size.'}),
+        (('--requests', ), {'type': int, 'default': 20, 'help': 'Measured runs per query.'}),
+    )
+
+    def add_arguments(self, parser):
+        for (args, kwargs) in self.OPTIONS:
+            parser.add_argument(*args, **kwargs)
+
+    def _populate(self, options):
+        get_user_model().objects.bulk_create(
+            [get_user_model()(username=f'benchmark {idx}') for idx in range(options['users'])])
+        users = list(get_user_model().objects.filter(username__startswith='benchmark '))
+        statuses = list(Order.Status.values)
+
+        Order.objects.bulk_create(
+            [Order(user=random.choice(users + [None]), status=random.choice(statuses),
+                   email='benchmark@mail.ru', eth_address='0' * 42) for _ in range(options['orders'])],
+            batch_size=1000)
+        goods = [Good.objects.create(name=f'benchmark good {idx}') for idx in range(100)]
+        order_ids = list(Order.objects.values_list('id', flat=True))
+        Purchase.objects.bulk_create(
+            [Purchase(order_id=order_id, good=random.choice(goods), price=random.randint(1, 1000))
+             for order_id in order_ids for _ in range(options['purchases'])],
+            batch_size=1000)
+        Offer.objects.bulk_create(
+            [Offer(good=goods[idx % len(goods)], price=idx) for idx in range(options['offers'])],
+            batch_size=1000)
+
+        anonymous_ids = list(Order.objects.filter(user=None).values_list('id', flat=True)[:10])
+        return _queries(users[0], anonymous_ids, order_ids[-options['page_size']:], goods[0],
+                        options['page_size'])
+
+    def _report(self, name, queryset, count):
+        timings = _measure(queryset, count)
+        self.stdout.write(f'  {name:<28} mean={mean(timings) * 1000:.3f}ms median={median(timings) * 1000:.3f}ms '
+                          f'max={max(timings) * 1000:.3f}ms')
+        for line in queryset.explain().splitlines():
+            self.stdout.write(f'    {line}')
+
+    @staticmethod
+    def _restore_former_indexes():
+        # statements of the schema editor are run directly, SQLite does not allow it inside a transaction
+        schema_editor = connection.schema_editor()
+        with connection.cursor() as cursor:
+            for model, index_name, replaced in INDEXES:
+                index = next(index for index in model._meta.indexes if index.name == index_name)
+                cursor.execute(str(index.remove_sql(model, schema_editor)))
+                if replaced:
+                    foreign_key = models.Index(fields=[replaced], name=f'{index_name}_fk')
+                    cursor.execute(str(foreign_key.create_sql(model, schema_editor)))
+            cursor.execute('ANALYZE')
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                queries = self._populate(options)
+                with connection.cursor() as cursor:
+                    cursor.execute('ANALYZE')
+
+                self.stdout.write('with the access pattern indexes')
+                for name, queryset in queries:
+                    self._report(name, queryset, options['requests'])
+
+                self._restore_former_indexes()
+
+                self.stdout.write('with the former indexes')
+                for name, queryset in queries:
+                    self._report(name, queryset, options['requests'])
+
+                raise _Rollback
+        except _Rollback:
+            pass
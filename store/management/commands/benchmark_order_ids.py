@@ -0,0 +1,111 @@
+import random
+import time
+from statistics import mean, median
+
+from django.core.management.base import BaseCommand
+from django.db import IntegrityError, transaction
+
+from store.models import Order, OrderIdSequence
+from store.order_ids import PermutationOrderIdAllocator
+
+
+class _Rollback(Exception):
+    pass
+
+
+class _BenchmarkAllocator(PermutationOrderIdAllocator):
+    """counts sequence values from a sentinel row, so that rolled back runs do not exhaust the range"""
+
+    base = 0
+
+    def reset(self):
+        self.base = OrderIdSequence.objects.create().id
+
+    def next_indexes(self, count):
+        return [index - self.base for index in super().next_indexes(count)]
+
+
+def _create_order(order_id):
+    with transaction.atomic():
+        Order.objects.create(id=order_id, email='benchmark@mail.ru', eth_address='0' * 42)
+
+
+def _random_checkout(id_range, iterations):
+    for _ in range(iterations):
+        try:
+            _create_order(random.randint(*id_range))
+            return
+        except IntegrityError:
+            pass
+    raise IntegrityError('Unable to generate Order-ID.')
+
+
+def _allocator_checkout(allocator):
+    _create_order(allocator.allocate())
+
+
+def _measure(checkout, count):
+    timings, failures = [], 0
+    for _ in range(count):
+        started = time.perf_counter()
+        try:
+            checkout()
+        except IntegrityError:
+            failures += 1
+        timings.append(time.perf_counter() - started)
+    return timings, failures
+
+
+class Command(BaseCommand):
+    help = 'Benchmark checkout Order-ID generation at high table occupancy. All changes are rolled back.'
+
+    OPTIONS = (
+        (('--range-size', ), {'type': int, 'default': 20_000, 'help': 'Size of the Order-ID range.'}),
+        (('--occupancy', ), {'type': float, 'nargs': '+', 'default': [0.0, 0.5, 0.9, 0.99],
+                             'help': 'Fractions of the range taken before measuring.'}),
+        (('--checkouts', ), {'type': int, 'default': 100, 'help': 'Measured checkouts per occupancy.'}),
+        (('--iterations', ), {'type': int, 'default': 20, 'help': 'Retries of the random generator.'}),
+    )
+
+    def add_arguments(self, parser):
+        for (args, kwargs) in self.OPTIONS:
+            parser.add_argument(*args, **kwargs)
+
+    def _run(self, name, occupancy, options, prefill, checkout):
+        try:
+            with transaction.atomic():
+                Order.objects.all().delete()
+                OrderIdSequence.objects.all().delete()
+                prefill(int(options['range_size'] * occupancy))
+
+                timings, failures = _measure(checkout, options['checkouts'])
+                raise _Rollback
+        except _Rollback:
+            pass
+
+        self.stdout.write(f'{name:<12} occupancy={occupancy:<5} '
+                          f'mean={mean(timings) * 1000:.3f}ms median={median(timings) * 1000:.3f}ms '
+                          f'max={max(timings) * 1000:.3f}ms failures={failures}')
+
+    def handle(self, *args, **options):
+        id_range = (1000_000, 1000_000 + options['range_size'] - 1)
+        allocator = _BenchmarkAllocator(id_range=id_range)
+
+        def make_orders(ids):
+            Order.objects.bulk_create(
+                [Order(id=order_id, email='benchmark@mail.ru', eth_address='0' * 42) for order_id in ids],
+                batch_size=500)
+
+        def random_prefill(count):
+            make_orders(random.sample(range(id_range[0], id_range[1] + 1), count))
+
+        def allocator_prefill(count):
+            allocator.reset()
+            OrderIdSequence.objects.bulk_create([OrderIdSequence() for _ in range(count)], batch_size=500)
+            make_orders(allocator.permute(index) for index in range(count))
+
+        for occupancy in options['occupancy']:
+            self._run('random', occupancy, options, random_prefill,
+                      lambda: _random_checkout(id_range, options['iterations']))
+            self._run('permutation', occupancy, options, allocator_prefill,
+                      lambda: _allocator_checkout(allocator))
@@ -0,0 +1,87 @@
+import time
+from statistics import mean, median
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test import Client, RequestFactory, override_settings
+from django.urls import reverse
+from rest_framework.request import Request
+
+from application.pagination import KeysetPagination
+from store.models import Order
+
+
+class _Rollback(Exception):
+    pass
+
+
+def _measure(client, url, count):
+    timings = []
+    for _ in range(count):
+        started = time.perf_counter()
+        response = client.get(url)
+        timings.append(time.perf_counter() - started)
+        assert response.status_code == 200, response.content
+    return timings
+
+
+def _cursor_url(url, order):
+    """the cursor a client walking the list would have after the given order"""
+    paginator = KeysetPagination()
+    paginator.request = Request(RequestFactory().get(url))
+    paginator.ordering = ['id']
+    paginator.fields = [Order._meta.get_field('id')]
+    return paginator.encode_cursor(order, reverse=False)
+
+
+class Command(BaseCommand):
+    help = 'Benchmark page number and keyset pagination of the orders list at increasing depth. ' \
+           'All changes are rolled back.'
+
+    OPTIONS = (
+        (('--orders', ), {'type': int, 'default': 100_000, 'help': 'Number of orders to create.'}),
+        (('--page-size', ), {'type': int, 'default': 30, 'help': 'Page size.'}),
+        (('--depth', ), {'type': float, 'nargs': '+', 'default': [0.0, 0.25, 0.5, 0.75, 0.99],
+                         'help': 'Fractions of the list skipped before the measured page.'}),
+        (('--requests', ), {'type': int, 'default': 20, 'help': 'Measured requests per depth.'}),
+    )
+
+    def add_arguments(self, parser):
+        for (args, kwargs) in self.OPTIONS:
+            parser.add_argument(*args, **kwargs)
+
+    def _report(self, name, depth, timings):
+        self.stdout.write(f'{name:<12} depth={depth:<5} '
+                          f'mean={mean(timings) * 1000:.3f}ms median={median(timings) * 1000:.3f}ms '
+                          f'max={max(timings) * 1000:.3f}ms')
+
+    def handle(self, *args, **options):
+        page_size = options['page_size']
+
+        try:
+            with transaction.atomic(), override_settings(ALLOWED_HOSTS=['testserver']):
+                user = get_user_model().objects.create(username='benchmark', is_superuser=True)
+                Order.objects.bulk_create(
+                    [Order(email='benchmark@mail.ru', eth_address='0' * 42) for _ in range(options['orders'])],
+                    batch_size=1000)
+
+                client = Client()
+                client.force_login(user)
+                url = reverse('store:orders-list')
+
+                for depth in options['depth']:
+                    offset = int(options['orders'] * depth)
+                    page = offset // page_size + 1
+                    timings = _measure(client, f'{url}?page_size={page_size}&page={page}', options['requests'])
+                    self._report('page-number', depth, timings)
+
+                    cursor_url = f'{url}?pagination=cursor&page_size={page_size}'
+                    if offset:
+                        cursor_url = _cursor_url(cursor_url, Order.objects.order_by('id')[offset - 1])
+                    timings = _measure(client, cursor_url, options['requests'])
+                    self._report('keyset', depth, timings)
+
+                raise _Rollback
+        except _Rollback:
+            pass
@@ -0,0 +1,75 @@
+import time
+from statistics import mean, median
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from rest_framework.renderers import JSONRenderer
+
+from store.models import Good, Offer, Order, Purchase
+from store.renderers import FastJSONRenderer
+from store.row_serializers import get_row_serializer
+from store.serializers import OfferSerializer, PurchaseSerializer
+
+
+class _Rollback(Exception):
+    pass
+
+
+def _measure(render, count):
+    timings = []
+    for _ in range(count):
+        started = time.perf_counter()
+        content = render()
+        timings.append(time.perf_counter() - started)
+    return timings, content
+
+
+class Command(BaseCommand):
+    help = 'Benchmark listing offers and purchases through the serializers and JSONRenderer against ' \
+           'the row serializers and FastJSONRenderer. All changes are rolled back.'
+
+    OPTIONS = (
+        (('--rows', ), {'type': int, 'default': 10_000, 'help': 'Number of offers and of purchases to create.'}),
+        (('--runs', ), {'type': int, 'default': 5, 'help': 'Measured runs per path.'}),
+    )
+
+    def add_arguments(self, parser):
+        for (args, kwargs) in self.OPTIONS:
+            parser.add_argument(*args, **kwargs)
+
+    def _report(self, name, timings):
+        self.stdout.write(f'{name:<20} mean={mean(timings) * 1000:.3f}ms median={median(timings) * 1000:.3f}ms '
+                          f'max={max(timings) * 1000:.3f}ms')
+
+    def _compare(self, serializer_class, queryset, runs):
+        queryset = serializer_class.setup_eager_loading(queryset.order_by('id'))
+        row_serializer = get_row_serializer(serializer_class)
+
+        serializer_timings, serialized = _measure(
+            lambda: JSONRenderer().render(serializer_class(queryset.all(), many=True).data), runs)
+        row_timings, rendered = _measure(
+            lambda: FastJSONRenderer().render(row_serializer.many(row_serializer.values(queryset.all()))), runs)
+
+        assert serialized == rendered, f'{serializer_class.__name__} output differs'
+        self._report(serializer_class.__name__, serializer_timings)
+        self._report('rows', row_timings)
+
+    def handle(self, *args, **options):
+        rows = options['rows']
+
+        try:
+            with transaction.atomic():
+                goods = [Good.objects.create(name=f'benchmark good {idx}') for idx in range(100)]
+                Offer.objects.bulk_create(
+                    [Offer(good=goods[idx % len(goods)], price=idx) for idx in range(rows)], batch_size=1000)
+                order = Order.objects.create(email='benchmark@mail.ru', eth_address='0' * 42)
+                Purchase.objects.bulk_create(
+                    [Purchase(order=order, good=goods[idx % len(goods)], price=idx) for idx in range(rows)],
+                    batch_size=1000)
+
+                self._compare(OfferSerializer, Offer.objects.all(), options['runs'])
+                self._compare(PurchaseSerializer, Purchase.objects.all(), options['runs'])
+
+                raise _Rollback
+        except _Rollback:
+            pass
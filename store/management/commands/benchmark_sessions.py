@@ -0,0 +1,95 @@
+import time
+from importlib import import_module
+from statistics import mean, median
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+ENGINES = ('django.contrib.sessions.backends.db', 'application.sessions')
+
+
+class _Rollback(Exception):
+    pass
+
+
+def _read(session):
+    session.get('_auth_user_id')
+
+
+def _write_unchanged(session):
+    session['cart'] = session['cart']
+
+
+def _write_changed(session):
+    session['visits'] = session.get('visits', 0) + 1
+
+
+# what a request does with its session, the middleware saves it when it was modified
+REQUESTS = (
+    ('read', _read),
+    ('unchanged write', _write_unchanged),
+    ('changed write', _write_changed),
+)
+
+
+class Command(BaseCommand):
+    help = 'Measure the session overhead per request of the database session engine and of the store one. ' \
+           'All changes are rolled back.'
+
+    OPTIONS = (
+        (('--sessions', ), {'type': int, 'default': 1000, 'help': 'Number of sessions.'}),
+        (('--requests', ), {'type': int, 'default': 5, 'help': 'Measured requests per session.'}),
+    )
+
+    def add_arguments(self, parser):
+        for (args, kwargs) in self.OPTIONS:
+            parser.add_argument(*args, **kwargs)
+
+    @staticmethod
+    def _populate(session_store, count):
+        keys = []
+        for idx in range(count):
+            session = session_store()
+            session.update({'_auth_user_id': str(idx), 'cart': list(range(10))})
+            session.save()
+            keys.append(session.session_key)
+        return keys
+
+    @staticmethod
+    def _request(session_store, key, handle):
+        session = session_store(key)
+        handle(session)
+        if session.modified:
+            session.save()
+
+    def _measure(self, session_store, keys, handle, count):
+        timings = []
+        for _ in range(count):
+            for key in keys:
+                started = time.perf_counter()
+                self._request(session_store, key, handle)
+                timings.append(time.perf_counter() - started)
+
+        # of a request which finds the session cached, if the engine caches
+        with CaptureQueriesContext(connection) as queries:
+            self._request(session_store, keys[0], handle)
+        return timings, len(queries)
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                for engine in ENGINES:
+                    session_store = import_module(engine).SessionStore
+                    keys = self._populate(session_store, options['sessions'])
+
+                    self.stdout.write(engine)
+                    for name, handle in REQUESTS:
+                        timings, queries = self._measure(session_store, keys, handle, options['requests'])
+                        self.stdout.write(f'  {name:<16} mean={mean(timings) * 1000:.3f}ms '
+                                          f'median={median(timings) * 1000:.3f}ms max={max(timings) * 1000:.3f}ms '
+                                          f'queries={queries}')
+
+                raise _Rollback
+        except _Rollback:
+            pass
@@ -0,0 +1,33 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db.models import Max, Min
+
+from store.models import CatalogChange
+
+
+class Command(BaseCommand):
+    help = 'Delete catalog changes superseded by a later change of the same object'
+
+    OPTIONS = (
+        (('--batch-size', ), {'type': int, 'default': 10_000, 'help': 'Changes compacted in one transaction.'}),
+        (('--interval', ), {'type': float, 'default': None,
+                            'help': 'Compact again every INTERVAL seconds instead of exiting.'}),
+    )
+
+    def add_arguments(self, parser):
+        for (args, kwargs) in self.OPTIONS:
+            parser.add_argument(*args, **kwargs)
+
+    def handle(self, *args, **options):
+        while True:
+            bounds = CatalogChange.objects.aggregate(start=Min('id'), stop=Max('id'))
+            deleted = 0
+            if bounds['start'] is not None:
+                for start in range(bounds['start'], bounds['stop'] + 1, options['batch_size']):
+                    deleted += CatalogChange.compact(start, start + options['batch_size'])
+            self.stdout.write(f'Deleted {deleted} superseded changes.')
+
+            if options['interval'] is None:
+                break
+            time.sleep(options['interval'])
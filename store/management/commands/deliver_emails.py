@@ -0,0 +1,41 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from store.utils import deliver_outbox
+
+
+class Command(BaseCommand):
+    help = 'Deliver pending e-mails of the outbox'
+
+    OPTIONS = (
+        (('--batch-size', ), {'type': int, 'default': 100, 'help': 'E-mails claimed at once.'}),
+        (('--interval', ), {'type': float, 'default': None,
+                            'help': 'Keep polling the outbox every INTERVAL seconds instead of exiting when drained.'}),
+    )
+
+    def add_arguments(self, parser):
+        for (args, kwargs) in self.OPTIONS:
+            parser.add_argument(*args, **kwargs)
+
+    def handle(self, *args, **options):
+        while True:
+            # smtplib errors are OSErrors as well
+            try:
+                sent, failed = deliver_outbox(batch_size=options['batch_size'])
+            except OSError as e:
+                if options['interval'] is None:
+                    raise CommandError(f'Unable to connect to the mail server: {e}') from e
+
+                # the e-mails are left for a later pass, as after a failed one
+                self.stderr.write(f'Unable to connect to the mail server: {e}')
+                time.sleep(max(options['interval'], settings.EMAIL_OUTBOX_RETRY_DELAY))
+                continue
+
+            if sent or failed:
+                self.stdout.write(f'Sent {sent} e-mails, {failed} failed.')
+
+            if options['interval'] is None:
+                break
+            time.sleep(options['interval'])
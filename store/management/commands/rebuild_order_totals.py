@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from store.models import Order
+
+
+class Command(BaseCommand):
+    help = 'Recalculate denormalized Order totals from purchases'
+
+    OPTIONS = (
+        (('--batch-size', ), {'type': int, 'default': 1000, 'help': 'Orders updated per transaction.'}),
+    )
+
+    def add_arguments(self, parser):
+        for (args, kwargs) in self.OPTIONS:
+            parser.add_argument(*args, **kwargs)
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        ids = Order.objects.order_by('id').values_list('id', flat=True)
+
+        updated = 0
+        last_id = None
+        while True:
+            batch = list((ids if last_id is None else ids.filter(id__gt=last_id))[:batch_size])
+            if not batch:
+                break
+
+            with transaction.atomic():
+                updated += Order.refresh_totals(batch)
+            last_id = batch[-1]
+
+        self.stdout.write(f'Updated {updated} orders.')
@@ -0,0 +1,22 @@
+# Generated by Django 3.2 on 2026-10-18 15:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OrderIdSequence',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+            ],
+            options={
+                'verbose_name': 'Order-ID Sequence',
+            },
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 3.2 on 2026-10-18 15:46
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0002_order_id_sequence'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OutboxEmail',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('subject', models.TextField(verbose_name='Subject')),
+                ('body', models.TextField(verbose_name='Body')),
+                ('from_email', models.TextField(verbose_name='From')),
+                ('to', models.EmailField(max_length=254, verbose_name='To')),
+                ('attempts', models.PositiveSmallIntegerField(default=0, verbose_name='Attempts')),
+                ('next_attempt_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Next Attempt')),
+                ('sent_at', models.DateTimeField(blank=True, null=True, verbose_name='Sent')),
+                ('last_error', models.TextField(blank=True, verbose_name='Last Error')),
+            ],
+            options={
+                'verbose_name': 'Outbox E-Mail',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='outboxemail',
+            index=models.Index(condition=models.Q(sent_at=None), fields=['next_attempt_at'], name='store_outbox_pending_idx'),
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 3.2 on 2026-10-18 15:49
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+
+def fill_order_totals(apps, schema_editor):
+    Order = apps.get_model('store', 'Order')
+    Purchase = apps.get_model('store', 'Purchase')
+
+    purchases = Purchase.objects.filter(order=OuterRef('pk')).order_by().values('order')
+    Order.objects.update(
+        total_price=Coalesce(Subquery(purchases.annotate(total_price=Sum('price')).values('total_price')), Value(0),
+                             output_field=Order._meta.get_field('total_price')),
+        item_count=Coalesce(Subquery(purchases.annotate(item_count=Count('id')).values('item_count')), Value(0)),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0003_outbox_email'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='item_count',
+            field=models.PositiveIntegerField(db_index=True, default=0, verbose_name='Item Count'),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='total_price',
+            field=models.DecimalField(db_index=True, decimal_places=6, default=0, max_digits=18, verbose_name='Total Price'),
+        ),
+        migrations.RunPython(fill_order_totals, migrations.RunPython.noop),
+    ]
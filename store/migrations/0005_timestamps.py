@@ -0,0 +1,124 @@
+# Generated by Django 3.2 on 2026-10-18 16:10
+
+from django.db import migrations, models
+import django.utils.timezone
+
+TIMESTAMPED_MODELS = ('Good', 'Offer', 'Order', 'Purchase', 'Settings')
+
+
+def fill_timestamps(apps, schema_editor):
+    # the history is unknown, existing rows are stamped with the time of the migration
+    now = django.utils.timezone.now()
+    for name in TIMESTAMPED_MODELS:
+        apps.get_model('store', name).objects.update(created_at=now, updated_at=now)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0004_order_totals'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='good',
+            name='created_at',
+            field=models.DateTimeField(db_index=True, editable=False, null=True, verbose_name='Created'),
+        ),
+        migrations.AddField(
+            model_name='good',
+            name='updated_at',
+            field=models.DateTimeField(db_index=True, editable=False, null=True, verbose_name='Updated'),
+        ),
+        migrations.AddField(
+            model_name='offer',
+            name='created_at',
+            field=models.DateTimeField(db_index=True, editable=False, null=True, verbose_name='Created'),
+        ),
+        migrations.AddField(
+            model_name='offer',
+            name='updated_at',
+            field=models.DateTimeField(db_index=True, editable=False, null=True, verbose_name='Updated'),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='created_at',
+            field=models.DateTimeField(db_index=True, editable=False, null=True, verbose_name='Created'),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='updated_at',
+            field=models.DateTimeField(db_index=True, editable=False, null=True, verbose_name='Updated'),
+        ),
+        migrations.AddField(
+            model_name='purchase',
+            name='created_at',
+            field=models.DateTimeField(db_index=True, editable=False, null=True, verbose_name='Created'),
+        ),
+        migrations.AddField(
+            model_name='purchase',
+            name='updated_at',
+            field=models.DateTimeField(db_index=True, editable=False, null=True, verbose_name='Updated'),
+        ),
+        migrations.AddField(
+            model_name='settings',
+            name='created_at',
+            field=models.DateTimeField(db_index=True, editable=False, null=True, verbose_name='Created'),
+        ),
+        migrations.AddField(
+            model_name='settings',
+            name='updated_at',
+            field=models.DateTimeField(db_index=True, editable=False, null=True, verbose_name='Updated'),
+        ),
+        migrations.RunPython(fill_timestamps, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='good',
+            name='created_at',
+            field=models.DateTimeField(db_index=True, default=django.utils.timezone.now, editable=False, verbose_name='Created'),
+        ),
+        migrations.AlterField(
+            model_name='good',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, db_index=True, verbose_name='Updated'),
+        ),
+        migrations.AlterField(
+            model_name='offer',
+            name='created_at',
+            field=models.DateTimeField(db_index=True, default=django.utils.timezone.now, editable=False, verbose_name='Created'),
+        ),
+        migrations.AlterField(
+            model_name='offer',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, db_index=True, verbose_name='Updated'),
+        ),
+        migrations.AlterField(
+            model_name='order',
+            name='created_at',
+            field=models.DateTimeField(db_index=True, default=django.utils.timezone.now, editable=False, verbose_name='Created'),
+        ),
+        migrations.AlterField(
+            model_name='order',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, db_index=True, verbose_name='Updated'),
+        ),
+        migrations.AlterField(
+            model_name='purchase',
+            name='created_at',
+            field=models.DateTimeField(db_index=True, default=django.utils.timezone.now, editable=False, verbose_name='Created'),
+        ),
+        migrations.AlterField(
+            model_name='purchase',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, db_index=True, verbose_name='Updated'),
+        ),
+        migrations.AlterField(
+            model_name='settings',
+            name='created_at',
+            field=models.DateTimeField(db_index=True, default=django.utils.timezone.now, editable=False, verbose_name='Created'),
+        ),
+        migrations.AlterField(
+            model_name='settings',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, db_index=True, verbose_name='Updated'),
+        ),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 3.2 on 2026-10-18 16:06
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+def seed_catalog_changes(apps, schema_editor):
+    # the existing catalog is logged as inserted, so that a feed read from the start yields all of it
+    CatalogChange = apps.get_model('store', 'CatalogChange')
+    for name in ('Good', 'Offer'):
+        model = apps.get_model('store', name)
+        for ids in _batches(model.objects.order_by('id').values_list('id', flat=True).iterator(), 1000):
+            CatalogChange.objects.bulk_create([CatalogChange(model=name.lower(), object_id=object_id, action='I')
+                                               for object_id in ids])
+
+
+def _batches(iterable, size):
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0005_timestamps'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CatalogChange',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('model', models.CharField(max_length=16, verbose_name='Model')),
+                ('object_id', models.BigIntegerField(verbose_name='Object ID')),
+                ('action', models.CharField(choices=[('I', 'Insert'), ('U', 'Update'), ('D', 'Delete')], max_length=1, verbose_name='Action')),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now, editable=False, verbose_name='Created')),
+            ],
+            options={
+                'verbose_name': 'Catalog Change',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='catalogchange',
+            index=models.Index(fields=['model', 'object_id', 'id'], name='store_catalog_change_obj_idx'),
+        ),
+        migrations.RunPython(seed_catalog_changes, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 3.2 on 2026-10-18 17:02
+
+from django.db import migrations, models
+from django.db.models import F, Max
+
+
+def position_existing_changes(apps, schema_editor):
+    # positions continue the ids, so that the cursors clients hold stay valid
+    CatalogChange = apps.get_model('store', 'CatalogChange')
+    CatalogChangeFeed = apps.get_model('store', 'CatalogChangeFeed')
+    CatalogChange.objects.update(position=F('id'))
+    last = CatalogChange.objects.aggregate(last=Max('id'))['last']
+    CatalogChangeFeed.objects.create(pk=1, position=last or 0)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0007_access_pattern_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CatalogChangeFeed',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('position', models.BigIntegerField(default=0, verbose_name='Position')),
+            ],
+            options={
+                'verbose_name': 'Catalog Change Feed',
+            },
+        ),
+        migrations.AddField(
+            model_name='catalogchange',
+            name='position',
+            field=models.BigIntegerField(editable=False, null=True, unique=True, verbose_name='Position'),
+        ),
+        migrations.RunPython(position_existing_changes, migrations.RunPython.noop),
+    ]
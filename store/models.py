@@ -1,12 +1,22 @@
+from collections import defaultdict
+from contextlib import contextmanager
+from decimal import Decimal
+from functools import reduce
+from operator import or_
+
 from django.conf import settings
 from django.contrib.auth.models import AbstractUser
 from django.core.validators import RegexValidator, MinLengthValidator, MaxLengthValidator
-from django.db import models
-from django.forms.models import model_to_dict
+from django.db import models, transaction
+from django.db.models import Count, Exists, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 from django_fsm import FSMField, transition
 
-from .utils import send_confirmation
+from application.versions import VersionedModel, VersionedQuerySet
+
+from .utils import send_confirmation, send_confirmations
 
 
 class ETHAddress(models.TextField):
@@ -16,11 +26,39 @@ class ETHAddress(models.TextField):
                           MaxLengthValidator(ADDRESS_LENGTH)]
 
 
+class TimestampedQuerySet(VersionedQuerySet):
+    """sets updated_at on bulk updates, which skip auto_now"""
+
+    def update(self, **kwargs):
+        kwargs.setdefault('updated_at', timezone.now())
+        return super().update(**kwargs)
+
+    update.alters_data = True
+
+    def bulk_update(self, objs, fields, *args, **kwargs):
+        now = timezone.now()
+        for obj in objs:
+            obj.updated_at = now
+        return super().bulk_update(objs, {*fields, 'updated_at'}, *args, **kwargs)
+
+    bulk_update.alters_data = True
+
+
+class TimestampedModel(VersionedModel):
+    created_at = models.DateTimeField(verbose_name=_('Created'), default=timezone.now, editable=False, db_index=True)
+    updated_at = models.DateTimeField(verbose_name=_('Updated'), auto_now=True, db_index=True)
+
+    objects = TimestampedQuerySet.as_manager()
+
+    class Meta:
+        abstract = True
+
+
 class User(AbstractUser):
     eth_address = ETHAddress(verbose_name=_('Ethereum Address'))
 
 
-class Settings(models.Model):
+class Settings(TimestampedModel):
     EMAIL_SUBJECT = 'Email Subject'
     EMAIL_BODY = 'Email Body'
     EMAIL_FROM = 'Email From'
@@ -29,43 +67,238 @@ class Settings(models.Model):
     value = models.TextField(verbose_name=_('Value'))
 
 
-class Good(models.Model):
+class OutboxEmail(models.Model):
+    """e-mail written in the transaction of the change it reports, delivered later by the deliver_emails command"""
+
+    subject = models.TextField(verbose_name=_('Subject'))
+    body = models.TextField(verbose_name=_('Body'))
+    from_email = models.TextField(verbose_name=_('From'))
+    to = models.EmailField(verbose_name=_('To'))
+    attempts = models.PositiveSmallIntegerField(verbose_name=_('Attempts'), default=0)
+    next_attempt_at = models.DateTimeField(verbose_name=_('Next Attempt'), default=timezone.now)
+    sent_at = models.DateTimeField(verbose_name=_('Sent'), null=True, blank=True)
+    last_error = models.TextField(verbose_name=_('Last Error'), blank=True)
+
+    class Meta:
+        verbose_name = _('Outbox E-Mail')
+        indexes = [models.Index(fields=['next_attempt_at'], condition=models.Q(sent_at=None),
+                                name='store_outbox_pending_idx')]
+
+
+class CatalogQuerySet(TimestampedQuerySet):
+    """logs bulk writes, which do not send model signals, to the catalog change log, bulk_update goes through update"""
+
+    def update(self, **kwargs):
+        with transaction.atomic():
+            ids = list(self.values_list('pk', flat=True))
+            rows = super().update(**kwargs)
+            CatalogChange.log(self.model, ids, CatalogChange.Action.UPDATE)
+        return rows
+
+    update.alters_data = True
+
+    def bulk_create(self, objs, *args, **kwargs):
+        with transaction.atomic():
+            objs = super().bulk_create(objs, *args, **kwargs)
+            ids = [obj.pk for obj in objs if obj.pk is not None]
+            if len(ids) < len(objs):
+                # backends which do not return primary keys, the rows are found by their natural key
+                ids = self._natural_key_ids(objs)
+            CatalogChange.log(self.model, ids, CatalogChange.Action.INSERT)
+        return objs
+
+    def _natural_key_ids(self, objs):
+        """ids of the rows with the unique fields of the objects, the first unique field or unique_together"""
+        opts = self.model._meta
+        fields = next(([field] for field in opts.local_fields if field.unique and not field.primary_key), None)
+        if fields is None:
+            fields = [opts.get_field(name) for name in opts.unique_together[0]]
+
+        keys = [{field.attname: getattr(obj, field.attname) for field in fields} for obj in objs]
+        return list(self.model.objects.filter(reduce(or_, [Q(**key) for key in keys]))
+                    .order_by('pk').values_list('pk', flat=True)) if keys else []
+
+
+class GoodQuerySet(CatalogQuerySet):
+    """deletes refresh the totals of the orders of the purchases they cascade to"""
+
+    def delete(self):
+        with refreshing_totals(Purchase.objects.filter(good__in=self)):
+            return super().delete()
+
+    delete.alters_data = True
+    delete.queryset_only = True
+
+
+class Good(TimestampedModel):
     name = models.TextField(verbose_name=_('Name'), unique=True)
 
+    objects = GoodQuerySet.as_manager()
+
     class Meta:
         verbose_name = _('Good')
 
+    def delete(self, *args, **kwargs):
+        with refreshing_totals(self.purchases.all()):
+            return super().delete(*args, **kwargs)
 
-class Offer(models.Model):
+
+class Offer(TimestampedModel):
     good = models.ForeignKey(verbose_name=_('Good'), to=Good,
                              related_name='offers', on_delete=models.CASCADE)
     price = models.DecimalField(verbose_name=_('Price'), max_digits=12, decimal_places=6)
 
+    objects = CatalogQuerySet.as_manager()
+
     class Meta:
         verbose_name = _('Offer')
         unique_together = ('good', 'price')
+        indexes = [models.Index(fields=['price', 'id'], name='store_offer_price_idx')]
+
+
+class CatalogChangeFeed(models.Model):
+    """the last position of the catalog change feed, its row is locked while positions are assigned"""
+
+    position = models.BigIntegerField(verbose_name=_('Position'), default=0)
+
+    class Meta:
+        verbose_name = _('Catalog Change Feed')
+
+
+class CatalogChange(models.Model):
+    """
+    append-only log of goods and offers changes, the position is the cursor of the change feed
 
+    Ids are drawn when a change is written, so a transaction which runs long commits a lower id after higher ones.
+    Positions are assigned to committed changes instead when their transaction commits, or by the
+    assign_catalog_positions command if the process exited before, see assign_positions. Compaction keeps the latest
+    change of every object, so replaying the log from any cursor still ends in the current catalog.
+    """
 
-class Purchase(models.Model):
+    class Action(models.TextChoices):
+        INSERT = 'I', _('Insert')
+        UPDATE = 'U', _('Update')
+        DELETE = 'D', _('Delete')
+
+    model = models.CharField(verbose_name=_('Model'), max_length=16)
+    object_id = models.BigIntegerField(verbose_name=_('Object ID'))
+    action = models.CharField(verbose_name=_('Action'), max_length=1, choices=Action.choices)
+    created_at = models.DateTimeField(verbose_name=_('Created'), default=timezone.now, editable=False)
+    position = models.BigIntegerField(verbose_name=_('Position'), null=True, unique=True, editable=False)
+
+    class Meta:
+        verbose_name = _('Catalog Change')
+        indexes = [models.Index(fields=['model', 'object_id', 'id'], name='store_catalog_change_obj_idx')]
+
+    @classmethod
+    def log(cls, model, object_ids, action):
+        cls.objects.bulk_create([cls(model=model._meta.model_name, object_id=object_id, action=action)
+                                 for object_id in object_ids])
+        # a rolled back savepoint drops its callbacks, so every log registers one, the first to run numbers all
+        transaction.on_commit(cls.assign_positions)
+
+    @classmethod
+    def assign_positions(cls):
+        """
+        numbers the committed changes without a position in the order of their ids, returns how many
+
+        The feed row is locked until the positions are committed, so positions become visible in their order and
+        a reader which advanced its cursor never misses a change committed later: that one gets a later position.
+        """
+        if not cls.objects.filter(position=None).exists():
+            return 0
+
+        with transaction.atomic():
+            feed, created = CatalogChangeFeed.objects.select_for_update().get_or_create(pk=1)
+            ids = list(cls.objects.filter(position=None).order_by('id').values_list('id', flat=True))
+            cls.objects.bulk_update([cls(id=change_id, position=feed.position + idx)
+                                     for idx, change_id in enumerate(ids, 1)], ['position'], batch_size=1000)
+            feed.position += len(ids)
+            feed.save(update_fields=['position'])
+        return len(ids)
+
+    @classmethod
+    def log_save(cls, sender, instance, created, raw=False, **kwargs):
+        if not raw:
+            cls.log(sender, [instance.pk], cls.Action.INSERT if created else cls.Action.UPDATE)
+
+    @classmethod
+    def log_delete(cls, sender, instance, **kwargs):
+        cls.log(sender, [instance.pk], cls.Action.DELETE)
+
+    @classmethod
+    def compact(cls, start=0, stop=None):
+        """delete changes with ids in [start, stop) superseded by a later change of the same object"""
+        later = cls.objects.filter(model=OuterRef('model'), object_id=OuterRef('object_id'), id__gt=OuterRef('id'))
+        changes = cls.objects.filter(id__gte=start)
+        if stop is not None:
+            changes = changes.filter(id__lt=stop)
+        return changes.filter(Exists(later)).delete()[0]
+
+
+@contextmanager
+def refreshing_totals(purchases):
+    """refreshes the totals of the orders of the purchases, which the block deletes, in the transaction of the block"""
+    with transaction.atomic():
+        order_ids = list(purchases.order_by().values_list('order_id', flat=True).distinct())
+        yield
+        Order.refresh_totals(order_ids)
+
+
+class PurchaseQuerySet(TimestampedQuerySet):
+    """deletes refresh the totals of the orders of the deleted purchases"""
+
+    def delete(self):
+        with refreshing_totals(self):
+            return super().delete()
+
+    delete.alters_data = True
+    delete.queryset_only = True
+
+
+class Purchase(TimestampedModel):
     good = models.ForeignKey(verbose_name=_('Good'), to=Good,
                              related_name='purchases', on_delete=models.CASCADE)
     price = models.DecimalField(verbose_name=_('Price'), max_digits=12, decimal_places=6)
-    order = models.ForeignKey(verbose_name=_('Order'), to='Order',
+    order = models.ForeignKey(verbose_name=_('Order'), to='Order', db_index=False,  # see Meta.indexes
                               related_name='purchases', on_delete=models.CASCADE)
 
+    objects = PurchaseQuerySet.as_manager()
+
     class Meta:
         verbose_name = _('Purchase')
         permissions = [('view_my_purchase', _('View my purchases'))]
+        # purchases are listed and prefetched by order and sorted by id, the index also serves the foreign key
+        indexes = [models.Index(fields=['order', 'id'], name='store_purchase_order_idx')]
 
     @staticmethod
     def from_offer(offer):
         return Purchase(good=offer.good, price=offer.price)
 
+    # bulk writes skip these, their callers keep Order totals up to date themselves
+    def save(self, *args, **kwargs):
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            Order.refresh_totals([self.order_id])
+
+    def delete(self, *args, **kwargs):
+        with transaction.atomic():
+            result = super().delete(*args, **kwargs)
+            Order.refresh_totals([self.order_id])
+        return result
+
+
+class OrderIdSequence(models.Model):
+    """the ids of the rows are the drawn values of the sequence Order-IDs are derived from, see store.order_ids"""
+
+    class Meta:
+        verbose_name = _('Order-ID Sequence')
+
 
 ANONYMOUS_CAN_BUY = True
 
 
-class Order(models.Model):
+class Order(TimestampedModel):
 
     class Status(models.TextChoices):
         DRAFT = 'DR', _('Draft')
@@ -74,19 +307,89 @@ class Order(models.Model):
         FINISHED = 'FI', _('Finished')
 
     user = models.ForeignKey(verbose_name=_('Buyer'), to=settings.AUTH_USER_MODEL,
-                             related_name='orders', null=ANONYMOUS_CAN_BUY,
+                             related_name='orders', null=ANONYMOUS_CAN_BUY, db_index=False,  # see Meta.indexes
                              db_constraint=not ANONYMOUS_CAN_BUY, on_delete=models.DO_NOTHING)
     email = models.EmailField(verbose_name=_('E-Mail'), db_index=True)
     eth_address = ETHAddress(verbose_name=_('Ethereum Address'), db_index=True)
     status = FSMField(verbose_name=_('status'), choices=Status.choices,
                       default=Status.DRAFT, max_length=2, db_index=True)
+    total_price = models.DecimalField(verbose_name=_('Total Price'), max_digits=18, decimal_places=6,
+                                      default=0, db_index=True)
+    item_count = models.PositiveIntegerField(verbose_name=_('Item Count'), default=0, db_index=True)
 
     class Meta:
         verbose_name = _('Order')
         permissions = [('view_my_order', _('View my orders')),
                        ('moderate_my_order', _('Moderate my orders'))]
+        # lists are scoped by user, filtered by status and sorted by id, moderators mostly look at active orders;
+        # the user index also serves the user foreign key
+        indexes = [models.Index(fields=['user', 'id'], name='store_order_user_idx'),
+                   models.Index(fields=['user', 'status', 'id'], name='store_order_user_status_idx'),
+                   models.Index(fields=['status', 'id'], name='store_order_active_idx',
+                                condition=models.Q(status__in=['DR', 'PR']))]
+
+    @staticmethod
+    def totals(prices):
+        """total_price and item_count of an order with purchases of the given prices"""
+        prices = list(prices)
+        return {'total_price': sum(prices, Decimal(0)), 'item_count': len(prices)}
+
+    @classmethod
+    def refresh_totals(cls, order_ids=None):
+        """recalculate total_price and item_count from purchases with one UPDATE"""
+        purchases = Purchase.objects.filter(order=OuterRef('pk')).order_by().values('order')
+        total_price = purchases.annotate(total_price=Sum('price')).values('total_price')
+        item_count = purchases.annotate(item_count=Count('id')).values('item_count')
+
+        orders = cls.objects.all() if order_ids is None else cls.objects.filter(id__in=order_ids)
+        return orders.update(
+            total_price=Coalesce(Subquery(total_price), Value(0), output_field=cls._meta.get_field('total_price')),
+            item_count=Coalesce(Subquery(item_count), Value(0)),
+        )
+
+    BULK_TRANSITIONS = ('finish', 'cancel')
 
-    @transition(field='state', source='+', target=Status.FINISHED,
-                permission='store.moderate_order')
+    @transition(field='status', source='+', target=Status.FINISHED,
+                permission='store.change_order')
     def finish(self):
-        send_confirmation(self.email, model_to_dict(self.user))
+        send_confirmation(self.email, self.user)
+
+    @staticmethod
+    def _finish_many(orders):
+        send_confirmations([(order.email, order.user) for order in orders])
+
+    @transition(field='status', source=[Status.DRAFT, Status.PROCESSING], target=Status.CANCELED,
+                permission='store.change_order')
+    def cancel(self):
+        pass
+
+    @classmethod
+    def bulk_transition(cls, orders, name):
+        """
+        apply transition `name` to loaded orders with one conditional UPDATE per source state
+
+        Side effects of the transition are run by `_<name>_many` for all transitioned orders at once.
+        Returns transitioned orders and orders the transition is not allowed for.
+        """
+        meta = getattr(cls, name)._django_fsm
+
+        by_source, skipped = defaultdict(list), []
+        for order in orders:
+            if meta.has_transition(order.status) and meta.conditions_met(order, order.status):
+                by_source[order.status].append(order)
+            else:
+                skipped.append(order)
+
+        transitioned = []
+        for source, source_orders in by_source.items():
+            target = meta.next_state(source)
+            cls.objects.filter(id__in=[order.id for order in source_orders], status=source).update(status=target)
+            for order in source_orders:
+                order.status = target
+            transitioned.extend(source_orders)
+
+        side_effects = getattr(cls, f'_{name}_many', None)
+        if side_effects is not None and transitioned:
+            side_effects(transitioned)
+
+        return transitioned, skipped
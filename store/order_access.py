@@ -0,0 +1,66 @@
+from django.conf import settings
+from django.core import signing
+from django.utils.baseconv import base62
+
+from store.const import ORDER_ACCESS_COOKIE_NAME, ORDER_ACCESS_HEADER, ORDER_IDS_SESSION_PARAM_NAME
+
+ORDER_ACCESS_META_KEY = 'HTTP_' + ORDER_ACCESS_HEADER.upper().replace('-', '_')
+
+
+def _signer():
+    return signing.TimestampSigner(salt='store.order_access')
+
+
+def dumps_order_access(order_ids):
+    """
+    the signed token of the orders an anonymous buyer created, e.g. `2Gs7.2Gs8:1m2Xk0:<signature>`
+
+    Ids are base62 encoded and only the last settings.ORDER_ACCESS_MAX_ORDERS of them are kept, so the token and the
+    `id__in` filter it becomes stay small.
+    """
+    kept = list(dict.fromkeys(order_ids))[-settings.ORDER_ACCESS_MAX_ORDERS:]
+    return _signer().sign('.'.join(base62.encode(order_id) for order_id in kept))
+
+
+def loads_order_access(token):
+    """ids of a token, none when it is forged or expired"""
+    try:
+        value = _signer().unsign(token, max_age=settings.ORDER_ACCESS_TOKEN_MAX_AGE)
+    except signing.BadSignature:
+        return ()
+    return tuple(base62.decode(part) for part in value.split('.') if part)
+
+
+def _pop_session_order_ids(request):
+    """ids a session still holds from before the tokens, read once per session and only when it has a cookie"""
+    if not hasattr(request, '_session_order_ids'):
+        order_ids = ()
+        if settings.SESSION_COOKIE_NAME in request.COOKIES:
+            order_ids = tuple(request.session.pop(ORDER_IDS_SESSION_PARAM_NAME, ()))
+        request._session_order_ids = order_ids
+    return request._session_order_ids
+
+
+def get_order_access(request):
+    """
+    ids of the orders the request may access as their creator, from the header or else from the cookie
+
+    A request with neither gets the ids its session holds from before the tokens, these are moved to a token by
+    `update_order_access`.
+    """
+    token = request.META.get(ORDER_ACCESS_META_KEY) or request.COOKIES.get(ORDER_ACCESS_COOKIE_NAME)
+    return loads_order_access(token) if token else _pop_session_order_ids(request)
+
+
+def set_order_access(response, order_ids):
+    """returns the token in a header for API clients and in a cookie for browsers"""
+    token = dumps_order_access(order_ids)
+    response[ORDER_ACCESS_HEADER] = token
+    response.set_cookie(ORDER_ACCESS_COOKIE_NAME, token, max_age=settings.ORDER_ACCESS_TOKEN_MAX_AGE,
+                        secure=settings.SESSION_COOKIE_SECURE, httponly=True, samesite='Lax')
+
+
+def update_order_access(request, response, granted=()):
+    """returns a new token when orders were granted or the ids of the session were read"""
+    if granted or getattr(request, '_session_order_ids', None):
+        set_order_access(response, [*get_order_access(request), *granted])
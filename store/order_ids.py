@@ -0,0 +1,112 @@
+import hashlib
+import hmac
+from functools import lru_cache
+
+from django.conf import settings
+from django.db import connection
+from django.utils.module_loading import import_string
+
+
+class OrderIdAllocator:
+    """allocates ids for new orders, each id must be unique and hard to guess"""
+
+    def allocate(self) -> int:
+        raise NotImplementedError
+
+    def allocate_many(self, count) -> list:
+        return [self.allocate() for _ in range(count)]
+
+
+class PermutationOrderIdAllocator(OrderIdAllocator):
+    """
+    maps the n-th value of a database sequence to the id range with a keyed permutation
+
+    The permutation is a balanced Feistel network keyed with SECRET_KEY, cycle-walked into the range,
+    so drawn ids never collide and knowing some of them does not help to guess the others. Ids of orders which
+    exist already, e.g. drawn at random before the permutation was used, are skipped.
+    """
+
+    ROUNDS = 8
+    PRUNE_INTERVAL = 1000
+
+    def __init__(self, id_range=None, key=None):
+        self.low, self.high = id_range or settings.ORDER_ID_GENERATION_RANGE
+        self.size = self.high - self.low + 1
+
+        half_bits = max(1, ((self.size - 1).bit_length() + 1) // 2)
+        self.half_bits = half_bits
+        self.half_mask = (1 << half_bits) - 1
+
+        key = key or settings.SECRET_KEY
+        self.key = hashlib.sha256(f'{key}:store.order_ids'.encode()).digest()
+
+    def _round(self, idx, value):
+        digest = hmac.new(self.key, idx.to_bytes(1, 'big') + value.to_bytes(8, 'big'), hashlib.sha256).digest()
+        return int.from_bytes(digest[:8], 'big') & self.half_mask
+
+    def _encrypt(self, value):
+        left, right = value >> self.half_bits, value & self.half_mask
+        for idx in range(self.ROUNDS):
+            left, right = right, left ^ self._round(idx, right)
+        return (left << self.half_bits) | right
+
+    def permute(self, index):
+        if not 0 <= index < self.size:
+            raise ValueError(f'Order-ID range {self.low}..{self.high} is exhausted.')
+
+        # cycle-walking keeps the permutation inside the range, the expected number of walks is at most 4
+        value = self._encrypt(index)
+        while value >= self.size:
+            value = self._encrypt(value)
+        return self.low + value
+
+    def next_index(self):
+        return self.next_indexes(1)[0]
+
+    def next_indexes(self, count):
+        from .models import OrderIdSequence
+
+        if connection.features.can_return_rows_from_bulk_insert:
+            rows = OrderIdSequence.objects.bulk_create([OrderIdSequence() for _ in range(count)])
+        else:
+            rows = [OrderIdSequence.objects.create() for _ in range(count)]
+
+        ids = [row.id for row in rows]
+        self.prune(ids[0], ids[-1])
+        return [row_id - 1 for row_id in ids]
+
+    def prune(self, first, last):
+        """
+        deletes the rows drawn before `last` whenever [first, last] crosses a multiple of PRUNE_INTERVAL
+
+        Only the values of the sequence are used, not the rows, the latest row is kept so that no backend restarts
+        the sequence of an empty table.
+        """
+        from .models import OrderIdSequence
+
+        if (first - 1) // self.PRUNE_INTERVAL != last // self.PRUNE_INTERVAL:
+            OrderIdSequence.objects.filter(id__lt=last).delete()
+
+    @staticmethod
+    def taken(ids):
+        """ids of existing orders, e.g. drawn at random before the permutation was used"""
+        from .models import Order
+
+        return set(Order.objects.filter(id__in=ids).values_list('id', flat=True))
+
+    def allocate(self):
+        return self.allocate_many(1)[0]
+
+    def allocate_many(self, count):
+        # the permutation never repeats an id, taken ids are skipped by drawing the next indexes instead
+        ids = []
+        while len(ids) < count:
+            drawn = [self.permute(index) for index in self.next_indexes(count - len(ids))]
+            taken = self.taken(drawn)
+            ids.extend(order_id for order_id in drawn if order_id not in taken)
+        return ids
+
+
+@lru_cache(maxsize=None)
+def get_order_id_allocator() -> OrderIdAllocator:
+    return import_string(settings.ORDER_ID_ALLOCATOR)()
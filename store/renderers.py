@@ -0,0 +1,85 @@
+import csv
+import json
+
+import orjson
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+
+class _Echo:
+    """file-like object which returns what is written, csv.writer formats lines through it"""
+
+    def write(self, value):
+        return value
+
+
+class NDJSONRenderer(BaseRenderer):
+    """one JSON document per line, `stream` renders rows lazily"""
+
+    media_type = 'application/x-ndjson'
+    format = 'ndjson'
+    charset = 'utf-8'
+
+    def _line(self, data):
+        return json.dumps(data, cls=JSONEncoder, ensure_ascii=False, separators=(',', ':')) + '\n'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        rows = data if isinstance(data, list) else [data]
+        return ''.join(self._line(row) for row in rows).encode(self.charset)
+
+    def stream(self, rows, fields):
+        for row in rows:
+            yield self._line(row)
+
+
+class CSVRenderer(BaseRenderer):
+    """a header line of the fields and a line per row, nested values are written as JSON"""
+
+    media_type = 'text/csv'
+    format = 'csv'
+    charset = 'utf-8'
+
+    @staticmethod
+    def _cell(value):
+        if isinstance(value, (dict, list)):
+            return json.dumps(value, cls=JSONEncoder, ensure_ascii=False, separators=(',', ':'))
+        return value
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        rows = data if isinstance(data, list) else [data]
+        fields = list(rows[0]) if rows else []
+        return ''.join(self.stream(rows, fields)).encode(self.charset)
+
+    def stream(self, rows, fields):
+        writer = csv.writer(_Echo())
+        yield writer.writerow(fields)
+        for row in rows:
+            yield writer.writerow([self._cell(row.get(field)) for field in fields])
+
+
+class FastJSONRenderer(JSONRenderer):
+    """
+    JSONRenderer output rendered by orjson
+
+    Types orjson does not render as DRF does (datetimes, decimals, lazy strings...) go through DRF's encoder.
+    Floats are written in their shortest form, e.g. 1e-05 as 0.00001. Indented output is rendered by JSONRenderer.
+    """
+
+    _options = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if (data is None or self.ensure_ascii or not self.compact
+                or self.get_indent(accepted_media_type, renderer_context or {}) is not None):
+            return super().render(data, accepted_media_type, renderer_context)
+
+        try:
+            ret = orjson.dumps(data, default=JSONEncoder().default, option=self._options)
+        except orjson.JSONEncodeError:
+            # e.g. integers beyond 64 bits
+            return super().render(data, accepted_media_type, renderer_context)
+
+        return ret.replace('\u2028'.encode(), b'\\u2028').replace('\u2029'.encode(), b'\\u2029')
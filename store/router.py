@@ -1,5 +1,6 @@
 from rest_framework import routers
 
+from .views.catalog_change import CatalogChangesView
 from .views.good import GoodsView
 from .views.my_order import MyOrderView
 from .views.offer import OffersView
@@ -24,6 +25,11 @@ store_api_router.register(
     OffersView,
     basename='offers'
 )
+store_api_router.register(
+    'catalog/changes',
+    CatalogChangesView,
+    basename='catalog-changes'
+)
 store_api_router.register(
     'purchases',
     PurchaseView,
@@ -0,0 +1,102 @@
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.utils import timezone
+from rest_framework import ISO_8601, serializers
+from rest_framework.settings import api_settings
+
+from store.fieldsets import prune
+
+# fields whose to_representation returns the values() value unchanged
+PASSTHROUGH_FIELDS = (serializers.IntegerField, serializers.CharField, serializers.BooleanField,
+                      serializers.PrimaryKeyRelatedField)
+
+
+def _isoformat(value):
+    value = value.isoformat()
+    return value[:-6] + 'Z' if value.endswith('+00:00') else value
+
+
+class RowSerializer:
+    """
+    renders `values_list(*lookups)` rows of a queryset as the serializer would render its model instances
+
+    The rows-to-dicts function is generated once per serializer class and converts only the values whose
+    representation differs from what the database returns. Aware datetimes are converted to the current time zone
+    once per call instead of through DateTimeField.to_representation for each value. A selection of
+    store.fieldsets prunes the serializer first.
+    """
+
+    def __init__(self, serializer_class, selection=None):
+        self.serializer_class = serializer_class
+        self.selection = selection
+        self._many = self._build(aware=True)
+        self._many_naive = self._build(aware=False)
+
+    def _build(self, aware):
+        self.lookups = []
+        namespace = {'_isoformat': _isoformat}
+        serializer = self.serializer_class()
+        if self.selection is not None:
+            prune(serializer, self.selection)
+        expression = self._compile(serializer, '', aware, namespace)
+        exec(f'def many(rows, tz):\n    return [{expression} for row in rows]\n', namespace)
+        return namespace['many']
+
+    def _lookup(self, lookup):
+        self.lookups.append(lookup)
+        return len(self.lookups) - 1
+
+    def _compile(self, serializer, prefix, aware, namespace):
+        items = []
+        for name, field in serializer.fields.items():
+            if field.write_only:
+                continue
+
+            if isinstance(field, serializers.BaseSerializer):
+                if isinstance(field, serializers.ListSerializer):
+                    raise ImproperlyConfigured(f'{self.serializer_class.__name__}.{name}: to-many fields '
+                                               f'can not be read from rows.')
+                # the foreign key tells a missing related object
+                idx = self._lookup(f'{prefix}{field.source}')
+                nested = self._compile(field, f'{prefix}{field.source}__', aware, namespace)
+                items.append(f'{name!r}: (None if row[{idx}] is None else {nested})')
+                continue
+
+            if field.source == '*' or isinstance(field, serializers.SerializerMethodField):
+                raise ImproperlyConfigured(f'{self.serializer_class.__name__}.{name}: computed fields '
+                                           f'can not be read from rows.')
+
+            idx = self._lookup(prefix + field.source.replace('.', '__'))
+            if type(field) in PASSTHROUGH_FIELDS:
+                items.append(f'{name!r}: row[{idx}]')
+                continue
+
+            if aware and self._is_iso_datetime(field):
+                value = f'_isoformat(row[{idx}].astimezone(tz))'
+            else:
+                namespace[f'convert_{idx}'] = field.to_representation
+                value = f'convert_{idx}(row[{idx}])'
+            items.append(f'{name!r}: (None if row[{idx}] is None else {value})')
+
+        return '{' + ', '.join(items) + '}'
+
+    @staticmethod
+    def _is_iso_datetime(field):
+        output_format = getattr(field, 'format', api_settings.DATETIME_FORMAT)
+        return (isinstance(field, serializers.DateTimeField) and not hasattr(field, 'timezone')
+                and output_format is not None and output_format.lower() == ISO_8601)
+
+    def values(self, queryset):
+        return queryset.prefetch_related(None).values_list(*self.lookups)
+
+    def many(self, rows):
+        if settings.USE_TZ:
+            return self._many(rows, timezone.get_current_timezone())
+        return self._many_naive(rows, None)
+
+
+@lru_cache(maxsize=256)
+def get_row_serializer(serializer_class, selection=None):
+    return RowSerializer(serializer_class, selection)
@@ -1,11 +1,29 @@
+from collections import defaultdict
+
 from django.db import transaction
+from django.db.models import Prefetch, prefetch_related_objects
 from django.utils.translation import gettext_lazy as _
 from rest_framework import serializers
 
-from .models import Good, Offer, Purchase
+from .models import CatalogChange, Good, Offer, Purchase
 from .models import Order, Settings
 
 
+class EagerLoadingSerializerMixin:
+    """serializers declare the related objects they render, views apply them through setup_eager_loading"""
+
+    select_related = ()
+    prefetch_related = ()
+
+    @classmethod
+    def setup_eager_loading(cls, queryset):
+        if cls.select_related:
+            queryset = queryset.select_related(*cls.select_related)
+        if cls.prefetch_related:
+            queryset = queryset.prefetch_related(*cls.prefetch_related)
+        return queryset
+
+
 class SettingsSerializer(serializers.ModelSerializer):
 
     class Meta:
@@ -13,99 +31,222 @@ class SettingsSerializer(serializers.ModelSerializer):
         fields = '__all__'
 
 
-class GoodSerializer(serializers.ModelSerializer):
+class GoodSerializer(EagerLoadingSerializerMixin, serializers.ModelSerializer):
 
     class Meta:
         model = Good
         fields = '__all__'
 
 
-class OfferSerializer(serializers.ModelSerializer):
+class OfferSerializer(EagerLoadingSerializerMixin, serializers.ModelSerializer):
     good = GoodSerializer(read_only=True)
     good_id = serializers.IntegerField()
 
+    select_related = ('good', )
+
     class Meta:
         model = Offer
         fields = '__all__'
 
 
-class PurchaseSerializer(serializers.ModelSerializer):
+class CatalogChangeSerializer(serializers.ModelSerializer):
+    """a change with the current representation of the object from context['objects'], deleted objects have none"""
+
+    action = serializers.SerializerMethodField()
+    data = serializers.SerializerMethodField()
+
+    class Meta:
+        model = CatalogChange
+        fields = ['id', 'position', 'model', 'object_id', 'action', 'data']
+
+    def get_action(self, change):
+        return CatalogChange.Action(change.action).name.lower()
+
+    def get_data(self, change):
+        return self.context['objects'].get((change.model, change.object_id))
+
+
+class PurchaseSerializer(EagerLoadingSerializerMixin, serializers.ModelSerializer):
     good = GoodSerializer(read_only=True)
     good_id = serializers.IntegerField()
 
+    select_related = ('good', )
+
     class Meta:
         model = Purchase
         fields = '__all__'
 
 
-class OrderSerializer(serializers.ModelSerializer):
-    purchases = PurchaseSerializer(many=True)
+class OrderPurchaseSerializer(PurchaseSerializer):
+    """purchases nested into an order belong to it, so their order is not looked up for every item"""
+
+    class Meta(PurchaseSerializer.Meta):
+        extra_kwargs = {'order': {'read_only': True}}
+
+
+class OrderSerializer(EagerLoadingSerializerMixin, serializers.ModelSerializer):
+    purchases = OrderPurchaseSerializer(many=True)
+
+    prefetch_related = (Prefetch('purchases', queryset=PurchaseSerializer.setup_eager_loading(Purchase.objects.all())), )
 
     class Meta:
         model = Order
         fields = '__all__'
-        extra_kwargs = {'user': {'read_only': True}}
+        extra_kwargs = {'user': {'read_only': True},
+                        'total_price': {'read_only': True},
+                        'item_count': {'read_only': True}}
+
+    @staticmethod
+    def _sync_purchases(instance, purchases):
+        """
+        apply incoming purchases as a diff: stored purchases are matched by good, preferring the same price
+
+        Returns the prices of the resulting purchases.
+        """
+        stored = defaultdict(list)
+        for purchase in instance.purchases.get_queryset():
+            stored[purchase.good_id].append(purchase)
+
+        created, updated, prices = [], [], []
+        for data in purchases:
+            prices.append(data['price'])
+            candidates = stored[data['good_id']]
+            if not candidates:
+                created.append(Purchase(order=instance, good_id=data['good_id'], price=data['price']))
+                continue
+
+            purchase = next((p for p in candidates if p.price == data['price']), candidates[0])
+            candidates.remove(purchase)
+            if purchase.price != data['price']:
+                purchase.price = data['price']
+                updated.append(purchase)
+
+        deleted = [p.id for candidates in stored.values() for p in candidates]
+
+        if deleted:
+            Purchase.objects.filter(id__in=deleted).delete()
+        if updated:
+            Purchase.objects.bulk_update(updated, ['price'])
+        if created:
+            Purchase.objects.bulk_create(created)
+
+        return prices
 
     @transaction.atomic
     def update(self, instance, validated_data):
-        instance.purchases.get_queryset().delete()
-        purchases = validated_data.pop('purchases', [])
-        for purchase in purchases:
-            purchase['order'] = instance
-            PurchaseSerializer().create(purchase)
+        purchases = validated_data.pop('purchases', None)
+        if purchases is not None:
+            prices = self._sync_purchases(instance, purchases)
+            validated_data.update(Order.totals(prices))
+
+        # finishing goes through the transition, so that the confirmation is queued in this transaction
+        if validated_data.get('status') == Order.Status.FINISHED and instance.status != Order.Status.FINISHED:
+            validated_data.pop('status')
+            instance.finish()
 
         return super().update(instance, validated_data)
 
 
-class MyOrderSerializer(serializers.ModelSerializer):
+class OrderTransitionSerializer(serializers.Serializer):
+    transition = serializers.ChoiceField(choices=Order.BULK_TRANSITIONS)
+    ids = serializers.ListField(child=serializers.IntegerField(), allow_empty=False, required=False)
+
+
+def _create_purchases(orders, offers):
+    """bulk create purchases of every order from its offers"""
+    purchases = []
+    for order, order_offers in zip(orders, offers):
+        for offer in order_offers:
+            p = Purchase.from_offer(offer)
+            p.order = order
+            purchases.append(p)
+    Purchase.objects.bulk_create(purchases)
+
+
+class MyOrderListSerializer(serializers.ListSerializer):
+
+    def to_internal_value(self, data):
+        # offers of all orders are fetched with a single query and shared with the child through the context
+        ids = set()
+        for item in data if isinstance(data, list) else []:
+            offer_ids = item.get('offer_ids') if isinstance(item, dict) else None
+            for offer_id in offer_ids if isinstance(offer_ids, list) else []:
+                try:
+                    ids.add(int(offer_id))
+                except (TypeError, ValueError):
+                    pass  # reported by the child's validation
+        self.context['offers'] = Offer.objects.select_related('good').in_bulk(ids)
+
+        return super().to_internal_value(data)
+
+    @transaction.atomic
+    def create(self, validated_data):
+        offers = [attrs.pop('offer_ids') for attrs in validated_data]
+
+        user = self.context['request'].user
+        if not user.is_anonymous:
+            for attrs in validated_data:
+                attrs['user'] = user
+
+        orders = Order.objects.bulk_create([Order(**attrs, **Order.totals(offer.price for offer in order_offers))
+                                            for attrs, order_offers in zip(validated_data, offers)])
+        _create_purchases(orders, offers)
+        prefetch_related_objects(orders, *self.child.prefetch_related)
+
+        return orders
+
+
+class MyOrderSerializer(EagerLoadingSerializerMixin, serializers.ModelSerializer):
     purchases = PurchaseSerializer(many=True, read_only=True)
     offer_ids = serializers.ListField(child=serializers.IntegerField(), allow_empty=False, write_only=True)
 
+    prefetch_related = OrderSerializer.prefetch_related
+
     class Meta:
         model = Order
-        fields = ['id', 'email', 'eth_address', 'purchases', 'status', 'offer_ids']
-        extra_kwargs = {'status': {'read_only': True}}
-
-    @staticmethod
-    def validate_offer_ids(ids):
-        offers_count = Offer.objects.filter(id__in=ids).count()
-
-        if offers_count != len(ids):
+        fields = ['id', 'email', 'eth_address', 'purchases', 'status', 'total_price', 'item_count', 'offer_ids',
+                  'created_at', 'updated_at']
+        extra_kwargs = {'status': {'read_only': True},
+                        'total_price': {'read_only': True},
+                        'item_count': {'read_only': True}}
+        list_serializer_class = MyOrderListSerializer
+
+    def validate_offer_ids(self, ids):
+        # offers are fetched once with their goods and passed on to create/update via validated_data
+        prefetched = self.context.get('offers')
+        if prefetched is None:
+            offers = list(Offer.objects.select_related('good').filter(id__in=ids))
+        else:
+            offers = [prefetched[offer_id] for offer_id in dict.fromkeys(ids) if offer_id in prefetched]
+
+        if len(offers) != len(ids):
             error = {'detail': _('Some offers are not available anymore. Please refresh.')}
             raise serializers.ValidationError(detail=error)
 
-        return ids
+        return offers
 
     @transaction.atomic
     def create(self, validated_data):
-        offer_ids = validated_data.pop('offer_ids')
-        offers = Offer.objects.filter(id__in=offer_ids).all()
+        offers = validated_data.pop('offer_ids')
 
-        instance = super().create(validated_data)
         user = self.context['request'].user
         if not user.is_anonymous:
-            instance.user = user
-        instance.save()
+            validated_data['user'] = user
+        validated_data.update(Order.totals(offer.price for offer in offers))
+        instance = super().create(validated_data)
 
-        purchases = [Purchase.from_offer(offer) for offer in offers]
-        for p in purchases:
-            p.order = instance
-            p.save()
+        _create_purchases([instance], [offers])
+        prefetch_related_objects([instance], *self.prefetch_related)
 
         return instance
 
     @transaction.atomic
     def update(self, instance, validated_data):
-        offer_ids = validated_data.pop('offer_ids', [])
-
-        if offer_ids:
-            offers = Offer.objects.filter(id__in=offer_ids).all()
+        offers = validated_data.pop('offer_ids', [])
 
+        if offers:
             instance.purchases.get_queryset().delete()
-
-            purchases = [Purchase.from_offer(offer) for offer in offers]
-            for p in purchases:
-                p.order = instance
-                p.save()
+            _create_purchases([instance], [offers])
+            validated_data.update(Order.totals(offer.price for offer in offers))
 
         return super().update(instance, validated_data)
@@ -0,0 +1,207 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from parameterized import parameterized
+
+from store.models import CatalogChange, Good, Offer
+from store.tests.utils import PermissionTest
+
+
+class CatalogChangesTest(PermissionTest):
+
+    def setUp(self):
+        super().setUp()
+
+        self.user, created = get_user_model().objects.update_or_create(
+            username='test',
+            defaults={'is_superuser': False, 'is_staff': False, 'is_active': True})
+        self.client.force_login(self.user)
+
+        self.good = Good.objects.create(name='good')
+        self.offer = Offer.objects.create(good=self.good, price=1)
+
+    def _changes(self, **params):
+        # as the commits of the writes would, the test case runs in one transaction
+        CatalogChange.assign_positions()
+        response = self.client.get(reverse('store:catalog-changes-list'), data=params)
+        self.assertEqual(200, response.status_code, response.content)
+        return response.json()
+
+    @staticmethod
+    def _actions(results):
+        return [(r['model'], r['object_id'], r['action']) for r in results]
+
+    @parameterized.expand([
+        ([], 403),
+        (["store.view_good"], 200),
+        (["store.view_offer"], 200),
+    ])
+    def test_list_permissions(self, perms, status_code):
+        CatalogChange.assign_positions()
+        with self._set_perms(self.user, perms):
+
+            response = self.client.get(reverse('store:catalog-changes-list'))
+
+            self.assertEqual(status_code, response.status_code, response.content)
+            if status_code >= 400:
+                return
+
+            models = {r['model'] for r in response.json()['results']}
+            self.assertSetEqual({perm.split('_')[1] for perm in perms}, models)
+
+    def test_list(self):
+        with self._set_perms(self.user, ["store.view_good", "store.view_offer"]):
+            cursor = self._changes()['cursor']
+
+            self.offer.price = 2
+            self.offer.save()
+            other_offer = Offer.objects.create(good=self.good, price=3)
+            other_offer_id = other_offer.id
+            other_offer.delete()
+
+            changes = self._changes(cursor=cursor)
+
+            self.assertListEqual([
+                ('offer', self.offer.id, 'update'),
+                ('offer', other_offer_id, 'insert'),
+                ('offer', other_offer_id, 'delete'),
+            ], self._actions(changes['results']))
+            self.assertEqual('2.000000', changes['results'][0]['data']['price'])
+            self.assertEqual('good', changes['results'][0]['data']['good']['name'])
+            self.assertIsNone(changes['results'][1]['data'])
+            self.assertEqual(changes['results'][-1]['position'], changes['cursor'])
+            self.assertFalse(changes['more'])
+
+            self.assertListEqual([], self._changes(cursor=changes['cursor'])['results'])
+
+    def test_list_limit(self):
+        for price in range(2, 7):
+            Offer.objects.create(good=self.good, price=price)
+
+        with self._set_perms(self.user, ["store.view_good", "store.view_offer"]):
+
+            results, cursor, more = [], 0, True
+            while more:
+                changes = self._changes(cursor=cursor, limit=3)
+                results += changes['results']
+                cursor, more = changes['cursor'], changes['more']
+
+            self.assertListEqual(list(CatalogChange.objects.order_by('id').values_list('id', flat=True)),
+                                 [r['id'] for r in results])
+            self.assertEqual(7, len(results))
+
+    @parameterized.expand([
+        ('update', lambda self: Offer.objects.filter(id=self.offer.id).update(price=5), 'update'),
+        ('bulk_update', lambda self: Offer.objects.bulk_update([self.offer], ['price']), 'update'),
+        ('queryset_delete', lambda self: Offer.objects.filter(id=self.offer.id).delete(), 'delete'),
+        ('cascade', lambda self: self.good.delete(), 'delete'),
+    ])
+    def test_list_orm_writes(self, name, write, action):
+        with self._set_perms(self.user, ["store.view_offer"]):
+            cursor = self._changes()['cursor']
+
+            write(self)
+
+            changes = self._changes(cursor=cursor)
+            self.assertListEqual([('offer', self.offer.id, action)], self._actions(changes['results']))
+
+    def test_list_change_committed_late(self):
+        with self._set_perms(self.user, ["store.view_good", "store.view_offer"]):
+            cursor = self._changes()['cursor']
+
+            # the lower id is committed after the higher one was listed
+            self.offer.save()
+            late = CatalogChange.objects.latest('id')
+            self.good.save()
+            CatalogChange.objects.filter(id=late.id).delete()
+            listed = self._changes(cursor=cursor)
+            late.position = None
+            late.save(force_insert=True)
+
+            changes = self._changes(cursor=listed['cursor'])
+
+            self.assertListEqual([('good', self.good.id, 'update')], self._actions(listed['results']))
+            self.assertListEqual([('offer', self.offer.id, 'update')], self._actions(changes['results']))
+            self.assertLess(changes['results'][0]['id'], listed['results'][0]['id'])
+            self.assertGreater(changes['cursor'], listed['cursor'])
+
+    def test_positions_assigned_on_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.offer.save()
+            Offer.objects.filter(id=self.offer.id).update(price=5)
+
+        self.assertFalse(CatalogChange.objects.filter(position=None).exists())
+        self.assertListEqual(list(CatalogChange.objects.order_by('id').values_list('id', flat=True)),
+                             list(CatalogChange.objects.order_by('position').values_list('id', flat=True)))
+
+    def test_positions_rolled_back_savepoint(self):
+        CatalogChange.assign_positions()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            try:
+                with transaction.atomic():
+                    self.offer.save()
+                    raise ValueError
+            except ValueError:
+                pass
+            self.good.save()
+
+        self.assertFalse(CatalogChange.objects.filter(position=None).exists())
+        self.assertEqual(('good', 'U'), CatalogChange.objects.values_list('model', 'action').latest('position'))
+
+    def test_list_does_not_write(self):
+        self.offer.save()
+
+        with self._set_perms(self.user, ["store.view_offer"]), CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('store:catalog-changes-list'))
+
+        self.assertEqual(200, response.status_code, response.content)
+        self.assertListEqual([], response.json()['results'])
+        self.assertFalse([query for query in queries if query['sql'].startswith(('UPDATE', 'INSERT'))])
+
+        with mock.patch('sys.stdout'):
+            call_command('assign_catalog_positions')
+        self.assertFalse(CatalogChange.objects.filter(position=None).exists())
+
+    def test_bulk_create(self):
+        with self._set_perms(self.user, ["store.view_good"]):
+            cursor = self._changes()['cursor']
+
+            goods = Good.objects.bulk_create([Good(name='bulk 1'), Good(name='bulk 2')])
+
+            changes = self._changes(cursor=cursor)
+            ids = list(Good.objects.filter(name__in=['bulk 1', 'bulk 2']).order_by('id').values_list('id', flat=True))
+            self.assertListEqual([('good', good_id, 'insert') for good_id in ids], self._actions(changes['results']))
+            self.assertEqual(2, len(goods))
+
+    def test_list_invalid_cursor(self):
+        with self._set_perms(self.user, ["store.view_good"]):
+
+            response = self.client.get(reverse('store:catalog-changes-list'), data={'cursor': 'x'})
+
+            self.assertEqual(400, response.status_code, response.content)
+
+    def test_compact(self):
+        for price in (2, 3):
+            self.offer.price = price
+            self.offer.save()
+        other_offer = Offer.objects.create(good=self.good, price=4)
+        other_offer_id = other_offer.id
+        other_offer.delete()
+
+        with mock.patch('sys.stdout'):
+            call_command('compact_catalog_changes', batch_size=2)
+
+        self.assertListEqual([
+            ('good', self.good.id, 'I'),
+            ('offer', self.offer.id, 'U'),
+            ('offer', other_offer_id, 'D'),
+        ], list(CatalogChange.objects.order_by('id').values_list('model', 'object_id', 'action')))
+
+        with self._set_perms(self.user, ["store.view_offer"]):
+            changes = self._changes()
+            self.assertEqual('3.000000', changes['results'][0]['data']['price'])
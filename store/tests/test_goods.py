@@ -1,17 +1,23 @@
+import tempfile
 from unittest import mock
 
+from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.contrib.auth.models import AnonymousUser
 from django.urls import reverse
+from django.utils import timezone
 from parameterized import parameterized
 
 from store.models import Good
+from store.views.good import GoodsView
 from store.tests.utils import PermissionTest
 
 
 class GoodsTest(PermissionTest):
 
     def setUp(self):
+        # sessions are cached in a shared cache only
+        self._use_shared_cache('sessions')
         super().setUp()
 
         self.user, created = get_user_model().objects.update_or_create(
@@ -38,6 +44,96 @@ class GoodsTest(PermissionTest):
             results = response.json()['results']
             self.assertEqual(results_count, len(results))
 
+    def test_list_query_count(self):
+        Good.objects.bulk_create([Good(name=f'good {idx}') for idx in range(10)])
+
+        with self._set_perms(self.user, ["store.view_good"]):
+            self._assert_list_queries_flat(reverse('store:goods-list'), 10)
+
+    @parameterized.expand([
+        ('UTC', ),
+        ('Asia/Yekaterinburg', ),
+    ])
+    def test_list_fast(self, time_zone):
+        Good.objects.bulk_create([Good(name=f'good "{idx}"') for idx in range(3)])
+
+        with self._set_perms(self.user, ["store.view_good"]), timezone.override(time_zone):
+            self._assert_fast_list_identical(GoodsView, reverse('store:goods-list'))
+
+    @parameterized.expand([
+        ('store:goods-list', {}),
+        ('store:goods-detail', {'pk': 1}),
+    ])
+    def test_response_cache(self, name, kwargs):
+        Good.objects.filter(id=self.good.id).update(id=1)
+
+        with self._set_perms(self.user, ["store.view_good"]):
+
+            url = reverse(name, kwargs=kwargs)
+            response = self.client.get(url)
+            self.assertEqual(200, response.status_code, response.content)
+            self.assertIn('ETag', response)
+
+            # the user only, the session is cached
+            with self.assertNumQueries(1):
+                cached = self.client.get(url)
+            self.assertEqual(response.json(), cached.json())
+            self.assertEqual(response['ETag'], cached['ETag'])
+            self.assertEqual(response.get('Last-Modified'), cached.get('Last-Modified'))
+
+            not_modified = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+            self.assertEqual(304, not_modified.status_code)
+            self.assertEqual(b'', not_modified.content)
+
+        with self._set_perms(self.user, []):
+            self.assertEqual(403, self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag']).status_code)
+
+    @parameterized.expand([
+        ('save', lambda good: good.save()),
+        ('update', lambda good: Good.objects.filter(id=good.id).update(name='renamed good')),
+        ('create', lambda good: Good.objects.create(name='other good')),
+    ])
+    def test_response_cache_invalidation(self, name, write):
+        with self._set_perms(self.user, ["store.view_good"]):
+
+            url = reverse('store:goods-list')
+            response = self.client.get(url)
+
+            write(self.good)
+
+            changed = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+            self.assertEqual(200, changed.status_code)
+            self.assertNotEqual(response['ETag'], changed['ETag'])
+            self.assertListEqual(list(Good.objects.order_by('id').values_list('name', flat=True)),
+                                 [r['name'] for r in changed.json()['results']])
+
+    def test_response_cache_invalidation_by_view(self):
+        with self._set_perms(self.user, ["store.view_good", "store.add_good"]):
+
+            url = reverse('store:goods-list')
+            self.assertEqual(1, self.client.get(url).json()['count'])
+
+            self.client.post(url, data={'name': 'test good'}, format='json')
+
+            self.assertEqual(2, self.client.get(url).json()['count'])
+
+    def test_response_cache_file_based(self):
+        with tempfile.TemporaryDirectory() as location, self.settings(CACHES={
+            **settings.CACHES,
+            'default': {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': location},
+        }), self._set_perms(self.user, ["store.view_good"]):
+
+            url = reverse('store:goods-list')
+            response = self.client.get(url)
+
+            with self.assertNumQueries(1):
+                self.assertEqual(response.json(), self.client.get(url).json())
+            self.assertEqual(304, self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag']).status_code)
+
+            self.good.save()
+
+            self.assertEqual(200, self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag']).status_code)
+
     @parameterized.expand([
         ([], 403),
         (["store.view_good"], 200),
@@ -55,6 +151,8 @@ class GoodsTest(PermissionTest):
             results = response.json()
             self.assertDictEqual(results, {
                 'id': self.good.id,
+                'created_at': mock.ANY,
+                'updated_at': mock.ANY,
                 'name': mock.ANY,
             })
 
@@ -84,6 +182,8 @@ class GoodsTest(PermissionTest):
             results = response.json()
             self.assertDictEqual(results, {
                 'id': created_good_id,
+                'created_at': mock.ANY,
+                'updated_at': mock.ANY,
                 'name': 'test good',
             })
 
@@ -112,6 +212,8 @@ class GoodsTest(PermissionTest):
             results = response.json()
             self.assertDictEqual(results, {
                 'id': self.good.id,
+                'created_at': mock.ANY,
+                'updated_at': mock.ANY,
                 'name': 'test good',
             })
 
@@ -140,6 +242,8 @@ class GoodsTest(PermissionTest):
             results = response.json()
             self.assertDictEqual(results, {
                 'id': self.good.id,
+                'created_at': mock.ANY,
+                'updated_at': mock.ANY,
                 'name': 'test good',
             })
 
@@ -206,6 +310,8 @@ class AnonymousGoodsTest(PermissionTest):
             results = response.json()
             self.assertDictEqual(results, {
                 'id': self.good.id,
+                'created_at': mock.ANY,
+                'updated_at': mock.ANY,
                 'name': mock.ANY,
             })
 
@@ -235,6 +341,8 @@ class AnonymousGoodsTest(PermissionTest):
             results = response.json()
             self.assertDictEqual(results, {
                 'id': created_good_id,
+                'created_at': mock.ANY,
+                'updated_at': mock.ANY,
                 'name': 'test good',
             })
 
@@ -263,6 +371,8 @@ class AnonymousGoodsTest(PermissionTest):
             results = response.json()
             self.assertDictEqual(results, {
                 'id': self.good.id,
+                'created_at': mock.ANY,
+                'updated_at': mock.ANY,
                 'name': 'test good',
             })
 
@@ -291,6 +401,8 @@ class AnonymousGoodsTest(PermissionTest):
             results = response.json()
             self.assertDictEqual(results, {
                 'id': self.good.id,
+                'created_at': mock.ANY,
+                'updated_at': mock.ANY,
                 'name': 'test good',
             })
 
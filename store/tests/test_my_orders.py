@@ -2,12 +2,16 @@ from unittest import mock
 
 from django.contrib.auth import get_user_model
 from django.contrib.auth.models import AnonymousUser
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from parameterized import parameterized
 
 from store.models import Good, Offer, Purchase, Order
 from store.tests.utils import PermissionTest
-from store.const import ORDER_IDS_SESSION_PARAM_NAME
+from store.const import ORDER_ACCESS_COOKIE_NAME, ORDER_ACCESS_HEADER, ORDER_IDS_SESSION_PARAM_NAME
+from store.order_access import dumps_order_access, loads_order_access
+from store.views.my_order import MyOrderView
 
 
 class MyOrdersTest(PermissionTest):
@@ -52,9 +56,7 @@ class MyOrdersTest(PermissionTest):
     def test_list(self, perms, status_code, results_count, get_order_ids):
         with self._set_perms(self.user, perms):
 
-            session = self.client.session
-            session[ORDER_IDS_SESSION_PARAM_NAME] = get_order_ids(self)
-            session.save()
+            self._grant_order_access(get_order_ids(self))
 
             url = reverse('store:buyer-orders-list')
             response = self.client.get(url)
@@ -91,13 +93,19 @@ class MyOrdersTest(PermissionTest):
             results = response.json()
             self.assertDictEqual(results, {
                 "id": order.id,
+                "created_at": mock.ANY,
+                "updated_at": mock.ANY,
                 "email": order.email,
                 "eth_address": order.eth_address,
                 "purchases": [
                     {
                         "id": purchase.id,
+                        "created_at": mock.ANY,
+                        "updated_at": mock.ANY,
                         "good": {
                             "id": self.good.id,
+                            "created_at": mock.ANY,
+                            "updated_at": mock.ANY,
                             "name": self.good.name
                         },
                         "good_id": self.good.id,
@@ -106,6 +114,8 @@ class MyOrdersTest(PermissionTest):
                     }
                 ],
                 "status": order.status.value,
+                "total_price": '1.000000',
+                "item_count": 1,
             })
 
     @parameterized.expand([
@@ -138,13 +148,19 @@ class MyOrdersTest(PermissionTest):
             results = response.json()
             self.assertDictEqual(results, {
                 "id": order_id,
+                "created_at": mock.ANY,
+                "updated_at": mock.ANY,
                 "email": "new@mail.ru",
                 "eth_address": '1' * 42,
                 "purchases": [
                     {
                         "id": mock.ANY,
+                        "created_at": mock.ANY,
+                        "updated_at": mock.ANY,
                         "good": {
                             "id": self.offer.good.id,
+                            "created_at": mock.ANY,
+                            "updated_at": mock.ANY,
                             "name": self.offer.good.name
                         },
                         "good_id": self.good.id,
@@ -153,8 +169,311 @@ class MyOrdersTest(PermissionTest):
                     }
                 ],
                 "status": Order.Status.DRAFT.value,
+                "total_price": '1.000000',
+                "item_count": 1,
             })
 
+    def _create_offers(self, count):
+        Good.objects.bulk_create([Good(name=f'bulk good {idx}') for idx in range(count)])
+        goods = Good.objects.filter(name__startswith='bulk good')
+        Offer.objects.bulk_create([Offer(good=good, price=1) for good in goods])
+        return list(Offer.objects.filter(good__in=goods).values_list('id', flat=True))
+
+    def test_list_query_count(self):
+        offer_ids = self._create_offers(10)
+        for idx in range(10):
+            order = Order.objects.create(user=self.user, email='test@mail.ru', eth_address='0' * 42)
+            Purchase.objects.bulk_create([Purchase(good_id=offer.good_id, price=offer.price, order=order)
+                                          for offer in Offer.objects.filter(id__in=offer_ids[:idx + 1])])
+
+        with self._set_perms(self.user, ['store.view_my_order']):
+            self._assert_list_queries_flat(reverse('store:buyer-orders-list'), 10)
+
+    def test_create_query_count(self):
+        offer_ids = self._create_offers(50)
+
+        with self._set_perms(self.user, ['store.moderate_my_order']):
+
+            url = reverse('store:buyer-orders-list')
+            data = {
+                "email": "new@mail.ru",
+                "eth_address": '1' * 42,
+            }
+            single = self._count_queries('post', url, {**data, "offer_ids": offer_ids[:1]})
+            many = self._count_queries('post', url, {**data, "offer_ids": offer_ids})
+
+            self.assertEqual(single, many)
+
+            order = Order.objects.filter(email="new@mail.ru").latest('id')
+            self.assertEqual(50, order.purchases.count())
+
+    def test_update_query_count(self):
+        offer_ids = self._create_offers(50)
+
+        with self._set_perms(self.user, ['store.moderate_my_order']):
+
+            url = reverse('store:buyer-orders-detail', kwargs={"pk": self.user_order.id})
+            data = {
+                "email": "new@mail.ru",
+                "eth_address": '1' * 42,
+            }
+            single = self._count_queries('put', url, {**data, "offer_ids": offer_ids[:1]})
+            many = self._count_queries('put', url, {**data, "offer_ids": offer_ids})
+
+            self.assertEqual(single, many)
+            self.assertEqual(50, self.user_order.purchases.count())
+
+    @parameterized.expand([
+        ([], 403),
+        (["store.moderate_my_order"], 201),
+    ])
+    def test_bulk_create(self, perms, status_code):
+        with self._set_perms(self.user, perms):
+
+            url = reverse('store:buyer-orders-bulk')
+            data = [
+                {
+                    "email": "new@mail.ru",
+                    "eth_address": '1' * 42,
+                    "offer_ids": [self.offer.id],
+                },
+                {
+                    "email": "new2@mail.ru",
+                    "eth_address": '2' * 42,
+                    "offer_ids": [self.offer.id, self.offer2.id],
+                },
+            ]
+            response = self.client.post(url, data=data, format='json')
+            self.assertEqual(status_code, response.status_code, response.content)
+
+            if status_code >= 400:
+                return
+
+            results = response.json()
+            self.assertListEqual(results, [
+                {
+                    "id": mock.ANY,
+                    "created_at": mock.ANY,
+                    "updated_at": mock.ANY,
+                    "email": "new@mail.ru",
+                    "eth_address": '1' * 42,
+                    "purchases": [
+                        {
+                            "id": mock.ANY,
+                            "created_at": mock.ANY,
+                            "updated_at": mock.ANY,
+                            "good": {
+                                "id": self.good.id,
+                                "created_at": mock.ANY,
+                                "updated_at": mock.ANY,
+                                "name": self.good.name
+                            },
+                            "good_id": self.good.id,
+                            "price": '1.000000',
+                            "order": results[0]['id'],
+                        }
+                    ],
+                    "status": Order.Status.DRAFT.value,
+                    "total_price": '1.000000',
+                    "item_count": 1,
+                },
+                {
+                    "id": mock.ANY,
+                    "created_at": mock.ANY,
+                    "updated_at": mock.ANY,
+                    "email": "new2@mail.ru",
+                    "eth_address": '2' * 42,
+                    "purchases": [
+                        {
+                            "id": mock.ANY,
+                            "created_at": mock.ANY,
+                            "updated_at": mock.ANY,
+                            "good": {
+                                "id": self.good.id,
+                                "created_at": mock.ANY,
+                                "updated_at": mock.ANY,
+                                "name": self.good.name
+                            },
+                            "good_id": self.good.id,
+                            "price": '1.000000',
+                            "order": results[1]['id'],
+                        },
+                        {
+                            "id": mock.ANY,
+                            "created_at": mock.ANY,
+                            "updated_at": mock.ANY,
+                            "good": {
+                                "id": self.good2.id,
+                                "created_at": mock.ANY,
+                                "updated_at": mock.ANY,
+                                "name": self.good2.name
+                            },
+                            "good_id": self.good2.id,
+                            "price": '1.000000',
+                            "order": results[1]['id'],
+                        },
+                    ],
+                    "status": Order.Status.DRAFT.value,
+                    "total_price": '2.000000',
+                    "item_count": 2,
+                },
+            ])
+            self.assertEqual(2, Order.objects.filter(user=self.user, email__in=["new@mail.ru", "new2@mail.ru"]).count())
+
+    def test_bulk_create_errors(self):
+        with self._set_perms(self.user, ['store.moderate_my_order']):
+
+            url = reverse('store:buyer-orders-bulk')
+            data = [
+                {
+                    "email": "new@mail.ru",
+                    "eth_address": '1' * 42,
+                    "offer_ids": [self.offer.id],
+                },
+                {
+                    "email": "new2@mail.ru",
+                    "eth_address": '2' * 42,
+                    "offer_ids": [self.offer.id, -1],
+                },
+            ]
+            response = self.client.post(url, data=data, format='json')
+            self.assertEqual(400, response.status_code, response.content)
+
+            errors = response.json()
+            self.assertDictEqual({}, errors[0])
+            self.assertListEqual(['offer_ids'], list(errors[1]))
+            self.assertFalse(Order.objects.filter(email__in=["new@mail.ru", "new2@mail.ru"]).exists())
+
+    def test_bulk_create_max_size(self):
+        with self._set_perms(self.user, ['store.moderate_my_order']), self.settings(ORDER_BULK_MAX_SIZE=2):
+
+            url = reverse('store:buyer-orders-bulk')
+            data = {
+                "email": "new@mail.ru",
+                "eth_address": '1' * 42,
+                "offer_ids": [self.offer.id],
+            }
+            response = self.client.post(url, data=[data] * 3, format='json')
+            self.assertEqual(400, response.status_code, response.content)
+            self.assertListEqual(['non_field_errors'], list(response.json()))
+            self.assertFalse(Order.objects.filter(email="new@mail.ru").exists())
+
+            response = self.client.post(url, data=[data] * 2, format='json')
+            self.assertEqual(201, response.status_code, response.content)
+
+    def test_bulk_create_query_count(self):
+        offer_ids = self._create_offers(50)
+
+        with self._set_perms(self.user, ['store.moderate_my_order']):
+
+            url = reverse('store:buyer-orders-bulk')
+            data = {
+                "email": "new@mail.ru",
+                "eth_address": '1' * 42,
+            }
+            single = self._count_queries('post', url, [{**data, "offer_ids": offer_ids[:1]}])
+            many = self._count_queries('post', url, [{**data, "offer_ids": offer_ids[idx:idx + 5]}
+                                                     for idx in range(0, 50, 5)])
+
+            # orders draw their ids one by one unless the database returns rows from bulk inserts
+            extra = 0 if connection.features.can_return_rows_from_bulk_insert else 9
+            self.assertEqual(single + extra, many)
+
+    def test_create_idempotency_key(self):
+        with self._set_perms(self.user, ['store.moderate_my_order']):
+
+            url = reverse('store:buyer-orders-list')
+            data = {
+                "email": "new@mail.ru",
+                "eth_address": '1' * 42,
+                "offer_ids": [self.offer.id],
+            }
+            response = self.client.post(url, data=data, format='json', HTTP_IDEMPOTENCY_KEY='key')
+            self.assertEqual(201, response.status_code, response.content)
+
+            with CaptureQueriesContext(connection) as queries:
+                replayed = self.client.post(url, data=data, format='json', HTTP_IDEMPOTENCY_KEY='key')
+
+            self.assertEqual(201, replayed.status_code, replayed.content)
+            self.assertEqual('true', replayed['Idempotent-Replayed'])
+            self.assertDictEqual(response.json(), replayed.json())
+            self.assertFalse([q for q in queries if 'store_order' in q['sql'] or 'store_purchase' in q['sql']])
+            self.assertEqual(1, Order.objects.filter(email="new@mail.ru").count())
+
+            response = self.client.post(url, data={**data, "email": "new2@mail.ru"}, format='json',
+                                        HTTP_IDEMPOTENCY_KEY='key')
+            self.assertEqual(422, response.status_code, response.content)
+
+            response = self.client.post(url, data=data, format='json', HTTP_IDEMPOTENCY_KEY='other key')
+            self.assertEqual(201, response.status_code, response.content)
+            self.assertEqual(2, Order.objects.filter(email="new@mail.ru").count())
+
+    @parameterized.expand([
+        ('put', {"email": "new@mail.ru", "eth_address": '1' * 42, "offer_ids": [1]}),
+        ('patch', {"email": "new@mail.ru"}),
+    ])
+    def test_update_idempotency_key(self, method, data):
+        data = {**data, "offer_ids": [self.offer2.id]} if 'offer_ids' in data else data
+
+        with self._set_perms(self.user, ['store.moderate_my_order']):
+
+            url = reverse('store:buyer-orders-detail', kwargs={"pk": self.user_order.id})
+            response = getattr(self.client, method)(url, data=data, format='json', HTTP_IDEMPOTENCY_KEY='key')
+            self.assertEqual(200, response.status_code, response.content)
+
+            with CaptureQueriesContext(connection) as queries:
+                replayed = getattr(self.client, method)(url, data=data, format='json', HTTP_IDEMPOTENCY_KEY='key')
+
+            self.assertEqual(200, replayed.status_code, replayed.content)
+            self.assertDictEqual(response.json(), replayed.json())
+            self.assertFalse([q for q in queries if 'store_order' in q['sql'] or 'store_purchase' in q['sql']])
+
+    def test_idempotency_key_released_meanwhile(self):
+        with self._set_perms(self.user, ['store.moderate_my_order']):
+
+            url = reverse('store:buyer-orders-list')
+            data = {
+                "email": "new@mail.ru",
+                "eth_address": '1' * 42,
+                "offer_ids": [self.offer.id],
+            }
+            # every add loses the key to a request which releases it before the get
+            cache = mock.Mock(**{'add.return_value': False, 'get.return_value': None})
+            with mock.patch.object(MyOrderView, 'idempotency_cache', cache):
+                response = self.client.post(url, data=data, format='json', HTTP_IDEMPOTENCY_KEY='key')
+
+            self.assertEqual(409, response.status_code, response.content)
+            self.assertEqual(2, cache.add.call_count)
+            self.assertFalse(Order.objects.filter(email="new@mail.ru").exists())
+
+    def test_idempotency_per_process_cache(self):
+        with self._set_perms(self.user, ['store.moderate_my_order']), \
+                mock.patch('store.idempotency._warned_per_process', False):
+
+            url = reverse('store:buyer-orders-detail', kwargs={"pk": self.user_order.id})
+            with self.assertLogs('store.idempotency', 'WARNING'):
+                self.client.patch(url, data={"email": "new@mail.ru"}, format='json', HTTP_IDEMPOTENCY_KEY='key')
+
+            # once per process
+            with self.assertNoLogs('store.idempotency', 'WARNING'):
+                self.client.patch(url, data={"email": "new@mail.ru"}, format='json', HTTP_IDEMPOTENCY_KEY='key')
+
+    def test_failed_request_is_not_stored(self):
+        with self._set_perms(self.user, ['store.moderate_my_order']):
+
+            url = reverse('store:buyer-orders-list')
+            data = {
+                "email": "new@mail.ru",
+                "eth_address": '1' * 42,
+                "offer_ids": [-1],
+            }
+            response = self.client.post(url, data=data, format='json', HTTP_IDEMPOTENCY_KEY='key')
+            self.assertEqual(400, response.status_code, response.content)
+
+            response = self.client.post(url, data=data, format='json', HTTP_IDEMPOTENCY_KEY='key')
+            self.assertEqual(400, response.status_code, response.content)
+            self.assertFalse(response.has_header('Idempotent-Replayed'))
+
     @parameterized.expand([
         ([], 403, 'user'),
         ([], 403, 'other_user'),
@@ -191,13 +510,19 @@ class MyOrdersTest(PermissionTest):
             results = response.json()
             self.assertDictEqual(results, {
                 "id": order.id,
+                "created_at": mock.ANY,
+                "updated_at": mock.ANY,
                 "email": "new@mail.ru",
                 "eth_address": '1' * 42,
                 "purchases": [
                     {
                         "id": mock.ANY,
+                        "created_at": mock.ANY,
+                        "updated_at": mock.ANY,
                         "good": {
                             "id": self.good2.id,
+                            "created_at": mock.ANY,
+                            "updated_at": mock.ANY,
                             "name": self.good2.name
                         },
                         "good_id": self.good2.id,
@@ -206,6 +531,8 @@ class MyOrdersTest(PermissionTest):
                     }
                 ],
                 "status": Order.Status.DRAFT.value,
+                "total_price": '1.000000',
+                "item_count": 1,
             })
 
     @parameterized.expand([
@@ -242,13 +569,19 @@ class MyOrdersTest(PermissionTest):
             results = response.json()
             self.assertDictEqual(results, {
                 "id": order.id,
+                "created_at": mock.ANY,
+                "updated_at": mock.ANY,
                 "email": "new@mail.ru",
                 "eth_address": order.eth_address,
                 "purchases": [
                     {
                         "id": mock.ANY,
+                        "created_at": mock.ANY,
+                        "updated_at": mock.ANY,
                         "good": {
                             "id": self.good.id,
+                            "created_at": mock.ANY,
+                            "updated_at": mock.ANY,
                             "name": self.good.name
                         },
                         "good_id": self.good.id,
@@ -257,6 +590,8 @@ class MyOrdersTest(PermissionTest):
                     }
                 ],
                 "status": Order.Status.DRAFT.value,
+                "total_price": '1.000000',
+                "item_count": 1,
             })
 
     @parameterized.expand([
@@ -304,9 +639,7 @@ class AnonymousMyOrdersTest(PermissionTest):
     def test_list(self, perms, status_code, results_count, get_order_ids):
         with self._set_perms(self.anon_user, perms):
 
-            session = self.client.session
-            session[ORDER_IDS_SESSION_PARAM_NAME] = get_order_ids(self)
-            session.save()
+            self._grant_order_access(get_order_ids(self))
 
             url = reverse('store:buyer-orders-list')
             response = self.client.get(url)
@@ -341,13 +674,19 @@ class AnonymousMyOrdersTest(PermissionTest):
             results = response.json()
             self.assertDictEqual(results, {
                 "id": order.id,
+                "created_at": mock.ANY,
+                "updated_at": mock.ANY,
                 "email": order.email,
                 "eth_address": order.eth_address,
                 "purchases": [
                     {
                         "id": purchase.id,
+                        "created_at": mock.ANY,
+                        "updated_at": mock.ANY,
                         "good": {
                             "id": self.good.id,
+                            "created_at": mock.ANY,
+                            "updated_at": mock.ANY,
                             "name": self.good.name
                         },
                         "good_id": self.good.id,
@@ -356,6 +695,8 @@ class AnonymousMyOrdersTest(PermissionTest):
                     }
                 ],
                 "status": order.status.value,
+                "total_price": '1.000000',
+                "item_count": 1,
             })
 
     @parameterized.expand([
@@ -388,13 +729,19 @@ class AnonymousMyOrdersTest(PermissionTest):
             results = response.json()
             self.assertDictEqual(results, {
                 "id": order_id,
+                "created_at": mock.ANY,
+                "updated_at": mock.ANY,
                 "email": "new@mail.ru",
                 "eth_address": '1' * 42,
                 "purchases": [
                     {
                         "id": mock.ANY,
+                        "created_at": mock.ANY,
+                        "updated_at": mock.ANY,
                         "good": {
                             "id": self.offer.good.id,
+                            "created_at": mock.ANY,
+                            "updated_at": mock.ANY,
                             "name": self.offer.good.name
                         },
                         "good_id": self.good.id,
@@ -403,10 +750,130 @@ class AnonymousMyOrdersTest(PermissionTest):
                     }
                 ],
                 "status": Order.Status.DRAFT.value,
+                "total_price": '1.000000',
+                "item_count": 1,
             })
 
-            order_ids = self.client.session.get(ORDER_IDS_SESSION_PARAM_NAME, [])
-            self.assertIn(order_id, order_ids, 'Order was not bound to session')
+            token = self.client.cookies[ORDER_ACCESS_COOKIE_NAME].value
+            self.assertIn(order_id, loads_order_access(token), 'Order was not granted')
+
+    @parameterized.expand([
+        ('header', True, 1),
+        ('cookie', False, 1),
+        ('forged', None, 0),
+    ])
+    def test_list_order_access(self, name, header, results_count):
+        token = dumps_order_access([self.anon_user_order.id])
+        if header is None:
+            token = token[:-1] + ('0' if token[-1] != '0' else '1')
+        if header:
+            kwargs = {'HTTP_X_ORDER_ACCESS': token}
+        else:
+            self.client.cookies[ORDER_ACCESS_COOKIE_NAME] = token
+            kwargs = {}
+
+        with self._set_perms(self.anon_user, ['store.view_my_order']):
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(reverse('store:buyer-orders-list'), **kwargs)
+
+        self.assertEqual(200, response.status_code, response.content)
+        self.assertEqual(results_count, len(response.json()['results']))
+        self.assertEqual([], [query['sql'] for query in queries if '"django_session"' in query['sql']])
+
+    def test_list_session_order_ids(self):
+        session = self.client.session
+        session[ORDER_IDS_SESSION_PARAM_NAME] = [self.anon_user_order.id]
+        session.save()
+
+        with self._set_perms(self.anon_user, ['store.view_my_order']):
+            url = reverse('store:buyer-orders-list')
+            response = self.client.get(url)
+            self.assertEqual(200, response.status_code, response.content)
+            self.assertEqual(1, len(response.json()['results']))
+            self.assertTupleEqual((self.anon_user_order.id, ), loads_order_access(response[ORDER_ACCESS_HEADER]))
+            self.assertNotIn(ORDER_IDS_SESSION_PARAM_NAME, self.client.session)
+
+            # the token is used from now on
+            response = self.client.get(url)
+            self.assertEqual(1, len(response.json()['results']))
+            self.assertFalse(response.has_header(ORDER_ACCESS_HEADER))
+
+    def test_create_order_access(self):
+        with self._set_perms(self.anon_user, ['store.moderate_my_order']), \
+                self.settings(ORDER_ACCESS_MAX_ORDERS=2):
+
+            self._grant_order_access([self.anon_user_order.id])
+            url = reverse('store:buyer-orders-list')
+            data = {
+                "email": "new@mail.ru",
+                "eth_address": '1' * 42,
+                "offer_ids": [self.offer.id],
+            }
+            with CaptureQueriesContext(connection) as queries:
+                first = self.client.post(url, data=data, format='json').json()['id']
+            second = self.client.post(url, data=data, format='json')
+
+            # the oldest order is dropped from the token
+            self.assertTupleEqual((first, second.json()['id']), loads_order_access(second[ORDER_ACCESS_HEADER]))
+            self.assertEqual([], [query['sql'] for query in queries if '"django_session"' in query['sql']])
+
+    @parameterized.expand([
+        ([], 401),
+        (["store.moderate_my_order"], 201),
+    ])
+    def test_bulk_create(self, perms, status_code):
+        with self._set_perms(self.anon_user, perms):
+
+            url = reverse('store:buyer-orders-bulk')
+            data = [
+                {
+                    "email": "new@mail.ru",
+                    "eth_address": '1' * 42,
+                    "offer_ids": [self.offer.id],
+                },
+                {
+                    "email": "new2@mail.ru",
+                    "eth_address": '2' * 42,
+                    "offer_ids": [self.offer2.id],
+                },
+            ]
+            response = self.client.post(url, data=data, format='json')
+            self.assertEqual(status_code, response.status_code, response.content)
+
+            if status_code >= 400:
+                return
+
+            order_ids = [order['id'] for order in response.json()]
+            self.assertEqual(2, Order.objects.filter(id__in=order_ids, user=None).count())
+
+            self.assertTupleEqual(tuple(order_ids), loads_order_access(response[ORDER_ACCESS_HEADER]),
+                                  'Orders were not granted')
+
+    def test_create_idempotency_key(self):
+        with self._set_perms(self.anon_user, ['store.moderate_my_order']):
+
+            url = reverse('store:buyer-orders-list')
+            data = {
+                "email": "new@mail.ru",
+                "eth_address": '1' * 42,
+                "offer_ids": [self.offer.id],
+            }
+            response = self.client.post(url, data=data, format='json', HTTP_IDEMPOTENCY_KEY='key')
+            self.assertEqual(201, response.status_code, response.content)
+
+            replayed = self.client.post(url, data=data, format='json', HTTP_IDEMPOTENCY_KEY='key')
+            self.assertEqual(201, replayed.status_code, replayed.content)
+            self.assertDictEqual(response.json(), replayed.json())
+            self.assertEqual(1, Order.objects.filter(email="new@mail.ru").count())
+
+            self.assertTupleEqual((response.json()['id'], ), loads_order_access(replayed[ORDER_ACCESS_HEADER]))
+
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.post(url, data=data, format='json', HTTP_IDEMPOTENCY_KEY='key',
+                                            REMOTE_ADDR='127.0.0.2')
+            self.assertEqual(201, response.status_code, response.content)
+            self.assertFalse(response.has_header('Idempotent-Replayed'), 'Key is shared between clients')
+            self.assertEqual([], [query['sql'] for query in queries if '"django_session"' in query['sql']])
 
     @parameterized.expand([
         ([], 401, 'other_user'),
@@ -442,13 +909,19 @@ class AnonymousMyOrdersTest(PermissionTest):
             results = response.json()
             self.assertDictEqual(results, {
                 "id": order.id,
+                "created_at": mock.ANY,
+                "updated_at": mock.ANY,
                 "email": "new@mail.ru",
                 "eth_address": '1' * 42,
                 "purchases": [
                     {
                         "id": mock.ANY,
+                        "created_at": mock.ANY,
+                        "updated_at": mock.ANY,
                         "good": {
                             "id": self.good2.id,
+                            "created_at": mock.ANY,
+                            "updated_at": mock.ANY,
                             "name": self.good2.name
                         },
                         "good_id": self.good2.id,
@@ -457,6 +930,8 @@ class AnonymousMyOrdersTest(PermissionTest):
                     }
                 ],
                 "status": Order.Status.DRAFT.value,
+                "total_price": '1.000000',
+                "item_count": 1,
             })
 
     @parameterized.expand([
@@ -491,13 +966,19 @@ class AnonymousMyOrdersTest(PermissionTest):
             results = response.json()
             self.assertDictEqual(results, {
                 "id": order.id,
+                "created_at": mock.ANY,
+                "updated_at": mock.ANY,
                 "email": "new@mail.ru",
                 "eth_address": order.eth_address,
                 "purchases": [
                     {
                         "id": mock.ANY,
+                        "created_at": mock.ANY,
+                        "updated_at": mock.ANY,
                         "good": {
                             "id": self.good.id,
+                            "created_at": mock.ANY,
+                            "updated_at": mock.ANY,
                             "name": self.good.name
                         },
                         "good_id": self.good.id,
@@ -506,6 +987,8 @@ class AnonymousMyOrdersTest(PermissionTest):
                     }
                 ],
                 "status": Order.Status.DRAFT.value,
+                "total_price": '1.000000',
+                "item_count": 1,
             })
 
     @parameterized.expand([
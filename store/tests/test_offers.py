@@ -2,11 +2,15 @@ from unittest import mock
 
 from django.contrib.auth import get_user_model
 from django.contrib.auth.models import AnonymousUser
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.utils.http import http_date
 from parameterized import parameterized
 
 from store.models import Good
 from store.models import Offer
+from store.views.offer import OffersView
 from store.tests.utils import PermissionTest
 
 
@@ -40,6 +44,87 @@ class OffersTest(PermissionTest):
             results = response.json()['results']
             self.assertEqual(results_count, len(results))
 
+    def test_list_query_count(self):
+        for idx in range(10):
+            Offer.objects.create(good=Good.objects.create(name=f'good {idx}'), price=1)
+
+        with self._set_perms(self.user, ["store.view_offer"]):
+            self._assert_list_queries_flat(reverse('store:offers-list'), 10)
+
+    @parameterized.expand([
+        ('', ),
+        ('?ordering=-price', ),
+        ('?page_size=2&page=2', ),
+    ])
+    def test_list_fast(self, query):
+        for idx in range(3):
+            Offer.objects.create(good=Good.objects.create(name=f'good \u2028 ё {idx}'), price=f'{idx}.125')
+
+        with self._set_perms(self.user, ["store.view_offer"]):
+            self._assert_fast_list_identical(OffersView, reverse('store:offers-list') + query)
+
+    @parameterized.expand([
+        ('fields', {'fields': 'id,price'}, ['id', 'price'], None, False),
+        ('nested_field', {'fields': 'id,good.name'}, ['id', 'good'], ['name'], True),
+        ('expand', {'expand': 'good'}, ['id', 'good', 'good_id', 'created_at', 'updated_at', 'price'],
+         ['id', 'created_at', 'updated_at', 'name'], True),
+        ('fields_expand', {'fields': 'price', 'expand': 'good'}, ['good', 'price'],
+         ['id', 'created_at', 'updated_at', 'name'], True),
+        ('no_expand', {'expand': ''}, ['id', 'good_id', 'created_at', 'updated_at', 'price'], None, False),
+    ])
+    def test_list_sparse_fields(self, name, params, fields, good_fields, joins_good):
+        with self._set_perms(self.user, ["store.view_offer"]):
+            for pagination in ('page', 'cursor'):
+
+                with CaptureQueriesContext(connection) as queries:
+                    response = self.client.get(reverse('store:offers-list'),
+                                               data={**params, 'pagination': pagination})
+
+                self.assertEqual(200, response.status_code, response.content)
+                result = response.json()['results'][0]
+                self.assertListEqual(fields, list(result))
+                if good_fields is not None:
+                    self.assertListEqual(good_fields, list(result['good']))
+
+                listed = [query['sql'] for query in queries if 'FROM "store_offer"' in query['sql']][-1]
+                self.assertEqual(joins_good, '"store_good"' in listed, listed)
+                self.assertEqual('price' in fields, '"store_offer"."price"' in listed, listed)
+
+    @parameterized.expand([
+        ({'fields': 'id,name'}, ),
+        ({'fields': 'good.price'}, ),
+        ({'expand': 'price'}, ),
+    ])
+    def test_list_sparse_fields_invalid(self, params):
+        with self._set_perms(self.user, ["store.view_offer"]):
+
+            response = self.client.get(reverse('store:offers-list'), data=params)
+
+            self.assertEqual(400, response.status_code, response.content)
+
+    def test_retrieve_sparse_fields(self):
+        with self._set_perms(self.user, ["store.view_offer"]):
+
+            url = reverse('store:offers-detail', kwargs={"pk": self.offer.id})
+            response = self.client.get(url, data={'fields': 'price'})
+
+            self.assertEqual(200, response.status_code, response.content)
+            self.assertDictEqual({'price': '1.000000'}, response.json())
+            self.assertEqual(http_date(self.offer.updated_at.timestamp()), response['Last-Modified'])
+
+    def test_response_cache_invalidation_by_good(self):
+        with self._set_perms(self.user, ["store.view_offer"]):
+
+            url = reverse('store:offers-detail', kwargs={"pk": self.offer.id})
+            response = self.client.get(url)
+
+            self.good.name = 'renamed good'
+            self.good.save()
+
+            changed = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+            self.assertEqual(200, changed.status_code)
+            self.assertEqual('renamed good', changed.json()['good']['name'])
+
     @parameterized.expand([
         ([], 403),
         (["store.view_offer"], 200),
@@ -57,9 +142,13 @@ class OffersTest(PermissionTest):
             results = response.json()
             self.assertDictEqual(results, {
                 "id": self.offer.id,
+                "created_at": mock.ANY,
+                "updated_at": mock.ANY,
                 "good_id": self.good.id,
                 "good": {
                     "id": self.good.id,
+                    "created_at": mock.ANY,
+                    "updated_at": mock.ANY,
                     "name": self.good.name,
                 },
                 "price": '1.000000',
@@ -91,9 +180,13 @@ class OffersTest(PermissionTest):
             results = response.json()
             self.assertDictEqual(results, {
                 'id': created_offer_id,
+                'created_at': mock.ANY,
+                'updated_at': mock.ANY,
                 "good_id": self.good.id,
                 "good": {
                     "id": self.good.id,
+                    "created_at": mock.ANY,
+                    "updated_at": mock.ANY,
                     "name": self.good.name
                 },
                 "price": '2.000000',
@@ -128,9 +221,13 @@ class OffersTest(PermissionTest):
             results = response.json()
             self.assertDictEqual(results, {
                 'id': self.offer.id,
+                'created_at': mock.ANY,
+                'updated_at': mock.ANY,
                 "good_id": self.good.id,
                 "good": {
                     "id": self.good.id,
+                    "created_at": mock.ANY,
+                    "updated_at": mock.ANY,
                     "name": self.good.name
                 },
                 "price": '2.000000',
@@ -163,9 +260,13 @@ class OffersTest(PermissionTest):
             results = response.json()
             self.assertDictEqual(results, {
                 'id': self.offer.id,
+                'created_at': mock.ANY,
+                'updated_at': mock.ANY,
                 "good_id": self.good.id,
                 "good": {
                     "id": self.good.id,
+                    "created_at": mock.ANY,
+                    "updated_at": mock.ANY,
                     "name": self.good.name
                 },
                 "price": '1.000000',
@@ -237,9 +338,13 @@ class AnonymousOffersTest(PermissionTest):
             results = response.json()
             self.assertDictEqual(results, {
                 "id": self.offer.id,
+                "created_at": mock.ANY,
+                "updated_at": mock.ANY,
                 "good_id": mock.ANY,
                 "good": {
                     "id": mock.ANY,
+                    "created_at": mock.ANY,
+                    "updated_at": mock.ANY,
                     "name": mock.ANY
                 },
                 "price": mock.ANY,
@@ -271,9 +376,13 @@ class AnonymousOffersTest(PermissionTest):
             results = response.json()
             self.assertDictEqual(results, {
                 'id': created_offer_id,
+                'created_at': mock.ANY,
+                'updated_at': mock.ANY,
                 "good_id": self.good.id,
                 "good": {
                     "id": self.good.id,
+                    "created_at": mock.ANY,
+                    "updated_at": mock.ANY,
                     "name": self.good.name
                 },
                 "price": '2.000000',
@@ -308,9 +417,13 @@ class AnonymousOffersTest(PermissionTest):
             results = response.json()
             self.assertDictEqual(results, {
                 'id': self.offer.id,
+                'created_at': mock.ANY,
+                'updated_at': mock.ANY,
                 "good_id": self.good.id,
                 "good": {
                     "id": self.good.id,
+                    "created_at": mock.ANY,
+                    "updated_at": mock.ANY,
                     "name": self.good.name
                 },
                 "price": '2.000000',
@@ -343,9 +456,13 @@ class AnonymousOffersTest(PermissionTest):
             results = response.json()
             self.assertDictEqual(results, {
                 'id': self.offer.id,
+                'created_at': mock.ANY,
+                'updated_at': mock.ANY,
                 "good_id": self.good.id,
                 "good": {
                     "id": self.good.id,
+                    "created_at": mock.ANY,
+                    "updated_at": mock.ANY,
                     "name": self.good.name
                 },
                 "price": '1.000000',
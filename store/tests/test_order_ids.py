@@ -0,0 +1,70 @@
+from unittest import mock
+
+from django.test import TestCase
+from parameterized import parameterized
+
+from store.models import Order, OrderIdSequence
+from store.order_ids import PermutationOrderIdAllocator
+
+
+class PermutationOrderIdAllocatorTest(TestCase):
+
+    @parameterized.expand([
+        ((1, 1), ),
+        ((10, 20), ),
+        ((1000, 5095), ),
+        ((1000_000, 1000_000 + 2 ** 12), ),
+    ])
+    def test_permute_is_bijective(self, id_range):
+        allocator = PermutationOrderIdAllocator(id_range=id_range, key='key')
+        low, high = id_range
+
+        ids = [allocator.permute(index) for index in range(high - low + 1)]
+
+        self.assertListEqual(list(range(low, high + 1)), sorted(ids))
+
+    def test_permute_depends_on_key(self):
+        allocator = PermutationOrderIdAllocator(id_range=(1000_000, 9000_000), key='key')
+        other_allocator = PermutationOrderIdAllocator(id_range=(1000_000, 9000_000), key='other key')
+
+        ids = [allocator.permute(index) for index in range(100)]
+        other_ids = [other_allocator.permute(index) for index in range(100)]
+
+        self.assertNotEqual(ids, other_ids)
+        self.assertNotEqual(ids, sorted(ids))
+
+    def test_range_exhausted(self):
+        allocator = PermutationOrderIdAllocator(id_range=(10, 20), key='key')
+
+        with self.assertRaises(ValueError):
+            allocator.permute(11)
+
+    def test_allocate(self):
+        allocator = PermutationOrderIdAllocator(id_range=(10, 20), key='key')
+
+        ids = [allocator.allocate() for _ in range(11)]
+
+        self.assertListEqual(list(range(10, 21)), sorted(ids))
+
+    def test_allocate_skips_taken(self):
+        allocator = PermutationOrderIdAllocator(id_range=(10, 20), key='key')
+        taken = [allocator.permute(0), allocator.permute(2)]
+        for order_id in taken:
+            Order.objects.create(id=order_id, email='test@mail.ru', eth_address='0' * 42)
+
+        self.assertEqual(allocator.permute(1), allocator.allocate())
+        self.assertListEqual([allocator.permute(3), allocator.permute(4)], allocator.allocate_many(2))
+
+        ids = allocator.allocate_many(11 - 5)
+        self.assertListEqual(list(range(10, 21)), sorted(ids + taken + [allocator.permute(idx) for idx in (1, 3, 4)]))
+
+    def test_sequence_is_pruned(self):
+        allocator = PermutationOrderIdAllocator(id_range=(10, 5000), key='key')
+
+        with mock.patch.object(PermutationOrderIdAllocator, 'PRUNE_INTERVAL', 4):
+            ids = [allocator.allocate() for _ in range(5)] + allocator.allocate_many(6)
+
+        self.assertEqual(11, len(set(ids)))
+        # at most the rows drawn since the last multiple of the interval are kept, the latest one always
+        self.assertLessEqual(OrderIdSequence.objects.count(), 4)
+        self.assertTrue(OrderIdSequence.objects.exists())
@@ -1,17 +1,32 @@
+import csv
+import io
+import json
+from datetime import timedelta
+from decimal import Decimal
 from unittest import mock
 
 from django.contrib.auth import get_user_model
 from django.contrib.auth.models import AnonymousUser
+from django.core import mail
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.utils import timezone
+from django.utils.http import http_date
 from parameterized import parameterized
 
-from store.models import Good, Offer, Purchase, Order
+from store.filters import FilterBackend
+from store.models import Good, Offer, Purchase, Order, OutboxEmail
 from store.tests.utils import PermissionTest
+from store.views.order import OrderView
 
 
 class OrdersTest(PermissionTest):
 
     def setUp(self):
+        # sessions are cached in a shared cache only
+        self._use_shared_cache('sessions')
         super().setUp()
 
         self.user, created = get_user_model().objects.update_or_create(
@@ -55,6 +70,371 @@ class OrdersTest(PermissionTest):
             results = response.json()['results']
             self.assertEqual(results_count, len(results))
 
+    @parameterized.expand([
+        ('total_price__gte=2', [lambda self: self.other_user_order.id]),
+        ('item_count=1', [lambda self: self.user_order.id, lambda self: self.anon_user_order.id]),
+        ('ordering=-total_price,id', [lambda self: self.other_user_order.id,
+                                      lambda self: self.user_order.id,
+                                      lambda self: self.anon_user_order.id]),
+    ])
+    def test_list_totals(self, query, get_order_ids):
+        Purchase.objects.create(good=self.good2, price=5, order=self.other_user_order)
+
+        with self._set_perms(self.user, ["store.view_order"]):
+
+            url = reverse('store:orders-list')
+            response = self.client.get(f'{url}?{query}')
+
+            self.assertEqual(200, response.status_code, response.content)
+
+            results = response.json()['results']
+            self.assertListEqual([get_order_id(self) for get_order_id in get_order_ids], [r['id'] for r in results])
+
+    @parameterized.expand([
+        ('', ['id']),
+        ('&ordering=-total_price', ['-total_price', 'id']),
+        ('&ordering=email,-id', ['email', '-id']),
+    ])
+    def test_list_cursor(self, ordering, order_by):
+        for idx in range(7):
+            order = Order.objects.create(user=self.user, email=f'test{idx % 3}@mail.ru', eth_address='0' * 42)
+            Purchase.objects.create(good=self.good2, price=idx % 2, order=order)
+
+        with self._set_perms(self.user, ["store.view_order"]):
+
+            url = reverse('store:orders-list')
+            expected = list(Order.objects.order_by(*order_by).values_list('id', flat=True))
+
+            ids, pages = [], []
+            next_url = f'{url}?pagination=cursor&page_size=3{ordering}'
+            while next_url:
+                with self.assertNumQueries(3):
+                    response = self.client.get(next_url)
+                self.assertEqual(200, response.status_code, response.content)
+                self.assertNotIn('count', response.json())
+
+                pages.append(response.json())
+                ids += [r['id'] for r in response.json()['results']]
+                next_url = response.json()['next']
+
+            self.assertListEqual(expected, ids)
+            self.assertEqual(4, len(pages))
+            self.assertIsNone(pages[0]['previous'])
+
+            previous = self.client.get(pages[-1]['previous']).json()
+            self.assertListEqual([r['id'] for r in pages[-2]['results']], [r['id'] for r in previous['results']])
+
+    @parameterized.expand([
+        ('purchases', ),
+        ('user', ),
+        ('-user', ),
+    ])
+    def test_list_cursor_invalid_ordering(self, ordering):
+        Order.objects.create(user=None, email='test@mail.ru', eth_address='0' * 42)
+
+        with self._set_perms(self.user, ["store.view_order"]):
+
+            url = reverse('store:orders-list')
+            response = self.client.get(f'{url}?pagination=cursor&page_size=1&ordering={ordering}')
+
+            self.assertEqual(400, response.status_code, response.content)
+            self.assertIn('ordering', response.json())
+
+            # page numbers still order by it
+            response = self.client.get(f'{url}?page_size=1&ordering={ordering}')
+            self.assertEqual(200, response.status_code, response.content)
+
+    def test_list_cursor_page_size_cap(self):
+        Order.objects.bulk_create([Order(user=self.user, email='test@mail.ru', eth_address='0' * 42)
+                                   for _ in range(5)])
+
+        with self._set_perms(self.user, ["store.view_order"]), \
+                mock.patch('application.pagination.KeysetPagination.max_page_size', 4):
+
+            url = reverse('store:orders-list')
+            response = self.client.get(f'{url}?pagination=cursor&page_size=1000')
+
+            self.assertEqual(200, response.status_code, response.content)
+            self.assertEqual(4, len(response.json()['results']))
+
+    @parameterized.expand([
+        ('cursor=broken', ),
+        ('ordering=-id&cursor={cursor}', ),
+    ])
+    def test_list_invalid_cursor(self, query):
+        with self._set_perms(self.user, ["store.view_order"]):
+
+            url = reverse('store:orders-list')
+            next_url = self.client.get(f'{url}?pagination=cursor&page_size=1').json()['next']
+            cursor = next_url.split('cursor=')[1].split('&')[0]
+            response = self.client.get(f'{url}?{query.format(cursor=cursor)}')
+
+            self.assertEqual(404, response.status_code, response.content)
+
+    @parameterized.expand([
+        ('create', lambda self: Order.objects.create(user=self.user, email='test@mail.ru', eth_address='0' * 42), 4),
+        ('bulk_create', lambda self: Order.objects.bulk_create(
+            [Order(user=self.user, email='test@mail.ru', eth_address='0' * 42)]), 4),
+        ('delete', lambda self: self.anon_user_order.delete(), 2),
+        ('update', lambda self: Order.objects.filter(id=self.user_order.id).update(status=Order.Status.CANCELED), 2),
+    ])
+    def test_list_cached_count(self, name, write, count):
+        with self._set_perms(self.user, ["store.view_order"]):
+
+            url = reverse('store:orders-list') + '?status=DR'
+            uncached = self._count_queries('get', url)
+            cached = self._count_queries('get', url)
+            self.assertEqual(uncached - 1, cached)
+            self.assertEqual(3, self.client.get(url).json()['count'])
+
+            write(self)
+
+            response = self.client.get(url).json()
+            self.assertEqual(count, response['count'])
+            self.assertTrue(response['count_exact'])
+
+    def test_list_cached_count_per_filter(self):
+        with self._set_perms(self.user, ["store.view_order"]):
+
+            url = reverse('store:orders-list')
+            self.assertEqual(3, self.client.get(url).json()['count'])
+            self.assertEqual(1, self.client.get(f'{url}?user={self.user.id}').json()['count'])
+
+    @parameterized.expand([
+        (1, 4, False, True),
+        (3, 10, True, True),
+        (4, 10, True, False),
+    ])
+    def test_list_estimated_count(self, page, count, count_exact, has_next):
+        Order.objects.bulk_create([Order(user=self.user, email='test@mail.ru', eth_address='0' * 42)
+                                   for _ in range(7)])
+
+        with self._set_perms(self.user, ["store.view_order"]), \
+                mock.patch('store.views.order.OrderView.pagination_count', 'estimate', create=True), \
+                self.settings(PAGINATION_COUNT_LIMIT=3):
+
+            url = reverse('store:orders-list')
+            response = self.client.get(f'{url}?page_size=3&page={page}')
+
+            self.assertEqual(200, response.status_code, response.content)
+            self.assertEqual(count, response.json()['count'])
+            self.assertEqual(count_exact, response.json()['count_exact'])
+            self.assertEqual(has_next, response.json()['next'] is not None)
+
+    @parameterized.expand([
+        ('order', lambda self: self.user_order.save(), 200),
+        ('purchase', lambda self: self.user_purchase.save(), 200),
+        ('purchase_deleted', lambda self: self.user_purchase.delete(), 200),
+        ('good', lambda self: self.good.save(), 200),
+        ('other_order', lambda self: self.other_user_order.save(), 304),
+    ])
+    def test_retrieve_last_modified(self, name, write, status_code):
+        past = timezone.now() - timedelta(days=1)
+        for model in (Order, Purchase, Good):
+            model.objects.update(updated_at=past)
+
+        with self._set_perms(self.user, ["store.view_order"]):
+
+            url = reverse('store:orders-detail', kwargs={"pk": self.user_order.id})
+            response = self.client.get(url)
+            self.assertEqual(http_date(past.timestamp()), response['Last-Modified'])
+
+            not_modified = self.client.get(url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+            self.assertEqual(304, not_modified.status_code)
+            self.assertEqual(response['Last-Modified'], not_modified['Last-Modified'])
+
+            write(self)
+
+            response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+            self.assertEqual(status_code, response.status_code)
+
+    @parameterized.expand([
+        ('created_after', ),
+        ('updated_after', ),
+    ])
+    def test_list_changed_after(self, name):
+        past = timezone.now() - timedelta(days=1)
+        Order.objects.update(created_at=past, updated_at=past)
+        self.user_order.refresh_from_db()
+        self.user_order.save()
+        Order.objects.filter(id=self.user_order.id).update(created_at=timezone.now())
+
+        with self._set_perms(self.user, ["store.view_order"]):
+
+            url = reverse('store:orders-list')
+            since = (past + timedelta(hours=1)).isoformat()
+            response = self.client.get(url, data={name: since})
+
+            self.assertEqual(200, response.status_code, response.content)
+            self.assertListEqual([self.user_order.id], [r['id'] for r in response.json()['results']])
+
+    def test_filterset_class_cached(self):
+        backend = FilterBackend()
+
+        filterset_class = backend.get_filterset_class(OrderView(), Order.objects.all())
+
+        self.assertIs(filterset_class, backend.get_filterset_class(OrderView(), Order.objects.all()))
+        self.assertIn('created_after', filterset_class.base_filters)
+        self.assertIn('user', filterset_class.base_filters)
+
+    def test_bulk_update_touches_updated_at(self):
+        past = timezone.now() - timedelta(days=1)
+        Order.objects.update(updated_at=past)
+
+        Order.objects.filter(id=self.user_order.id).update(status=Order.Status.CANCELED)
+        Purchase.objects.create(good=self.good2, price=1, order=self.other_user_order)
+
+        self.assertListEqual([self.user_order.id, self.other_user_order.id],
+                             list(Order.objects.filter(updated_at__gt=past).order_by('id').values_list('id', flat=True)))
+
+    @parameterized.expand([
+        ('', 3),
+        ('&status=DR&email=test2@mail.ru', 1),
+    ])
+    def test_export_csv(self, query, count):
+        with self._set_perms(self.user, ["store.view_order"]):
+
+            url = reverse('store:orders-export')
+            response = self.client.get(f'{url}?format=csv{query}')
+
+            self.assertEqual(200, response.status_code)
+            self.assertEqual('text/csv; charset=utf-8', response['Content-Type'])
+            self.assertEqual('attachment; filename="orders.csv"', response['Content-Disposition'])
+
+            rows = list(csv.DictReader(io.StringIO(b''.join(response.streaming_content).decode())))
+            results = self.client.get(reverse('store:orders-list') + f'?{query}').json()['results']
+            self.assertEqual(count, len(rows))
+            self.assertListEqual([str(r['id']) for r in results], [row['id'] for row in rows])
+            self.assertListEqual(results[0]['purchases'], json.loads(rows[0]['purchases']))
+            self.assertEqual(results[0]['total_price'], rows[0]['total_price'])
+
+    @parameterized.expand([
+        ('fields', {'fields': 'id,status'}, ['id', 'status'], None, 1),
+        ('expand', {'fields': 'id', 'expand': 'purchases'}, ['id', 'purchases'],
+         ['id', 'good_id', 'created_at', 'updated_at', 'price', 'order'], 2),
+        ('nested_expand', {'fields': 'id', 'expand': 'purchases.good'}, ['id', 'purchases'],
+         ['id', 'good', 'good_id', 'created_at', 'updated_at', 'price', 'order'], 2),
+        ('nested_field', {'fields': 'purchases.price'}, ['purchases'], ['price'], 2),
+    ])
+    def test_list_sparse_fields(self, name, params, fields, purchase_fields, queries):
+        with self._set_perms(self.user, ["store.view_order"]):
+
+            # user and count queries besides the listed and prefetched ones, the session is cached
+            with self.assertNumQueries(1 + 1 + queries):
+                response = self.client.get(reverse('store:orders-list'), data=params)
+
+            self.assertEqual(200, response.status_code, response.content)
+            result = response.json()['results'][0]
+            self.assertListEqual(fields, list(result))
+            if purchase_fields is not None:
+                self.assertListEqual(purchase_fields, list(result['purchases'][0]))
+
+    def test_export_sparse_fields(self):
+        with self._set_perms(self.user, ["store.view_order"]):
+
+            response = self.client.get(reverse('store:orders-export'), data={'format': 'csv', 'fields': 'id,email'})
+
+            self.assertEqual(200, response.status_code)
+            rows = list(csv.reader(io.StringIO(b''.join(response.streaming_content).decode())))
+            self.assertListEqual(['id', 'email'], rows[0])
+            self.assertEqual(4, len(rows))
+
+    def test_retrieve_sparse_fields_last_modified(self):
+        Purchase.objects.filter(order=self.user_order).update(updated_at=timezone.now() + timedelta(days=1))
+
+        with self._set_perms(self.user, ["store.view_order"]):
+
+            url = reverse('store:orders-detail', kwargs={"pk": self.user_order.id})
+            response = self.client.get(url, data={'fields': 'id,status'})
+
+            self.assertEqual(200, response.status_code, response.content)
+            self.user_order.refresh_from_db()
+            self.assertEqual(http_date(self.user_order.updated_at.timestamp()), response['Last-Modified'])
+
+    def test_export_forbidden(self):
+        with self._set_perms(self.user, []):
+
+            response = self.client.get(reverse('store:orders-export'))
+
+            self.assertEqual(403, response.status_code)
+            self.assertIn(b'detail', response.content)
+
+    def test_list_query_count(self):
+        for idx in range(10):
+            order = Order.objects.create(user=self.user, email='test@mail.ru', eth_address='0' * 42)
+            Purchase.objects.bulk_create([Purchase(good=self.good2, price=1, order=order) for _ in range(idx)])
+
+        with self._set_perms(self.user, ["store.view_order"]):
+            self._assert_list_queries_flat(reverse('store:orders-list'), 10)
+
+    def test_update_query_count(self):
+        goods = [Good.objects.create(name=f'bulk good {idx}') for idx in range(20)]
+
+        with self._set_perms(self.user, ["store.change_order"]):
+
+            url = reverse('store:orders-detail', kwargs={"pk": self.user_order.id})
+            data = {
+                "email": "new@mail.ru",
+                "eth_address": '1' * 42,
+                "status": Order.Status.PROCESSING.value,
+            }
+            purchases = [{"good_id": good.id, "price": 1.0, 'order': self.user_order.id} for good in goods]
+            self._count_queries('put', url, {**data, "purchases": []})
+            single = self._count_queries('put', url, {**data, "purchases": purchases[:1]})
+            self._count_queries('put', url, {**data, "purchases": []})
+            many = self._count_queries('put', url, {**data, "purchases": purchases})
+
+            self.assertEqual(single, many)
+
+    def test_totals(self):
+        purchase = Purchase.objects.create(good=self.good2, price=5, order=self.user_order)
+
+        self.user_order.refresh_from_db()
+        self.assertEqual(Decimal('6'), self.user_order.total_price)
+        self.assertEqual(2, self.user_order.item_count)
+
+        purchase.delete()
+
+        self.user_order.refresh_from_db()
+        self.assertEqual(Decimal('1'), self.user_order.total_price)
+        self.assertEqual(1, self.user_order.item_count)
+
+        Purchase.objects.filter(order=self.other_user_order).delete()
+        Order.objects.update(total_price=100, item_count=100)
+        call_command('rebuild_order_totals', '--batch-size', '2', stdout=mock.MagicMock())
+
+        self.assertListEqual([(Decimal('1'), 1), (Decimal('0'), 0), (Decimal('1'), 1)],
+                             list(Order.objects.order_by('id').values_list('total_price', 'item_count')))
+
+    @parameterized.expand([
+        ('cascade', lambda self: self.good.delete()),
+        ('queryset_cascade', lambda self: Good.objects.filter(id=self.good.id).delete()),
+        ('queryset_delete', lambda self: Purchase.objects.filter(good=self.good).delete()),
+    ])
+    def test_totals_on_delete(self, name, delete):
+        Purchase.objects.create(good=self.good2, price=5, order=self.user_order)
+        Purchase.objects.create(good=self.good, price=7, order=self.user_order)
+
+        with mock.patch.object(Order, 'refresh_totals', wraps=Order.refresh_totals) as refresh_totals, \
+                transaction.atomic():
+            delete(self)
+
+            # refreshed once for all the orders, in the transaction of the delete
+            self.assertListEqual([(Decimal('5'), 1), (Decimal('0'), 0), (Decimal('0'), 0)],
+                                 list(Order.objects.order_by('id').values_list('total_price', 'item_count')))
+
+        refresh_totals.assert_called_once()
+        self.assertCountEqual([self.user_order.id, self.other_user_order.id, self.anon_user_order.id],
+                              refresh_totals.call_args.args[0])
+
+    def test_purchases_fast_delete(self):
+        with CaptureQueriesContext(connection) as queries:
+            Purchase.objects.filter(order=self.user_order).delete()
+
+        # the order ids, the delete and the totals, no purchase rows are loaded for signals
+        statements = [query['sql'].split()[0] for query in queries if 'SAVEPOINT' not in query['sql']]
+        self.assertListEqual(['SELECT', 'DELETE', 'UPDATE'], statements)
+
     @parameterized.expand([
         ([], 403, 'user'),
         ([], 403, 'other_user'),
@@ -80,13 +460,19 @@ class OrdersTest(PermissionTest):
             results = response.json()
             self.assertDictEqual(results, {
                 "id": order.id,
+                "created_at": mock.ANY,
+                "updated_at": mock.ANY,
                 "email": order.email,
                 "eth_address": order.eth_address,
                 "purchases": [
                     {
                         "id": purchase.id,
+                        "created_at": mock.ANY,
+                        "updated_at": mock.ANY,
                         "good": {
                             "id": self.good.id,
+                            "created_at": mock.ANY,
+                            "updated_at": mock.ANY,
                             "name": self.good.name
                         },
                         "good_id": self.good.id,
@@ -95,6 +481,8 @@ class OrdersTest(PermissionTest):
                     }
                 ],
                 "status": order.status.value,
+                "total_price": '1.000000',
+                "item_count": 1,
                 "user": user.id,
             })
 
@@ -152,13 +540,19 @@ class OrdersTest(PermissionTest):
             results = response.json()
             self.assertDictEqual(results, {
                 "id": order.id,
+                "created_at": mock.ANY,
+                "updated_at": mock.ANY,
                 "email": "new@mail.ru",
                 "eth_address": '1' * 42,
                 "purchases": [
                     {
                         "id": mock.ANY,
+                        "created_at": mock.ANY,
+                        "updated_at": mock.ANY,
                         "good": {
                             "id": self.good2.id,
+                            "created_at": mock.ANY,
+                            "updated_at": mock.ANY,
                             "name": self.good2.name
                         },
                         "good_id": self.good2.id,
@@ -167,9 +561,93 @@ class OrdersTest(PermissionTest):
                     }
                 ],
                 "status": Order.Status.PROCESSING.value,
+                "total_price": '2.000000',
+                "item_count": 1,
                 "user": user.id,
             })
 
+    def test_update_purchases_diff(self):
+        kept_purchase, created = Purchase.objects.get_or_create(good=self.good2, price=5, order=self.user_order)
+
+        with self._set_perms(self.user, ["store.change_order"]):
+
+            url = reverse('store:orders-detail', kwargs={"pk": self.user_order.id})
+            data = {
+                "email": self.user_order.email,
+                "eth_address": self.user_order.eth_address,
+                "purchases": [
+                    {
+                        "good_id": self.good2.id,
+                        "price": 5.0,
+                        'order': self.user_order.id,
+                    },
+                    {
+                        "good_id": self.good.id,
+                        "price": 3.0,
+                        'order': self.user_order.id,
+                    },
+                    {
+                        "good_id": self.good.id,
+                        "price": 4.0,
+                        'order': self.user_order.id,
+                    },
+                ],
+                "status": Order.Status.PROCESSING.value,
+            }
+            response = self.client.put(url, data=data, format='json')
+            self.assertEqual(200, response.status_code, response.content)
+
+            results = response.json()
+            self.assertListEqual(results['purchases'], [
+                {
+                    "id": self.user_purchase.id,
+                    "created_at": mock.ANY,
+                    "updated_at": mock.ANY,
+                    "good": {
+                        "id": self.good.id,
+                        "created_at": mock.ANY,
+                        "updated_at": mock.ANY,
+                        "name": self.good.name
+                    },
+                    "good_id": self.good.id,
+                    "price": '3.000000',
+                    "order": self.user_order.id,
+                },
+                {
+                    "id": kept_purchase.id,
+                    "created_at": mock.ANY,
+                    "updated_at": mock.ANY,
+                    "good": {
+                        "id": self.good2.id,
+                        "created_at": mock.ANY,
+                        "updated_at": mock.ANY,
+                        "name": self.good2.name
+                    },
+                    "good_id": self.good2.id,
+                    "price": '5.000000',
+                    "order": self.user_order.id,
+                },
+                {
+                    "id": mock.ANY,
+                    "created_at": mock.ANY,
+                    "updated_at": mock.ANY,
+                    "good": {
+                        "id": self.good.id,
+                        "created_at": mock.ANY,
+                        "updated_at": mock.ANY,
+                        "name": self.good.name
+                    },
+                    "good_id": self.good.id,
+                    "price": '4.000000',
+                    "order": self.user_order.id,
+                },
+            ])
+
+            data['purchases'] = data['purchases'][:1]
+            response = self.client.put(url, data=data, format='json')
+            self.assertEqual(200, response.status_code, response.content)
+            self.assertListEqual([kept_purchase.id], [p['id'] for p in response.json()['purchases']])
+
     @parameterized.expand([
         ([], 403, 'user'),
         ([], 403, 'other_user'),
@@ -190,6 +668,104 @@ class OrdersTest(PermissionTest):
             response = self.client.patch(url, data=data, format='json')
             self.assertEqual(status_code, response.status_code, response.content)
 
+    @parameterized.expand([
+        ('user', ),
+        ('anon_user', ),
+    ])
+    def test_finish_queues_confirmation(self, username):
+        order = getattr(self, f'{username}_order')
+
+        with self._set_perms(self.user, ["store.change_order"]):
+
+            url = reverse('store:orders-detail', kwargs={"pk": order.id})
+            data = {
+                "status": Order.Status.FINISHED.value,
+            }
+            response = self.client.patch(url, data=data, format='json')
+            self.assertEqual(200, response.status_code, response.content)
+            self.assertEqual(Order.Status.FINISHED.value, response.json()['status'])
+
+        self.assertListEqual([], mail.outbox)
+        self.assertListEqual([order.email], list(OutboxEmail.objects.filter(sent_at=None).values_list('to', flat=True)))
+
+    @parameterized.expand([
+        ([], 403),
+        (["store.view_order"], 403),
+        (["store.change_order"], 200),
+    ])
+    def test_bulk_transition(self, perms, status_code):
+        Order.objects.filter(id=self.other_user_order.id).update(status=Order.Status.FINISHED)
+
+        with self._set_perms(self.user, perms):
+
+            url = reverse('store:orders-transition')
+            data = {
+                "transition": "finish",
+                "ids": [self.user_order.id, self.other_user_order.id, self.anon_user_order.id, -1],
+            }
+            response = self.client.post(url, data=data, format='json')
+            self.assertEqual(status_code, response.status_code, response.content)
+
+            if status_code >= 400:
+                return
+
+            self.assertDictEqual(response.json(), {
+                "transitioned": [self.user_order.id, self.anon_user_order.id],
+                "skipped": [self.other_user_order.id, -1],
+            })
+
+        self.assertEqual(3, Order.objects.filter(status=Order.Status.FINISHED).count())
+        self.assertListEqual([self.user_order.email, self.anon_user_order.email],
+                             list(OutboxEmail.objects.order_by('id').values_list('to', flat=True)))
+
+    def test_bulk_transition_filter(self):
+        Order.objects.filter(id=self.other_user_order.id).update(status=Order.Status.FINISHED)
+        Order.objects.filter(id=self.anon_user_order.id).update(status=Order.Status.PROCESSING)
+
+        with self._set_perms(self.user, ["store.change_order"]):
+
+            url = reverse('store:orders-transition')
+            response = self.client.post(url, data={"transition": "cancel"}, format='json')
+            self.assertEqual(400, response.status_code, response.content)
+
+            response = self.client.post(f'{url}?status={Order.Status.FINISHED.value}',
+                                        data={"transition": "cancel"}, format='json')
+            self.assertEqual(200, response.status_code, response.content)
+            self.assertDictEqual(response.json(), {
+                "transitioned": [],
+                "skipped": [self.other_user_order.id],
+            })
+
+            response = self.client.post(f'{url}?email=test3@mail.ru', data={"transition": "cancel"}, format='json')
+            self.assertEqual(200, response.status_code, response.content)
+            self.assertDictEqual(response.json(), {
+                "transitioned": [self.anon_user_order.id],
+                "skipped": [],
+            })
+
+        self.assertListEqual([Order.Status.DRAFT, Order.Status.FINISHED, Order.Status.CANCELED],
+                             [o.status for o in Order.objects.order_by('id')])
+        self.assertFalse(OutboxEmail.objects.exists())
+
+    def test_bulk_transition_max_size(self):
+        with self._set_perms(self.user, ["store.change_order"]), self.settings(ORDER_TRANSITION_MAX_SIZE=2):
+
+            url = reverse('store:orders-transition')
+            ids = [self.user_order.id, self.other_user_order.id, self.anon_user_order.id]
+            response = self.client.post(url, data={"transition": "cancel", "ids": ids}, format='json')
+            self.assertEqual(400, response.status_code, response.content)
+            self.assertListEqual(['ids'], list(response.json()))
+
+            response = self.client.post(f'{url}?status={Order.Status.DRAFT.value}', data={"transition": "cancel"},
+                                        format='json')
+            self.assertEqual(400, response.status_code, response.content)
+
+            response = self.client.post(f'{url}?user={self.user.id}', data={"transition": "cancel"}, format='json')
+            self.assertEqual(200, response.status_code, response.content)
+            self.assertListEqual([self.user_order.id], response.json()['transitioned'])
+
+        self.assertEqual(1, Order.objects.filter(status=Order.Status.CANCELED).count())
+
     @parameterized.expand([
         ([], 403),
         (["store.add_order", "store.change_order", "store.delete_order"], 403),
@@ -263,13 +839,19 @@ class AnonymousOrdersTest(PermissionTest):
             results = response.json()
             self.assertDictEqual(results, {
                 "id": order.id,
+                "created_at": mock.ANY,
+                "updated_at": mock.ANY,
                 "email": order.email,
                 "eth_address": order.eth_address,
                 "purchases": [
                     {
                         "id": purchase.id,
+                        "created_at": mock.ANY,
+                        "updated_at": mock.ANY,
                         "good": {
                             "id": self.good.id,
+                            "created_at": mock.ANY,
+                            "updated_at": mock.ANY,
                             "name": self.good.name
                         },
                         "good_id": self.good.id,
@@ -278,6 +860,8 @@ class AnonymousOrdersTest(PermissionTest):
                     }
                 ],
                 "status": order.status.value,
+                "total_price": '1.000000',
+                "item_count": 1,
                 "user": user.id,
             })
 
@@ -333,13 +917,19 @@ class AnonymousOrdersTest(PermissionTest):
             results = response.json()
             self.assertDictEqual(results, {
                 "id": order.id,
+                "created_at": mock.ANY,
+                "updated_at": mock.ANY,
                 "email": "new@mail.ru",
                 "eth_address": '1' * 42,
                 "purchases": [
                     {
                         "id": mock.ANY,
+                        "created_at": mock.ANY,
+                        "updated_at": mock.ANY,
                         "good": {
                             "id": self.good2.id,
+                            "created_at": mock.ANY,
+                            "updated_at": mock.ANY,
                             "name": self.good2.name
                         },
                         "good_id": self.good2.id,
@@ -348,6 +938,8 @@ class AnonymousOrdersTest(PermissionTest):
                     }
                 ],
                 "status": Order.Status.PROCESSING.value,
+                "total_price": '2.000000',
+                "item_count": 1,
                 "user": user.id,
             })
 
@@ -0,0 +1,157 @@
+import smtplib
+from datetime import timedelta
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core import mail
+from django.core.management import CommandError, call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from store.models import OutboxEmail, Settings
+from store.utils import send_confirmation, deliver_outbox, render_confirmation, reset_email_templates
+
+
+class OutboxTest(TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.addCleanup(reset_email_templates)
+
+        self.user, created = get_user_model().objects.update_or_create(
+            username='test', defaults={'is_superuser': False, 'is_staff': False, 'is_active': True})
+
+        Settings.objects.update_or_create(name=Settings.EMAIL_SUBJECT, defaults={'value': 'Order of %(username)s'})
+        Settings.objects.update_or_create(name=Settings.EMAIL_BODY, defaults={'value': 'Dear %(username)s'})
+        Settings.objects.update_or_create(name=Settings.EMAIL_FROM, defaults={'value': 'store@mail.ru'})
+
+    def test_send_confirmation(self):
+        send_confirmation('test@mail.ru', self.user)
+
+        self.assertListEqual([], mail.outbox)
+
+        email = OutboxEmail.objects.get()
+        self.assertEqual('Order of test', email.subject)
+        self.assertEqual('Dear test', email.body)
+        self.assertEqual('store@mail.ru', email.from_email)
+        self.assertEqual('test@mail.ru', email.to)
+
+    def test_send_confirmation_anonymous(self):
+        send_confirmation('test@mail.ru', None)
+
+        email = OutboxEmail.objects.get()
+        self.assertEqual('Order of ', email.subject)
+        self.assertEqual('Dear ', email.body)
+
+    def test_templates_are_cached(self):
+        render_confirmation('test@mail.ru', self.user)
+
+        with self.assertNumQueries(0):
+            emails = [render_confirmation(f'test{idx}@mail.ru', self.user) for idx in range(1000)]
+        self.assertSetEqual({'Dear test'}, {email.body for email in emails})
+
+        Settings.objects.filter(name=Settings.EMAIL_BODY).get().delete()
+        Settings.objects.create(name=Settings.EMAIL_BODY, value='Hello %(username)s, 100%%')
+        self.assertEqual('Hello test, 100%', render_confirmation('test@mail.ru', self.user).body)
+
+        setting = Settings.objects.get(name=Settings.EMAIL_SUBJECT)
+        setting.value = 'Confirmation'
+        setting.save()
+        self.assertEqual('Confirmation', render_confirmation('test@mail.ru', self.user).subject)
+
+    def test_deliver(self):
+        for idx in range(5):
+            send_confirmation(f'test{idx}@mail.ru', self.user)
+
+        with mock.patch('django.core.mail.backends.locmem.EmailBackend.open') as open_:
+            call_command('deliver_emails', '--batch-size', '2', stdout=mock.MagicMock())
+
+        self.assertEqual(1, open_.call_count)
+        self.assertListEqual([f'test{idx}@mail.ru' for idx in range(5)], [m.to[0] for m in mail.outbox])
+        self.assertFalse(OutboxEmail.objects.filter(sent_at=None).exists())
+
+        self.assertTupleEqual((0, 0), deliver_outbox())
+        self.assertEqual(5, len(mail.outbox))
+
+    @override_settings(EMAIL_OUTBOX_MAX_ATTEMPTS=2, EMAIL_OUTBOX_RETRY_DELAY=60)
+    def test_retry(self):
+        send_confirmation('test@mail.ru', self.user)
+
+        with mock.patch('django.core.mail.EmailMessage.send', side_effect=OSError('Connection refused')), \
+                self.assertLogs('store.utils', 'ERROR'):
+            self.assertTupleEqual((0, 1), deliver_outbox())
+
+        email = OutboxEmail.objects.get()
+        self.assertEqual(1, email.attempts)
+        self.assertEqual('Connection refused', email.last_error)
+        self.assertGreater(email.next_attempt_at, timezone.now() + timedelta(seconds=50))
+
+        self.assertTupleEqual((0, 0), deliver_outbox(), 'Backoff is not respected')
+
+        OutboxEmail.objects.update(next_attempt_at=timezone.now())
+        with mock.patch('django.core.mail.EmailMessage.send', side_effect=OSError('Connection refused')), \
+                self.assertLogs('store.utils', 'ERROR'):
+            self.assertTupleEqual((0, 1), deliver_outbox())
+
+        OutboxEmail.objects.update(next_attempt_at=timezone.now())
+        self.assertTupleEqual((0, 0), deliver_outbox(), 'Attempts are not limited')
+        self.assertListEqual([], mail.outbox)
+
+    def _deliver_failing(self, fail_calls):
+        """locmem sending which fails the given calls, like a server dropping the connection"""
+        send_messages = mail.backends.locmem.EmailBackend.send_messages
+        calls = []
+
+        def send(backend, messages):
+            calls.append(messages)
+            if len(calls) in fail_calls:
+                raise smtplib.SMTPServerDisconnected('Connection unexpectedly closed')
+            return send_messages(backend, messages)
+
+        return mock.patch('django.core.mail.backends.locmem.EmailBackend.send_messages', send)
+
+    def test_deliver_reconnects(self):
+        for idx in range(5):
+            send_confirmation(f'test{idx}@mail.ru', self.user)
+
+        with self._deliver_failing({2}), self.assertLogs('store.utils', 'ERROR'), \
+                mock.patch('django.core.mail.backends.locmem.EmailBackend.open') as open_:
+            self.assertTupleEqual((4, 1), deliver_outbox())
+
+        self.assertEqual(2, open_.call_count)
+        self.assertListEqual([1] * 5, list(OutboxEmail.objects.order_by('id').values_list('attempts', flat=True)))
+
+    def test_deliver_reconnect_fails(self):
+        for idx in range(5):
+            send_confirmation(f'test{idx}@mail.ru', self.user)
+
+        with self._deliver_failing({2}), self.assertLogs('store.utils', 'ERROR'), \
+                mock.patch('django.core.mail.backends.locmem.EmailBackend.open',
+                           side_effect=[None, ConnectionRefusedError()]), \
+                self.assertRaises(ConnectionRefusedError):
+            deliver_outbox()
+
+        # the e-mails not tried are due again and did not use an attempt
+        self.assertListEqual([1, 1, 0, 0, 0],
+                             list(OutboxEmail.objects.order_by('id').values_list('attempts', flat=True)))
+        self.assertEqual(3, OutboxEmail.objects.filter(sent_at=None, next_attempt_at__lte=timezone.now()).count())
+
+        self.assertTupleEqual((3, 0), deliver_outbox())
+
+    @override_settings(EMAIL_OUTBOX_RETRY_DELAY=60)
+    def test_deliver_connection_refused(self):
+        send_confirmation('test@mail.ru', self.user)
+
+        with mock.patch('django.core.mail.backends.locmem.EmailBackend.open',
+                        side_effect=[ConnectionRefusedError(), None]), \
+                mock.patch('time.sleep', side_effect=[None, KeyboardInterrupt]) as sleep, \
+                self.assertRaises(KeyboardInterrupt):
+            call_command('deliver_emails', '--interval', '1', stdout=mock.MagicMock(), stderr=mock.MagicMock())
+
+        self.assertListEqual([mock.call(60), mock.call(1)], sleep.call_args_list)
+        self.assertListEqual(['test@mail.ru'], [m.to[0] for m in mail.outbox])
+        self.assertEqual(1, OutboxEmail.objects.get().attempts)
+
+        with mock.patch('django.core.mail.backends.locmem.EmailBackend.open', side_effect=ConnectionRefusedError()), \
+                self.assertRaises(CommandError):
+            call_command('deliver_emails', stdout=mock.MagicMock(), stderr=mock.MagicMock())
@@ -0,0 +1,319 @@
+from datetime import timedelta
+from itertools import chain, combinations
+from types import SimpleNamespace
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group, Permission
+from django.db import connection
+from django.db.models.signals import m2m_changed
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from oauth2_provider.models import get_access_token_model, get_application_model, get_refresh_token_model
+from parameterized import parameterized
+from rest_access_policy import AccessPolicy
+
+from application.access_policy import CompiledAccessPolicy
+from application.checks import check_shared_caches
+from store.initialization import populate_models
+from store.tests.utils import PermissionTest
+from store.views.catalog_change import CatalogChangesAccessPolicy
+from store.views.good import GoodsAccessPolicy
+from store.views.my_order import MyOrderAccessPolicy
+from store.views.offer import OffersAccessPolicy
+from store.views.order import OrderAccessPolicy
+from store.views.purchase import PurchaseAccessPolicy
+from store.views.settings import SettingsAccessPolicy
+
+
+class AnonymousPermissionsTest(PermissionTest):
+
+    def setUp(self):
+        super().setUp()
+
+        self.anon_user = get_user_model().objects.get(username=settings.ANONYMOUS_USER_NAME)
+        self.group = Group.objects.get(name='AnonymousBuyers')
+
+    def _status_code(self):
+        return self.client.get(reverse('store:offers-list'), data={'page_size': 1}).status_code
+
+    def test_cached(self):
+        self.assertEqual(200, self.client.get(reverse('store:goods-list')).status_code)
+
+        # the response is cached as well, so the request needs no query at all
+        with self.assertNumQueries(0):
+            self.assertEqual(200, self.client.get(reverse('store:goods-list')).status_code)
+
+    @parameterized.expand([
+        ('group_permissions', lambda self: self.group.permissions.clear()),
+        ('permission_groups', lambda self: self.view_offer().group_set.remove(self.group)),
+        ('user_groups', lambda self: self.anon_user.groups.clear()),
+        ('group_users', lambda self: self.group.user_set.remove(self.anon_user)),
+        ('group_delete', lambda self: self.group.delete()),
+    ])
+    def test_invalidation(self, name, write):
+        self.assertEqual(200, self._status_code())
+
+        write(self)
+
+        self.assertEqual(401, self._status_code())
+
+    def test_invalidation_by_populate_models(self):
+        # writes through the m2m table send no signals
+        through = Group.permissions.through
+        through.objects.filter(group=self.group, permission=self.view_offer()).delete()
+        self.assertEqual(401, self._status_code())
+        through.objects.create(group=self.group, permission=self.view_offer())
+        self.assertEqual(401, self._status_code())
+
+        populate_models()
+
+        self.assertEqual(200, self._status_code())
+
+    @staticmethod
+    def view_offer():
+        return Permission.objects.get(content_type__app_label='store', codename='view_offer')
+
+
+class UserPermissionsTest(PermissionTest):
+
+    def setUp(self):
+        # a bumped version must reach every process, a per-process cache is not used
+        self._use_shared_cache()
+        super().setUp()
+
+        self.user, created = get_user_model().objects.update_or_create(
+            username='test',
+            defaults={'is_superuser': False, 'is_staff': False, 'is_active': True})
+        self.group = Group.objects.get(name='Buyers')
+        self.group.user_set.add(self.user)
+        self.client.force_login(self.user)
+
+    def _status_code(self):
+        return self.client.get(reverse('store:offers-list'), data={'page_size': 1}).status_code
+
+    def _permission_queries(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+            self.assertEqual(200, response.status_code, response.content)
+        return len([query for query in queries if '"auth_permission"' in query['sql']])
+
+    @staticmethod
+    def _permission(codename):
+        return Permission.objects.get(content_type__app_label='store', codename=codename)
+
+    def _make_superuser(self):
+        self.user.is_superuser = True
+        self.user.save()
+
+    def test_cached(self):
+        # the purchase policy checks several permissions and its scope checks them again
+        url = reverse('store:purchases-list')
+
+        # user and group permissions
+        self.assertEqual(2, self._permission_queries(url))
+        self.assertEqual(0, self._permission_queries(url))
+
+    def test_per_process_cache(self):
+        url = reverse('store:purchases-list')
+
+        with self.settings(CACHES={**settings.CACHES,
+                                   'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}):
+            self.assertEqual(2, self._permission_queries(url))
+            self.assertEqual(2, self._permission_queries(url))
+
+    @parameterized.expand([
+        ('group_permissions', lambda self: self.group.permissions.remove(self._permission('view_offer')), 200, 403),
+        ('permission_groups', lambda self: self._permission('view_offer').group_set.remove(self.group), 200, 403),
+        ('user_groups', lambda self: self.user.groups.remove(self.group), 200, 403),
+        ('group_users', lambda self: self.group.user_set.remove(self.user), 200, 403),
+        ('group_users_clear', lambda self: self.group.user_set.clear(), 200, 403),
+        ('group_delete', lambda self: self.group.delete(), 200, 403),
+        ('user_permissions', lambda self: self.user.user_permissions.add(self._permission('view_offer')), 403, 200),
+        ('superuser', lambda self: self._make_superuser(), 403, 200),
+    ])
+    def test_invalidation(self, name, write, before, after):
+        if before >= 400:
+            self.group.user_set.remove(self.user)
+        self.assertEqual(before, self._status_code())
+
+        write(self)
+
+        self.assertEqual(after, self._status_code())
+
+
+    def test_unrelated_m2m_change(self):
+        with mock.patch('application.authentication.bump_permission_versions') as bump:
+            m2m_changed.send(sender=get_access_token_model(), instance=self.group, action='post_add', reverse=True,
+                             model=get_user_model(), pk_set={self.user.pk})
+
+        bump.assert_not_called()
+
+    def test_user_model_receivers(self):
+        with mock.patch('application.authentication.bump_permission_versions') as bump:
+            self.user.save()
+
+        bump.assert_called_once_with(user_ids=[self.user.pk])
+
+
+class _User(SimpleNamespace):
+
+    def has_perm(self, perm):
+        return perm in self.perms
+
+
+class _ExpressionAccessPolicy(CompiledAccessPolicy):
+    statements = [
+        {"action": "*", "principal": "group:buyers", "effect": "allow", "condition": "is_a and (is_b or not is_c)"},
+        {"action": ["list"], "principal": ["id:1", "staff"], "effect": "allow"},
+        {"action": "<safe_methods>", "principal": "authenticated", "effect": "allow", "condition": "is_c"},
+        {"action": ["<method:delete>"], "principal": ["*"], "effect": "deny", "condition": ["is_a", "is_b"]},
+        {"action": ["create"], "principal": ["admin"], "effect": "allow", "condition": "has_role:moderator"},
+        {"action": ["update"], "principal": ["anonymous"], "effect": "allow", "condition": "is_a"},
+    ]
+
+    def get_user_group_values(self, user):
+        return user.groups
+
+    @staticmethod
+    def is_a(request, view, action):
+        return 'a' in request.user.flags
+
+    @classmethod
+    def is_b(cls, request, view, action):
+        return 'b' in request.user.flags
+
+    def is_c(self, request, view, action):
+        return 'c' in request.user.flags
+
+    @staticmethod
+    def has_role(request, view, action, role):
+        return role in request.user.flags
+
+
+class CompiledAccessPolicyTest(PermissionTest):
+
+    @staticmethod
+    def _subsets(values):
+        values = list(values)
+        return chain.from_iterable(combinations(values, size) for size in range(len(values) + 1))
+
+    def _assert_same(self, policy_class, users, actions):
+        policy = policy_class()
+        for user in users:
+            for action in actions:
+                for method in ('GET', 'POST', 'DELETE'):
+                    request = SimpleNamespace(user=user, method=method)
+                    view = SimpleNamespace(action=action, action_map={})
+
+                    self.assertEqual(AccessPolicy.has_permission(policy, request, view),
+                                     policy.has_permission(request, view), (policy_class, user, action, method))
+
+    @parameterized.expand([
+        (CatalogChangesAccessPolicy, ),
+        (GoodsAccessPolicy, ),
+        (MyOrderAccessPolicy, ),
+        (OffersAccessPolicy, ),
+        (OrderAccessPolicy, ),
+        (PurchaseAccessPolicy, ),
+        (SettingsAccessPolicy, ),
+    ])
+    def test_store_policies(self, policy_class):
+        perms = [f'store.{permission.codename}' for permission in Permission.objects.filter(
+            content_type__app_label='store')]
+        users = [_User(is_anonymous=is_anonymous, is_superuser=False, is_staff=False, pk=1, perms={perm, *others})
+                 for is_anonymous in (False, True) for perm in [None, *perms] for others in ([], perms[:len(perms) // 2])]
+        actions = {action for statement in policy_class.statements for action in statement['action']}
+
+        self._assert_same(policy_class, users, [*sorted(actions), 'unknown'])
+
+    def test_expressions(self):
+        users = [_User(is_anonymous=is_anonymous, is_superuser=is_superuser, is_staff=False, pk=pk, groups=groups,
+                       flags=set(flags))
+                 for is_anonymous in (False, True) for is_superuser in (False, True) for pk in (1, 2)
+                 for groups in ([], ['buyers']) for flags in self._subsets(['a', 'b', 'c', 'moderator'])]
+
+        self._assert_same(_ExpressionAccessPolicy, users, ['list', 'create', 'update', 'destroy'])
+
+
+class OAuth2TokenCacheTest(PermissionTest):
+
+    def setUp(self):
+        # revocations must reach every process, a per-process cache is not used
+        self._use_shared_cache()
+        super().setUp()
+
+        self.user, created = get_user_model().objects.update_or_create(
+            username='test',
+            defaults={'is_superuser': False, 'is_staff': False, 'is_active': True})
+        Group.objects.get(name='Buyers').user_set.add(self.user)
+        self.application = get_application_model().objects.create(
+            name='test', user=self.user, client_type='confidential', authorization_grant_type='client-credentials')
+        self.access_token = self._access_token('token', timedelta(hours=1))
+
+    def _access_token(self, token, expires_in):
+        return get_access_token_model().objects.create(
+            user=self.user, application=self.application, token=token, scope='read write',
+            expires=timezone.now() + expires_in)
+
+    def _user(self, token='token'):
+        response = self.client.get(reverse('store:offers-list'), data={'page_size': 1},
+                                   HTTP_AUTHORIZATION=f'Bearer {token}')
+        self.assertEqual(200, response.status_code, response.content)
+        return response.wsgi_request.user
+
+    def test_cached(self):
+        self.assertEqual(self.user, self._user())
+
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.user, self._user())
+
+        self.assertEqual([], [query['sql'] for query in queries
+                              if '"auth_' in query['sql'] or '"oauth2_provider_' in query['sql']])
+
+    @parameterized.expand([
+        ('revoke', lambda self: self.access_token.revoke()),
+        ('refresh_token_revoke', lambda self: get_refresh_token_model().objects.create(
+            user=self.user, application=self.application, token='refresh', access_token=self.access_token).revoke()),
+        ('application_delete', lambda self: self.application.delete()),
+    ])
+    def test_invalidation(self, name, write):
+        self.assertEqual(self.user, self._user())
+
+        write(self)
+
+        self.assertTrue(self._user().is_anonymous)
+
+    def test_per_process_cache(self):
+        with self.settings(CACHES={**settings.CACHES,
+                                   'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}):
+            self.assertEqual(self.user, self._user())
+
+            with CaptureQueriesContext(connection) as queries:
+                self.assertEqual(self.user, self._user())
+
+            self.assertTrue(any('"oauth2_provider_accesstoken"' in query['sql'] for query in queries))
+            self.assertListEqual(['application.E001'] * 5, [error.id for error in check_shared_caches(None)])
+
+        with self.settings(CACHES={alias: {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}
+                                   for alias in settings.CACHES}):
+            self.assertListEqual(['OAUTH2_TOKEN_CACHE', 'PERMISSIONS_CACHE', 'VERSIONS_CACHE', 'RESPONSE_CACHE',
+                                  'PAGINATION_COUNT_CACHE', 'SESSION_CACHE_ALIAS', 'IDEMPOTENCY_CACHE'],
+                                 [error.msg.split()[0] for error in check_shared_caches(None)])
+
+    def test_user_change(self):
+        self.assertEqual('', self._user().first_name)
+
+        self.user.first_name = 'changed'
+        self.user.save()
+
+        self.assertEqual('changed', self._user().first_name)
+
+    def test_expiry(self):
+        self._access_token('short', timedelta(seconds=10))
+        self.assertEqual(self.user, self._user('short'))
+
+        with mock.patch('django.utils.timezone.now', return_value=timezone.now() + timedelta(seconds=11)):
+            self.assertTrue(self._user('short').is_anonymous)
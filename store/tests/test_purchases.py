@@ -1,3 +1,4 @@
+import json
 from unittest import mock
 
 from django.contrib.auth import get_user_model
@@ -5,9 +6,9 @@ from django.contrib.auth.models import AnonymousUser
 from django.urls import reverse
 from parameterized import parameterized
 
-from store.const import ORDER_IDS_SESSION_PARAM_NAME
 from store.models import Good, Purchase, Order
 from store.tests.utils import PermissionTest
+from store.views.purchase import PurchaseView
 
 
 class PurchasesTest(PermissionTest):
@@ -53,6 +54,45 @@ class PurchasesTest(PermissionTest):
             results = response.json()['results']
             self.assertEqual(results_count, len(results))
 
+    @parameterized.expand([
+        ([], 403),
+        (["store.view_purchase"], 200),
+        (["store.view_my_purchase"], 200),
+    ])
+    def test_export(self, perms, status_code):
+        with self._set_perms(self.user, perms), mock.patch('store.views.purchase.PurchaseView.export_chunk_size', 2):
+
+            response = self.client.get(reverse('store:purchases-export'))
+
+            self.assertEqual(status_code, response.status_code)
+            if status_code >= 400:
+                return
+
+            self.assertEqual('application/x-ndjson; charset=utf-8', response['Content-Type'])
+            rows = [json.loads(line) for line in b''.join(response.streaming_content).decode().splitlines()]
+            results = self.client.get(reverse('store:purchases-list')).json()['results']
+            self.assertListEqual(results, rows)
+
+    @parameterized.expand([
+        (["store.view_purchase"], ),
+        (["store.view_my_purchase"], ),
+    ])
+    def test_list_query_count(self, perms):
+        for idx in range(10):
+            good, created = Good.objects.get_or_create(name=f'good {idx}')
+            Purchase.objects.create(good=good, price=1, order=self.user_order)
+
+        with self._set_perms(self.user, perms):
+            self._assert_list_queries_flat(reverse('store:purchases-list'), 10)
+
+    @parameterized.expand([
+        (["store.view_purchase"], ),
+        (["store.view_my_purchase"], ),
+    ])
+    def test_list_fast(self, perms):
+        with self._set_perms(self.user, perms):
+            self._assert_fast_list_identical(PurchaseView, reverse('store:purchases-list'))
+
     @parameterized.expand([
         ([], 403, lambda self: self.user_purchase.id),
         ([], 403, lambda self: self.other_user_purchase.id),
@@ -77,9 +117,13 @@ class PurchasesTest(PermissionTest):
             results = response.json()
             self.assertDictEqual(results, {
                 "id": get_purchase_id(self),
+                "created_at": mock.ANY,
+                "updated_at": mock.ANY,
                 "good_id": self.good.id,
                 "good": {
                     "id": self.good.id,
+                    "created_at": mock.ANY,
+                    "updated_at": mock.ANY,
                     "name": self.good.name
                 },
                 "price": mock.ANY,
@@ -163,9 +207,7 @@ class AnonymousPurchasesTest(PermissionTest):
     ])
     def test_list(self, perms, status_code, results_count, get_order_ids):
         with self._set_perms(self.anon_user, perms):
-            session = self.client.session
-            session[ORDER_IDS_SESSION_PARAM_NAME] = get_order_ids(self)
-            session.save()
+            self._grant_order_access(get_order_ids(self))
 
             url = reverse('store:purchases-list')
             response = self.client.get(url)
@@ -188,9 +230,7 @@ class AnonymousPurchasesTest(PermissionTest):
     def test_retrieve(self, perms, status_code, get_order_ids):
         with self._set_perms(self.anon_user, perms):
 
-            session = self.client.session
-            session[ORDER_IDS_SESSION_PARAM_NAME] = get_order_ids(self)
-            session.save()
+            self._grant_order_access(get_order_ids(self))
 
             pk = get_order_ids(self)[0]
             url = reverse('store:purchases-detail', kwargs={"pk": pk})
@@ -203,9 +243,13 @@ class AnonymousPurchasesTest(PermissionTest):
             results = response.json()
             self.assertDictEqual(results, {
                 "id": pk,
+                "created_at": mock.ANY,
+                "updated_at": mock.ANY,
                 "good_id": mock.ANY,
                 "good": {
                     "id": mock.ANY,
+                    "created_at": mock.ANY,
+                    "updated_at": mock.ANY,
                     "name": mock.ANY
                 },
                 "price": mock.ANY,
@@ -0,0 +1,83 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.sessions.models import Session
+from django.core.cache import caches
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from application.sessions import SessionStore
+from store.tests.utils import PermissionTest
+
+
+class SessionStoreTest(PermissionTest):
+
+    def setUp(self):
+        self._use_shared_cache()
+        super().setUp()
+
+        store = SessionStore()
+        store['value'] = 1
+        store.save()
+        self.session_key = store.session_key
+
+    def test_cached(self):
+        with self.assertNumQueries(0):
+            self.assertEqual(1, SessionStore(self.session_key)['value'])
+
+    def test_cache_miss(self):
+        SessionStore()._cache.clear()
+
+        with self.assertNumQueries(1):
+            self.assertEqual(1, SessionStore(self.session_key)['value'])
+        with self.assertNumQueries(0):
+            self.assertEqual(1, SessionStore(self.session_key)['value'])
+
+    def test_unchanged_save(self):
+        store = SessionStore(self.session_key)
+        store['value'] = 1
+
+        with self.assertNumQueries(0):
+            store.save()
+
+    def test_changed_save(self):
+        store = SessionStore(self.session_key)
+        store['value'] = 2
+
+        with CaptureQueriesContext(connection) as queries:
+            store.save()
+        self.assertTrue(any('UPDATE "django_session"' in query['sql'] for query in queries))
+
+        with self.assertNumQueries(0):
+            self.assertEqual(2, SessionStore(self.session_key)['value'])
+        self.assertEqual(2, SessionStore()._cache.get(store.cache_key)['value'])
+        self.assertEqual(2, Session.objects.get(session_key=self.session_key).get_decoded()['value'])
+
+    def test_per_process_cache(self):
+        with self.settings(CACHES={**settings.CACHES,
+                                   'sessions': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}):
+            store = SessionStore(self.session_key)
+            store['value'] = 2
+            store.save()
+
+            with self.assertNumQueries(1):
+                self.assertEqual(2, SessionStore(self.session_key)['value'])
+            self.assertIsNone(caches['sessions'].get(store.cache_key))
+
+    def test_flush(self):
+        store = SessionStore(self.session_key)
+        store.flush()
+
+        self.assertEqual({}, SessionStore(self.session_key).load())
+
+    def test_clear_expired(self):
+        expired = timezone.now() - timedelta(days=1)
+        Session.objects.bulk_create([Session(session_key=f'expired{idx}', session_data='', expire_date=expired)
+                                     for idx in range(5)])
+
+        with self.settings(SESSION_CLEANUP_BATCH_SIZE=2), CaptureQueriesContext(connection) as queries:
+            SessionStore.clear_expired()
+
+        self.assertListEqual([self.session_key], list(Session.objects.values_list('session_key', flat=True)))
+        self.assertEqual(3, len([query for query in queries if query['sql'].startswith('DELETE')]))
@@ -1,3 +1,6 @@
+import os
+import shutil
+import tempfile
 from contextlib import contextmanager
 from functools import reduce
 from operator import or_
@@ -5,12 +8,72 @@ from unittest import mock
 
 from django.conf import settings
 from django.contrib.auth.models import Permission
+from django.core.cache import caches
+from django.db import connection
 from django.db.models import Q
+from django.test.utils import CaptureQueriesContext
+from rest_framework.settings import api_settings
 from rest_framework.test import APITestCase
 
+from application.authentication import clear_anonymous_permissions
+from store.const import ORDER_ACCESS_COOKIE_NAME
+from store.order_access import dumps_order_access
+from store.renderers import FastJSONRenderer
+
 
 class PermissionTest(APITestCase):
 
+    def setUp(self):
+        super().setUp()
+
+        for cache in caches.all():
+            cache.clear()
+        # the test database is rolled back without signals
+        clear_anonymous_permissions()
+
+    def _use_shared_cache(self, *aliases):
+        """file based caches, all of them or the given ones, which caches that must be shared are used with"""
+        location = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, location)
+        shared_cache = self.settings(CACHES={
+            alias: {**cache, 'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+                    'LOCATION': os.path.join(location, alias)} if not aliases or alias in aliases else cache
+            for alias, cache in settings.CACHES.items()
+        })
+        shared_cache.enable()
+        self.addCleanup(shared_cache.disable)
+
+    def _grant_order_access(self, order_ids):
+        self.client.cookies[ORDER_ACCESS_COOKIE_NAME] = dumps_order_access(order_ids)
+
+    def _count_queries(self, method, url, data=None):
+        with CaptureQueriesContext(connection) as queries:
+            response = getattr(self.client, method)(url, data=data, format='json')
+            self.assertLess(response.status_code, 400, response.content)
+        return len(queries)
+
+    def _assert_list_queries_flat(self, url, count):
+        # both requests count the rows
+        single = self._count_queries('get', f'{url}?page_size=1')
+        caches[settings.PAGINATION_COUNT_CACHE].clear()
+        many = self._count_queries('get', f'{url}?page_size={count}')
+
+        self.assertEqual(single, many, 'Queries grow with the number of rows')
+
+    def _assert_fast_list_identical(self, view_class, url):
+        fast = self.client.get(url)
+        for cache in caches.all():
+            cache.clear()
+        # the serializer output rendered by DRF, not by FastJSONRenderer
+        with mock.patch.object(view_class, 'fast_list', False), \
+                mock.patch.object(view_class, 'renderer_classes', api_settings.DEFAULT_RENDERER_CLASSES):
+            serialized = self.client.get(url)
+
+        self.assertEqual(200, fast.status_code, fast.content)
+        self.assertIsInstance(fast.accepted_renderer, FastJSONRenderer)
+        self.assertNotIsInstance(serialized.accepted_renderer, FastJSONRenderer)
+        self.assertEqual(serialized.content, fast.content)
+
     @contextmanager
     def _set_perms(self, user, perms):
         if perms:
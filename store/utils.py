@@ -1,24 +1,162 @@
 import logging
+import re
+import time
+from datetime import timedelta
 
-from django.core.mail import send_mail
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
+from django.forms.models import model_to_dict
+from django.utils import timezone
 
 log = logging.getLogger(__name__)
 
 
-def send_confirmation(email, data):
+class _TemplateData(dict):
+
+    def __missing__(self, key):
+        return ''
+
+
+class EmailTemplate:
+    """%-style template parsed once, it knows which keys it references, unknown keys render empty"""
+
+    KEY_RE = re.compile(r'%%|%\((?P<key>[^)]*)\)')
+
+    def __init__(self, template):
+        self.template = template
+        self.keys = tuple(dict.fromkeys(m.group('key') for m in self.KEY_RE.finditer(template) if m.group('key')))
+
+    def render(self, data):
+        return self.template % _TemplateData(data)
+
+
+_email_templates = None
+_email_templates_loaded_at = 0.0
+
+
+def get_email_templates():
+    """
+    confirmation templates cached for the process
+
+    The cache is reset by saving or deleting Settings, the TTL bounds staleness in other processes.
+    """
+    global _email_templates, _email_templates_loaded_at
     from .models import Settings
 
-    sets = Settings.objects.filter(
-        name__in=[Settings.EMAIL_SUBJECT, Settings.EMAIL_BODY, Settings.EMAIL_FROM]).values()
-    sets = {s['name']: s['value'] for s in sets}
+    if _email_templates is None or time.monotonic() - _email_templates_loaded_at > settings.EMAIL_TEMPLATES_TTL:
+        sets = Settings.objects.filter(
+            name__in=[Settings.EMAIL_SUBJECT, Settings.EMAIL_BODY, Settings.EMAIL_FROM]).values()
+        sets = {s['name']: s['value'] for s in sets}
+
+        _email_templates = (EmailTemplate(sets[Settings.EMAIL_SUBJECT]),
+                            EmailTemplate(sets[Settings.EMAIL_BODY]),
+                            sets[Settings.EMAIL_FROM])
+        _email_templates_loaded_at = time.monotonic()
+
+    return _email_templates
+
+
+def reset_email_templates(*args, **kwargs):
+    global _email_templates
+    _email_templates = None
+
+
+def render_confirmation(email, user):
+    from .models import OutboxEmail
+
+    subject, body, from_ = get_email_templates()
+    keys = set(subject.keys + body.keys)
+    data = model_to_dict(user, fields=keys) if user is not None and keys else {}
+
+    return OutboxEmail(subject=subject.render(data), body=body.render(data), from_email=from_, to=email)
+
+
+def send_confirmation(email, user):
+    """queue the confirmation e-mail to the outbox, it is committed or rolled back with the current transaction"""
+    render_confirmation(email, user).save()
+
+
+def send_confirmations(recipients):
+    """queue confirmation e-mails for (email, user) pairs with one INSERT"""
+    from .models import OutboxEmail
+
+    OutboxEmail.objects.bulk_create([render_confirmation(email, user) for email, user in recipients])
+
+
+def _claim_outbox(batch_size):
+    from .models import OutboxEmail
+
+    now = timezone.now()
+    with transaction.atomic():
+        emails = list(OutboxEmail.objects
+                      .select_for_update(skip_locked=True)
+                      .filter(sent_at=None, attempts__lt=settings.EMAIL_OUTBOX_MAX_ATTEMPTS, next_attempt_at__lte=now)
+                      .order_by('next_attempt_at', 'id')[:batch_size])
+
+        # a claimed e-mail is hidden from other workers until the lease expires
+        lease = now + timedelta(seconds=settings.EMAIL_OUTBOX_LEASE)
+        OutboxEmail.objects.filter(id__in=[e.id for e in emails]).update(next_attempt_at=lease)
+
+    return emails
+
+
+def _release_outbox(emails):
+    """makes claimed e-mails due again without counting an attempt"""
+    from .models import OutboxEmail
+
+    if emails:
+        OutboxEmail.objects.filter(id__in=[e.id for e in emails]).update(next_attempt_at=timezone.now())
+
+
+def deliver_outbox(batch_size=100):
+    """
+    send pending e-mails of the outbox in batches over one SMTP connection, returns numbers of sent and failed
+
+    The connection is reopened after a failed e-mail, the server may have dropped it. An error opening it is raised,
+    before any e-mail is claimed or with the e-mails not tried yet released for the next pass.
+    """
+    from .models import OutboxEmail
+
+    sent_num, failed_num = 0, 0
+    connection = get_connection()
+    connection.open()
+
+    try:
+        while True:
+            emails = _claim_outbox(batch_size)
+            if not emails:
+                break
+
+            sent, failed = [], []
+            try:
+                for email in emails:
+                    message = EmailMessage(email.subject, email.body, email.from_email, [email.to],
+                                           connection=connection)
+                    try:
+                        message.send()
+                    except Exception as e:
+                        log.exception('Unable to send e-mail to %s.', email.to)
+                        email.attempts += 1
+                        delay = settings.EMAIL_OUTBOX_RETRY_DELAY * 2 ** (email.attempts - 1)
+                        email.next_attempt_at = timezone.now() + timedelta(seconds=delay)
+                        email.last_error = str(e)
+                        failed.append(email)
+
+                        connection.close()
+                        connection.open()
+                    else:
+                        email.attempts += 1
+                        email.sent_at = timezone.now()
+                        sent.append(email)
+            finally:
+                OutboxEmail.objects.bulk_update(sent, ['attempts', 'sent_at'])
+                OutboxEmail.objects.bulk_update(failed, ['attempts', 'next_attempt_at', 'last_error'])
+                _release_outbox(emails[len(sent) + len(failed):])
 
-    subject = sets[Settings.EMAIL_SUBJECT] % data
-    body = sets[Settings.EMAIL_BODY] % data
-    from_ = sets[Settings.EMAIL_FROM]
+            sent_num += len(sent)
+            failed_num += len(failed)
+    finally:
+        connection.close()
 
-    sent_num = send_mail(subject,
-                         body,
-                         from_,
-                         [email])
-    if sent_num != 1:
-        log.error('Unable to send e-mail to %s.', email)
+    return sent_num, failed_num
@@ -0,0 +1,87 @@
+from django.conf import settings
+from rest_framework import viewsets
+from rest_framework.exceptions import ValidationError
+from rest_framework.pagination import _positive_int
+from rest_framework.response import Response
+
+from application.access_policy import CompiledAccessPolicy
+from store.models import CatalogChange, Good, Offer
+from store.serializers import CatalogChangeSerializer, GoodSerializer, OfferSerializer
+
+
+class CatalogChangesAccessPolicy(CompiledAccessPolicy):
+    statements = [
+        {
+            "action": ["list"],
+            "principal": ["*"],
+            "effect": "allow",
+            "condition": "can_view_catalog",
+        },
+    ]
+
+    @staticmethod
+    def can_view_catalog(request, view, action) -> bool:
+        return request.user.has_perm('store.view_good') or request.user.has_perm('store.view_offer')
+
+
+class CatalogChangesView(viewsets.GenericViewSet):
+    """
+    inserts, updates and deletes of goods and offers after the `cursor`, oldest first
+
+    A client passes the returned cursor, the position of the last change, with the next request. Changes are
+    listed once their position is assigned after they commit, so a change committed after a later one is listed
+    after it as well.
+    """
+
+    permission_classes = (CatalogChangesAccessPolicy, )
+    queryset = CatalogChange.objects
+    serializer_class = CatalogChangeSerializer
+    pagination_class = None
+    filter_backends = ()
+    feed_models = {
+        'good': (Good, GoodSerializer, 'store.view_good'),
+        'offer': (Offer, OfferSerializer, 'store.view_offer'),
+    }
+
+    def _get_cursor(self, request):
+        try:
+            return int(request.query_params.get('cursor', 0))
+        except ValueError:
+            raise ValidationError({'cursor': 'A valid integer is required.'})
+
+    def _get_limit(self, request):
+        try:
+            return _positive_int(request.query_params['limit'], strict=True, cutoff=settings.MAX_PAGE_SIZE)
+        except (KeyError, ValueError):
+            return settings.REST_FRAMEWORK['PAGE_SIZE']
+
+    def _get_objects(self, changes):
+        objects = {}
+        for name, (model, serializer_class, perm) in self.feed_models.items():
+            ids = {c.object_id for c in changes if c.model == name and c.action != CatalogChange.Action.DELETE}
+            if not ids:
+                continue
+            queryset = serializer_class.setup_eager_loading(model.objects.filter(id__in=ids))
+            data = serializer_class(queryset, many=True, context=self.get_serializer_context()).data
+            objects.update({(name, item['id']): item for item in data})
+        return objects
+
+    def list(self, request, *args, **kwargs):
+        cursor = self._get_cursor(request)
+        limit = self._get_limit(request)
+        models = [name for name, (model, serializer_class, perm) in self.feed_models.items()
+                  if request.user.has_perm(perm)]
+
+        changes = list(self.get_queryset()
+                       .filter(position__gt=cursor, model__in=models)
+                       .order_by('position')[:limit + 1])
+        more = len(changes) > limit
+        changes = changes[:limit]
+
+        serializer = self.get_serializer(changes, many=True, context={**self.get_serializer_context(),
+                                                                      'objects': self._get_objects(changes)})
+        return Response({
+            'cursor': changes[-1].position if changes else cursor,
+            'more': more,
+            'results': serializer.data,
+        })
@@ -1,11 +1,12 @@
-from rest_access_policy import AccessPolicy
 from rest_framework import viewsets
 
+from application.access_policy import CompiledAccessPolicy
 from store.models import Good
 from store.serializers import GoodSerializer
+from store.views.mixins import FastListMixin, LastModifiedMixin, SparseFieldsMixin, VersionedCacheMixin
 
 
-class GoodsAccessPolicy(AccessPolicy):
+class GoodsAccessPolicy(CompiledAccessPolicy):
     statements = [
         {
             "action": ["list", "retrieve"],
@@ -31,7 +32,11 @@ class GoodsAccessPolicy(AccessPolicy):
                 or request.user.has_perm('store.change_good'))
 
 
-class GoodsView(viewsets.mixins.CreateModelMixin,
+class GoodsView(VersionedCacheMixin,
+                SparseFieldsMixin,
+                LastModifiedMixin,
+                FastListMixin,
+                viewsets.mixins.CreateModelMixin,
                 viewsets.mixins.RetrieveModelMixin,
                 viewsets.mixins.UpdateModelMixin,
                 viewsets.mixins.ListModelMixin,
@@ -42,3 +47,4 @@ class GoodsView(viewsets.mixins.CreateModelMixin,
     queryset = Good.objects
     serializer_class = GoodSerializer
     ordering = ['id']
+    cache_models = (Good, )
@@ -0,0 +1,264 @@
+import hashlib
+from itertools import islice
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db.models import prefetch_related_objects
+from django.http import HttpResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, parse_http_date_safe, quote_etag
+from rest_framework import serializers, status
+from rest_framework.decorators import action
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.renderers import JSONRenderer
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+
+from application.pagination import KeysetPagination, SelectablePagination
+from application.versions import get_table_versions
+from store.fieldsets import narrow, parse_selection, prune, selects
+from store.renderers import CSVRenderer, FastJSONRenderer, NDJSONRenderer
+from store.row_serializers import get_row_serializer
+
+
+class EagerLoadingMixin:
+    """applies the eager loading declared by the serializer, see store.serializers.EagerLoadingSerializerMixin"""
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+
+        setup_eager_loading = getattr(self.get_serializer_class(), 'setup_eager_loading', None)
+        if setup_eager_loading is not None:
+            queryset = setup_eager_loading(queryset)
+
+        return queryset
+
+    def perform_update(self, serializer):
+        super().perform_update(serializer)
+
+        # UpdateModelMixin drops the prefetched objects of the updated instance, so the response is rendered
+        # from a reloaded one instead of lazily loading every related object
+        serializer.instance = self.get_queryset().get(pk=serializer.instance.pk)
+
+
+class VersionedCacheMixin:
+    """
+    caches list and retrieve responses until a table of `cache_models` changes, answers If-None-Match with 304
+
+    Responses must not depend on the user beyond the permission check, which runs before the cache is read.
+    """
+
+    cache_models = ()
+
+    def list(self, request, *args, **kwargs):
+        return self._cached(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self._cached(super().retrieve, request, *args, **kwargs)
+
+    def _response_cache_key(self, request):
+        scope = (
+            self.action,
+            request.get_host(),
+            request.path,
+            sorted(request.query_params.lists()),
+            request.accepted_media_type,
+            [f'{cls.__module__}.{cls.__qualname__}' for cls in self.permission_classes],
+            get_table_versions([model._meta.db_table for model in self.cache_models]),
+        )
+        return 'response:' + hashlib.sha256(repr(scope).encode()).hexdigest()
+
+    def _cached(self, handler, request, *args, **kwargs):
+        cache_key = self._response_cache_key(request)
+        etag = quote_etag(cache_key.split(':')[1])
+
+        cache = caches[settings.RESPONSE_CACHE]
+        cached = cache.get(cache_key)
+        if cached is None:
+            conditional = _conditional_response(request, etag=etag)
+            if conditional is not None:
+                return conditional
+
+            response = handler(request, *args, **kwargs)
+            if response.status_code == status.HTTP_200_OK:
+                cache.set(cache_key, (response.data, response.get('Last-Modified')),
+                          timeout=settings.RESPONSE_CACHE_TIMEOUT)
+        else:
+            data, last_modified = cached
+            conditional = _conditional_response(request, etag=etag, last_modified=last_modified)
+            if conditional is not None:
+                return conditional
+
+            response = Response(data)
+            if last_modified:
+                response['Last-Modified'] = last_modified
+
+        if response.status_code == status.HTTP_200_OK:
+            response['ETag'] = etag
+        return response
+
+
+class LastModifiedMixin:
+    """
+    sends Last-Modified of the retrieved object and answers If-Modified-Since with 304
+
+    `last_modified_fields` are paths to the timestamps of everything the representation shows, to-many relations
+    are followed into every related object, so they should be prefetched.
+    """
+
+    last_modified_fields = ('updated_at', )
+
+    def get_last_modified_fields(self):
+        return self.last_modified_fields
+
+    def get_last_modified(self, instance):
+        timestamps = [timestamp for path in self.get_last_modified_fields()
+                      for timestamp in _resolve(instance, path)]
+        return max(timestamps)
+
+    def retrieve(self, request, *args, **kwargs):
+        instance = self.get_object()
+        last_modified = http_date(self.get_last_modified(instance).timestamp())
+
+        conditional = _conditional_response(request, last_modified=last_modified)
+        if conditional is not None:
+            return conditional
+
+        serializer = self.get_serializer(instance)
+        return Response(serializer.data, headers={'Last-Modified': last_modified})
+
+
+class SparseFieldsMixin:
+    """
+    renders the fields selected by ?fields= and ?expand= of read requests, see store.fieldsets
+
+    Nested objects which were not selected are not loaded, lists also defer the columns no selected field reads.
+    Last-Modified covers the selected nested objects only, so it must come before LastModifiedMixin.
+    """
+
+    fields_query_param = 'fields'
+    expand_query_param = 'expand'
+
+    def get_field_selection(self):
+        if self.request is None or self.request.method not in SAFE_METHODS:
+            return None
+
+        if not hasattr(self, '_field_selection'):
+            params = self.request.query_params
+            self._field_selection = parse_selection(
+                self.get_serializer_class()(context=self.get_serializer_context()),
+                params.get(self.fields_query_param), params.get(self.expand_query_param))
+        return self._field_selection
+
+    def get_serializer(self, *args, **kwargs):
+        serializer = super().get_serializer(*args, **kwargs)
+
+        selection = self.get_field_selection()
+        if selection is not None:
+            prune(serializer.child if isinstance(serializer, serializers.ListSerializer) else serializer, selection)
+        return serializer
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+
+        selection = self.get_field_selection()
+        if selection is not None:
+            queryset = narrow(queryset, self.get_serializer(), selection, columns=not self.detail)
+        return queryset
+
+    def get_last_modified_fields(self):
+        fields = super().get_last_modified_fields()
+
+        selection = self.get_field_selection()
+        if selection is None:
+            return fields
+        return [path for path in fields if selects(selection, path)]
+
+
+class FastListMixin:
+    """
+    lists `values_list()` rows converted by a generated row-to-dict function, rendered by FastJSONRenderer
+
+    The output is the one of the serializer, which may only have model fields and to-one nested serializers, see
+    store.row_serializers, pruned to the selection of SparseFieldsMixin. Keyset pages need model instances for their
+    cursors, so they are listed the usual way.
+    """
+
+    fast_list = True
+    renderer_classes = [FastJSONRenderer if cls is JSONRenderer else cls
+                        for cls in api_settings.DEFAULT_RENDERER_CLASSES]
+
+    def _lists_rows(self, request):
+        paginator = self.paginator
+        if isinstance(paginator, SelectablePagination):
+            paginator = paginator.get_paginator(request, self)
+        return self.fast_list and not isinstance(paginator, KeysetPagination)
+
+    def list(self, request, *args, **kwargs):
+        if not self._lists_rows(request):
+            return super().list(request, *args, **kwargs)
+
+        selection = self.get_field_selection() if isinstance(self, SparseFieldsMixin) else None
+        row_serializer = get_row_serializer(self.get_serializer_class(), selection)
+        rows = row_serializer.values(self.filter_queryset(self.get_queryset()))
+
+        page = self.paginate_queryset(rows)
+        if page is not None:
+            return self.get_paginated_response(row_serializer.many(page))
+        return Response(row_serializer.many(rows))
+
+
+class ExportMixin:
+    """
+    streams the filtered and scoped list as NDJSON, or as CSV with ?format=csv
+
+    Rows are read through a server-side cursor in chunks and prefetched per chunk, so memory use does not grow
+    with the size of the export.
+    """
+
+    export_chunk_size = 1000
+
+    @action(detail=False, methods=['get'], renderer_classes=[NDJSONRenderer, CSVRenderer])
+    def export(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        serializer = self.get_serializer()
+        fields = [name for name, field in serializer.fields.items() if not field.write_only]
+        rows = (serializer.to_representation(obj) for chunk in _chunks(queryset, self.export_chunk_size)
+                for obj in chunk)
+
+        renderer = request.accepted_renderer
+        response = StreamingHttpResponse(renderer.stream(rows, fields),
+                                         content_type=f'{renderer.media_type}; charset={renderer.charset}')
+        response['Content-Disposition'] = f'attachment; filename="{self.basename}.{renderer.format}"'
+        return response
+
+
+def _chunks(queryset, size):
+    # iterator() skips prefetch_related, so the lookups are applied to each chunk instead
+    lookups = queryset._prefetch_related_lookups
+    iterator = queryset.iterator(chunk_size=size)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            break
+        prefetch_related_objects(chunk, *lookups)
+        yield chunk
+
+
+def _resolve(instance, path):
+    objs = [instance]
+    for name in path.split('.'):
+        values = [getattr(obj, name) for obj in objs]
+        objs = [related for value in values if value is not None
+                for related in (value.all() if hasattr(value, 'all') else [value])]
+    return objs
+
+
+def _conditional_response(request, etag=None, last_modified=None):
+    """304 (or 412) response to the conditional headers of the request, None when the full response is due"""
+    headers = {'ETag': etag, 'Last-Modified': last_modified}
+    response = HttpResponse(headers={name: value for name, value in headers.items() if value})
+    timestamp = parse_http_date_safe(last_modified) if last_modified else None
+
+    conditional = get_conditional_response(request, etag=etag, last_modified=timestamp, response=response)
+    return None if conditional is response else conditional
@@ -1,20 +1,26 @@
 import logging
-import random
 
 from django.conf import settings
-from django.db import IntegrityError
 from django.db.models import Q
-from rest_access_policy import AccessPolicy
-from rest_framework import viewsets
-
-from store.const import ORDER_IDS_SESSION_PARAM_NAME
+from django.utils.translation import gettext_lazy as _
+from rest_framework import status, viewsets
+from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+
+from application.access_policy import CompiledAccessPolicy
+from store.idempotency import IdempotencyMixin
 from store.models import Order
+from store.order_access import get_order_access, update_order_access
+from store.order_ids import get_order_id_allocator
 from store.serializers import MyOrderSerializer
+from store.views.mixins import EagerLoadingMixin, LastModifiedMixin, SparseFieldsMixin
 
 log = logging.getLogger(__name__)
 
 
-class MyOrderAccessPolicy(AccessPolicy):
+class MyOrderAccessPolicy(CompiledAccessPolicy):
     statements = [
         {
             "action": ["list", "retrieve"],
@@ -23,7 +29,7 @@ class MyOrderAccessPolicy(AccessPolicy):
             "condition": "can_view_my_order",
         },
         {
-            "action": ["create", "update", "partial_update", "destroy"],
+            "action": ["create", "bulk_create", "update", "partial_update", "destroy"],
             "principal": ["*"],
             "effect": "allow",
             "condition": "can_moderate_my_order",
@@ -44,12 +50,12 @@ class MyOrderAccessPolicy(AccessPolicy):
             qs = qs.filter(user=None)  # anonymous is allowed to see anonymous orders only
 
             if action == 'list':
-                order_ids = request.session.get(ORDER_IDS_SESSION_PARAM_NAME, [])
+                order_ids = get_order_access(request)
                 qs = qs.filter(id__in=order_ids)
 
         else:
             if action == 'list':
-                order_ids = request.session.get(ORDER_IDS_SESSION_PARAM_NAME, [])
+                order_ids = get_order_access(request)
                 qs = qs.filter(Q(user=request.user) | Q(id__in=order_ids, user=None))
 
             else:
@@ -58,7 +64,11 @@ class MyOrderAccessPolicy(AccessPolicy):
         return qs
 
 
-class MyOrderView(viewsets.mixins.CreateModelMixin,
+class MyOrderView(IdempotencyMixin,
+                  SparseFieldsMixin,
+                  LastModifiedMixin,
+                  EagerLoadingMixin,
+                  viewsets.mixins.CreateModelMixin,
                   viewsets.mixins.RetrieveModelMixin,
                   viewsets.mixins.UpdateModelMixin,
                   viewsets.mixins.ListModelMixin,
@@ -67,8 +77,14 @@ class MyOrderView(viewsets.mixins.CreateModelMixin,
     permission_classes = (MyOrderAccessPolicy,)
     queryset = Order.objects
     serializer_class = MyOrderSerializer
-    filterset_fields = ['status']
+    filterset_fields = {
+        'status': ['exact'],
+        'total_price': ['exact', 'gte', 'lte'],
+        'item_count': ['exact', 'gte', 'lte'],
+    }
     ordering = ['id']
+    last_modified_fields = ('updated_at', 'purchases.updated_at', 'purchases.good.updated_at')
+    granted_order_ids = ()
 
     @property
     def access_policy(self):
@@ -80,24 +96,51 @@ class MyOrderView(viewsets.mixins.CreateModelMixin,
         )
 
     def perform_create(self, serializer):
-        if not self.request.user.is_anonymous:
-            return super().perform_create(serializer)
-
         # it is allowed to anyone to access an order created by an anonymous user
         # sequential id generation is vulnerable to pickup attacks
         # if one knows his ID, he can guess which one should be next
         # let's make it harder to guess
-        for _ in range(settings.ANONYMOUS_ORDER_ID_GENERATION_ITERATIONS):
-            try:
-                random.seed()
-                serializer.validated_data['id'] = random.randint(*settings.ANONYMOUS_ORDER_ID_GENERATION_RANGE)
-                super().perform_create(serializer)
-                break
-            except IntegrityError:
-                pass
-        else:
-            log.exception('Unable to generate anonymous Order-ID.')
-            raise
-
-        self.request.session.setdefault(ORDER_IDS_SESSION_PARAM_NAME, []).append(serializer.instance.id)
-        self.request.session.modified = True
+        # authenticated orders share the allocator so that ids drawn from it never meet auto-incremented ones
+        serializer.validated_data['id'] = get_order_id_allocator().allocate()
+        super().perform_create(serializer)
+        self._grant_access([serializer.instance])
+
+    @action(detail=False, methods=['post'], url_path='bulk', url_name='bulk')
+    def bulk_create(self, request, *args, **kwargs):
+        """
+        create several orders at once, either all of them are created or errors are reported per order
+
+        At most settings.ORDER_BULK_MAX_SIZE orders are created by a request.
+        """
+        if isinstance(request.data, list) and len(request.data) > settings.ORDER_BULK_MAX_SIZE:
+            error = _('Ensure this list has no more than {max_size} orders.').format(
+                max_size=settings.ORDER_BULK_MAX_SIZE)
+            raise ValidationError({api_settings.NON_FIELD_ERRORS_KEY: [error]})
+
+        serializer = self.get_serializer(data=request.data, many=True, allow_empty=False)
+        serializer.is_valid(raise_exception=True)
+        self.perform_bulk_create(serializer)
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
+
+    def perform_bulk_create(self, serializer):
+        ids = get_order_id_allocator().allocate_many(len(serializer.validated_data))
+        for attrs, order_id in zip(serializer.validated_data, ids):
+            attrs['id'] = order_id
+        serializer.save()
+        self._grant_access(serializer.instance)
+
+    def _grant_access(self, orders):
+        if self.request.user.is_anonymous:
+            self.granted_order_ids = [order.id for order in orders]
+
+    def get_idempotency_state(self):
+        return self.granted_order_ids
+
+    def set_idempotency_state(self, state):
+        # the token of the stored response may have been lost with it
+        self.granted_order_ids = state or ()
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        update_order_access(request, response, self.granted_order_ids)
+        return response
@@ -1,11 +1,13 @@
-from rest_access_policy import AccessPolicy
 from rest_framework import viewsets
 
-from store.models import Offer
+from application.access_policy import CompiledAccessPolicy
+from store.models import Good, Offer
 from store.serializers import OfferSerializer
+from store.views.mixins import (EagerLoadingMixin, FastListMixin, LastModifiedMixin, SparseFieldsMixin,
+                               VersionedCacheMixin)
 
 
-class OffersAccessPolicy(AccessPolicy):
+class OffersAccessPolicy(CompiledAccessPolicy):
     statements = [
         {
             "action": ["list", "retrieve"],
@@ -32,9 +34,12 @@ class OffersAccessPolicy(AccessPolicy):
                 or request.user.has_perm('store.delete_offer'))
 
 
-class OffersView(viewsets.ModelViewSet):
+class OffersView(VersionedCacheMixin, SparseFieldsMixin, LastModifiedMixin, FastListMixin, EagerLoadingMixin,
+                 viewsets.ModelViewSet):
     permission_classes = (OffersAccessPolicy, )
     queryset = Offer.objects
     serializer_class = OfferSerializer
     ordering_fields = ['price']
     ordering = ['id']
+    cache_models = (Good, Offer)
+    last_modified_fields = ('updated_at', 'good.updated_at')
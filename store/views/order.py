@@ -1,20 +1,29 @@
-from rest_access_policy import AccessPolicy
+from django.conf import settings
+from django.db import transaction
+from django.utils.translation import gettext_lazy as _
 from rest_framework import viewsets
+from rest_framework.decorators import action
+from rest_framework.exceptions import PermissionDenied, ValidationError
+from rest_framework.response import Response
 
+from application.access_policy import CompiledAccessPolicy
+from application.pagination import COUNT_CACHED
+from store.filters import FilterBackend
 from store.models import Order
-from store.serializers import OrderSerializer
+from store.serializers import OrderSerializer, OrderTransitionSerializer
+from store.views.mixins import EagerLoadingMixin, ExportMixin, LastModifiedMixin, SparseFieldsMixin
 
 
-class OrderAccessPolicy(AccessPolicy):
+class OrderAccessPolicy(CompiledAccessPolicy):
     statements = [
         {
-            "action": ["list", "retrieve"],
+            "action": ["list", "retrieve", "export"],
             "principal": ["*"],
             "effect": "allow",
             "condition": "can_view_order",
         },
         {
-            "action": ["create", "update", "partial_update", "destroy"],
+            "action": ["create", "update", "partial_update", "destroy", "bulk_transition"],
             "principal": ["*"],
             "effect": "allow",
             "condition": "can_moderate_order",
@@ -30,7 +39,11 @@ class OrderAccessPolicy(AccessPolicy):
         return request.user.has_perm('store.change_order')
 
 
-class OrderView(viewsets.mixins.RetrieveModelMixin,
+class OrderView(ExportMixin,
+                SparseFieldsMixin,
+                LastModifiedMixin,
+                EagerLoadingMixin,
+                viewsets.mixins.RetrieveModelMixin,
                 viewsets.mixins.UpdateModelMixin,
                 viewsets.mixins.ListModelMixin,
                 viewsets.GenericViewSet):
@@ -38,5 +51,66 @@ class OrderView(viewsets.mixins.RetrieveModelMixin,
     permission_classes = (OrderAccessPolicy,)
     queryset = Order.objects
     serializer_class = OrderSerializer
-    filterset_fields = ['user', 'email', 'status']
+    filterset_fields = {
+        'user': ['exact'],
+        'email': ['exact'],
+        'status': ['exact'],
+        'total_price': ['exact', 'gte', 'lte'],
+        'item_count': ['exact', 'gte', 'lte'],
+    }
     ordering = ['id']
+    pagination_count = COUNT_CACHED
+    last_modified_fields = ('updated_at', 'purchases.updated_at', 'purchases.good.updated_at')
+
+    def _is_filtered(self, request, queryset):
+        filterset_class = FilterBackend().get_filterset_class(self, queryset)
+        return bool(set(filterset_class.base_filters) & set(request.query_params))
+
+    @action(detail=False, methods=['post'], url_path='transition', url_name='transition')
+    def bulk_transition(self, request, *args, **kwargs):
+        """
+        apply a transition to the listed orders or to the orders matching the query filters
+
+        At most settings.ORDER_TRANSITION_MAX_SIZE orders are locked and transitioned by a request, a filter matching
+        more of them is rejected before any is locked.
+        """
+        serializer = OrderTransitionSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        name = serializer.validated_data['transition']
+        ids = serializer.validated_data.get('ids')
+
+        for t in getattr(Order, name)._django_fsm.transitions.values():
+            if not t.has_perm(None, request.user):
+                raise PermissionDenied()
+
+        max_size = settings.ORDER_TRANSITION_MAX_SIZE
+        if ids is not None and len(ids) > max_size:
+            raise ValidationError({'ids': [_('Ensure this list has no more than {max_size} orders.').format(
+                max_size=max_size)]})
+
+        queryset = self.filter_queryset(self.get_queryset())
+        if ids is not None:
+            queryset = queryset.filter(id__in=ids)
+        elif not self._is_filtered(request, queryset):
+            raise ValidationError({'detail': _('Either order ids or a filter is required.')})
+        else:
+            # lock by id, orders matching the filter meanwhile must not push past the limit
+            matched = list(queryset.values_list('id', flat=True)[:max_size + 1])
+            if len(matched) > max_size:
+                raise ValidationError({'detail': _('The filter matches more than {max_size} orders.').format(
+                    max_size=max_size)})
+            queryset = queryset.filter(id__in=matched)
+
+        with transaction.atomic():
+            orders = list(queryset.prefetch_related(None).select_for_update(of=('self', )).select_related('user'))
+            transitioned, skipped = Order.bulk_transition(orders, name)
+
+        skipped_ids = [order.id for order in skipped]
+        if ids is not None:
+            found = {order.id for order in orders}
+            skipped_ids.extend(order_id for order_id in dict.fromkeys(ids) if order_id not in found)
+
+        return Response({
+            'transitioned': [order.id for order in transitioned],
+            'skipped': skipped_ids,
+        })
@@ -1,21 +1,23 @@
-from rest_access_policy import AccessPolicy
 from rest_framework import viewsets
 
-from store.const import ORDER_IDS_SESSION_PARAM_NAME
+from application.access_policy import CompiledAccessPolicy
+from application.pagination import COUNT_CACHED
 from store.models import Purchase
+from store.order_access import get_order_access, update_order_access
 from store.serializers import PurchaseSerializer
+from store.views.mixins import EagerLoadingMixin, ExportMixin, FastListMixin, LastModifiedMixin, SparseFieldsMixin
 
 
-class PurchaseAccessPolicy(AccessPolicy):
+class PurchaseAccessPolicy(CompiledAccessPolicy):
     statements = [
         {
-            "action": ["list", "retrieve"],
+            "action": ["list", "retrieve", "export"],
             "principal": ["*"],
             "effect": "allow",
             "condition": "can_view_purchase",
         },
         {
-            "action": ["list", "retrieve"],
+            "action": ["list", "retrieve", "export"],
             "principal": ["*"],
             "effect": "allow",
             "condition": "can_view_my_purchase",
@@ -38,7 +40,7 @@ class PurchaseAccessPolicy(AccessPolicy):
         elif cls.can_view_my_purchase(request, view, action):
             if request.user.is_anonymous:
                 qs = qs.filter(order__user=None)  # anonymous is allowed to see anonymous purchases only
-                order_ids = request.session.get(ORDER_IDS_SESSION_PARAM_NAME, [])
+                order_ids = get_order_access(request)
 
                 if order_ids:
                     qs = qs.filter(order_id__in=order_ids)
@@ -51,11 +53,14 @@ class PurchaseAccessPolicy(AccessPolicy):
         return qs
 
 
-class PurchaseView(viewsets.ReadOnlyModelViewSet):
+class PurchaseView(ExportMixin, SparseFieldsMixin, LastModifiedMixin, FastListMixin, EagerLoadingMixin,
+                   viewsets.ReadOnlyModelViewSet):
     permission_classes = (PurchaseAccessPolicy,)
     queryset = Purchase.objects
     serializer_class = PurchaseSerializer
     ordering = ['id']
+    pagination_count = COUNT_CACHED
+    last_modified_fields = ('updated_at', 'good.updated_at')
 
     @property
     def access_policy(self):
@@ -65,3 +70,8 @@ class PurchaseView(viewsets.ReadOnlyModelViewSet):
         return self.access_policy.scope_queryset(
             self.request, self, self.action, super().get_queryset()
         )
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        update_order_access(request, response)
+        return response
@@ -1,11 +1,12 @@
-from rest_access_policy import AccessPolicy
 from rest_framework import viewsets
 
+from application.access_policy import CompiledAccessPolicy
 from store.models import Settings
 from store.serializers import SettingsSerializer
+from store.views.mixins import LastModifiedMixin, SparseFieldsMixin
 
 
-class SettingsAccessPolicy(AccessPolicy):
+class SettingsAccessPolicy(CompiledAccessPolicy):
     statements = [
         {
             "action": ["list", "retrieve"],
@@ -32,7 +33,7 @@ class SettingsAccessPolicy(AccessPolicy):
                 or request.user.has_perm('store.delete_settings'))
 
 
-class SettingsView(viewsets.ModelViewSet):
+class SettingsView(SparseFieldsMixin, LastModifiedMixin, viewsets.ModelViewSet):
     permission_classes = (SettingsAccessPolicy, )
     queryset = Settings.objects
     serializer_class = SettingsSerializer